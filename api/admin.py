@@ -1,7 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
 
+from .arquivo import ano_letivo_atual
+from .search import buscar_pessoas
 from .models import (
     Administracao,
     Professores,
@@ -10,7 +15,8 @@ from .models import (
     Materias,
     Classes,
     Avaliacoes,
-    Notas
+    Notas,
+    Tarefa
 )
 
 # Link profile > User em Admin
@@ -43,13 +49,147 @@ class UserAdmin(BaseUserAdmin):
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
 
+# Listagens de tabelas grandes (milhões de notas/alunos)
+
+def linhas_estimadas(model, using):
+    """Número de linhas da tabela segundo as estatísticas do banco (ANALYZE), ou None se não houver."""
+    connection = connections[using]
+    tabela = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabela])
+            elif connection.vendor == 'sqlite':
+                # Primeiro número de cada linha de sqlite_stat1 = linhas da tabela
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [tabela])
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT table_rows FROM information_schema.tables '
+                    'WHERE table_schema = DATABASE() AND table_name = %s', [tabela]
+                )
+            else:
+                return None
+            linha = cursor.fetchone()
+    except DatabaseError:  # Ex: sqlite_stat1 só existe depois do primeiro ANALYZE
+        return None
+    if linha is None or linha[0] is None:
+        return None
+    linhas = int(str(linha[0]).split()[0])
+    return linhas if linhas >= 0 else None  # PostgreSQL: -1 = tabela nunca analisada
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Na listagem sem filtro nem busca, usa a estimativa das estatísticas do banco
+    no lugar do COUNT(*) (o total mostrado é aproximado). Com filtro, ou em
+    tabelas de até `limite_exato` linhas, conta de verdade.
+    """
+    limite_exato = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where and not query.combinator:
+            estimativa = linhas_estimadas(queryset.model, queryset.db)
+            if estimativa is not None and estimativa > self.limite_exato:
+                return estimativa
+        return super().count
+
+
+class TabelaGrandeAdmin(admin.ModelAdmin):
+    paginator = PaginadorEstimado
+    ordering = ('-pk',) # Pela chave primária; explícita também para a paginação do autocomplete
+    # Sem o segundo COUNT(*) da tabela inteira ("N de M selecionados") quando há filtro
+    show_full_result_count = False
+
+
+class PessoaAdmin(TabelaGrandeAdmin):
+    """Cadastros de pessoas: busca pelo índice de `termos_busca` (ver api/search.py)."""
+    list_display = ('nome', 'cpf')
+    # A busca é feita em get_search_results; search_fields só habilita a caixa e o autocomplete
+    search_fields = ('termos_busca',)
+    raw_id_fields = ('user',)
+
+    def get_search_results(self, request, queryset, search_term):
+        return buscar_pessoas(queryset, search_term, ordenar=False), False
+
+
+class AlunosAdmin(PessoaAdmin):
+    list_display = ('nome', 'ra', 'rg', 'data_de_nascimento')
+    autocomplete_fields = ('responsaveis',)
+
+
+class MateriasAdmin(admin.ModelAdmin):
+    ordering = ('nome',)
+    search_fields = ('nome',)
+
+
+class ClassesAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'ano_letivo')
+    ordering = ('nome',)
+    list_filter = ('ano_letivo',)
+    search_fields = ('nome',)
+    # O select múltiplo padrão carregaria todos os alunos no formulário
+    autocomplete_fields = ('alunos', 'professores', 'materias')
+
+
+class AvaliacoesAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'classe', 'materia', 'professor_responsavel')
+    list_select_related = ('classe', 'materia', 'professor_responsavel')
+    ordering = ('nome',)
+    search_fields = ('nome',)
+    autocomplete_fields = ('classe', 'materia', 'professor_responsavel')
+
+
+class AnoLetivoFilter(admin.SimpleListFilter):
+    """Anos das turmas (tabela pequena), em vez do SELECT DISTINCT na tabela de notas."""
+    title = 'ano letivo'
+    parameter_name = 'ano_letivo'
+
+    def lookups(self, request, model_admin):
+        anos = set(Classes.objects.values_list('ano_letivo', flat=True).distinct()) | {ano_letivo_atual()}
+        return [(ano, ano) for ano in sorted(anos, reverse=True)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(ano_letivo=self.value()) # Índice (ano_letivo, aluno)
+        return queryset
+
+
+class NotasAdmin(TabelaGrandeAdmin):
+    list_display = ('id', 'aluno', 'avaliacao', 'nota', 'ano_letivo', 'data_registro')
+    # Notas.__str__ e as colunas acima leem aluno e avaliação: um JOIN em vez de duas consultas por linha
+    list_select_related = ('aluno', 'avaliacao')
+    list_filter = (AnoLetivoFilter,)
+    search_fields = ('aluno__termos_busca',)
+    search_help_text = 'Nome, RA ou RG do aluno.'
+    raw_id_fields = ('aluno', 'avaliacao', 'atribuida_por')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        # Alunos pelo índice de busca, notas pelo índice de aluno_id
+        alunos = buscar_pessoas(Alunos.objects.all(), search_term, ordenar=False)
+        return queryset.filter(aluno__in=alunos.values('id')), False
+
+
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'tentativas', 'criada_em', 'concluida_em')
+    list_filter = ('status', 'tipo')
+    # Parâmetros podem conter dados sensíveis (ex: CSV com senhas do cadastro em lote)
+    exclude = ('parametros',)
+
+
 # Models
-admin.site.register(Materias)
-admin.site.register(Classes)
-admin.site.register(Avaliacoes)
-admin.site.register(Notas)
+admin.site.register(Materias, MateriasAdmin)
+admin.site.register(Classes, ClassesAdmin)
+admin.site.register(Avaliacoes, AvaliacoesAdmin)
+admin.site.register(Notas, NotasAdmin)
 # Ocultar se administrar somente via User admin
-admin.site.register(Administracao)
-admin.site.register(Professores)
-admin.site.register(Responsaveis)
-admin.site.register(Alunos)
\ No newline at end of file
+admin.site.register(Administracao, PessoaAdmin)
+admin.site.register(Professores, PessoaAdmin)
+admin.site.register(Responsaveis, PessoaAdmin)
+admin.site.register(Alunos, AlunosAdmin)
+# Fila de tarefas (api/jobs.py)
+admin.site.register(Tarefa, TarefaAdmin)
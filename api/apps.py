@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Conecta os receivers de post_save que publicam eventos de Notas
+        from . import eventos  # noqa: F401
+        # Tombstones de remoção e atualizado_em de relações ManyToMany (sync incremental)
+        from . import sync  # noqa: F401
+        # Mantém Notas.ano_letivo quando avaliação/turma mudam
+        from . import arquivo  # noqa: F401
+        # Trilha de auditoria das notas (gravada em lotes)
+        from . import auditoria  # noqa: F401
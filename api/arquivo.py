@@ -0,0 +1,139 @@
+# api/arquivo.py
+
+"""
+Arquivamento de notas por ano letivo.
+
+A tabela Notas guarda só os anos em uso; `arquivar_ano(ano)` move as notas de
+um ano encerrado para NotasArquivadas em lotes (cada lote numa transação), e
+`restaurar_ano(ano)` faz o caminho inverso. Assim as consultas do dia a dia
+não crescem com os anos acumulados.
+
+A listagem padrão de `/api/notas/` mostra o ano letivo atual
+(`settings.ANO_LETIVO_ATUAL`, ou o ano corrente); `?ano_letivo=` escolhe outro
+ano ainda na tabela Notas e `/api/notas/historico/` consulta o arquivo.
+
+Também mantém `Notas.ano_letivo` quando a turma de uma avaliação ou o ano
+letivo de uma turma mudam.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import ExtractYear
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Avaliacoes, Classes, Notas, NotasArquivadas
+
+TAMANHO_LOTE = 1000
+
+CAMPOS = ('id', 'nota', 'aluno_id', 'avaliacao_id', 'atribuida_por_id', 'data_registro', 'ano_letivo', 'atualizado_em')
+
+
+def ano_letivo_atual():
+    return getattr(settings, 'ANO_LETIVO_ATUAL', None) or timezone.localdate().year
+
+
+class ConflitoArquivo(ValueError):
+    """Notas do ano que já existem no destino (mesmo id ou mesmo aluno/avaliação)."""
+
+    def __init__(self, conflitos):
+        self.conflitos = conflitos  # [(aluno_id, avaliacao_id)]
+        pares = ', '.join(f'aluno {aluno} / avaliação {avaliacao}' for aluno, avaliacao in conflitos[:20])
+        mais = f' e mais {len(conflitos) - 20}' if len(conflitos) > 20 else ''
+        super().__init__(
+            f"{len(conflitos)} nota(s) já existem no destino; resolva antes de mover: {pares}{mais}."
+        )
+
+
+def _conflitos(linhas, destino):
+    """(aluno_id, avaliacao_id) das linhas de `linhas` (queryset da origem) já presentes no destino."""
+    return sorted(
+        linhas.filter(
+            Exists(destino.objects.filter(id=OuterRef('id')))
+            | Exists(destino.objects.filter(aluno_id=OuterRef('aluno_id'), avaliacao_id=OuterRef('avaliacao_id')))
+        ).values_list('aluno_id', 'avaliacao_id')
+    )
+
+
+def _mover(origem, destino, ano_letivo, tamanho_lote, progresso):
+    """
+    Copia as linhas do ano de `origem` para `destino` e as apaga da origem, lote
+    a lote. Nota que já existe no destino (ex: lançada de novo em Notas depois
+    do arquivamento) levanta ConflitoArquivo antes de mover qualquer linha.
+    """
+    conflitos = _conflitos(origem.objects.filter(ano_letivo=ano_letivo), destino)
+    if conflitos:
+        raise ConflitoArquivo(conflitos)
+    movidas = 0
+    while True:
+        with transaction.atomic():
+            linhas = list(
+                origem.objects.filter(ano_letivo=ano_letivo)
+                .select_for_update()  # No PostgreSQL, trava o lote até o DELETE
+                .order_by('id')
+                .values(*CAMPOS)[:tamanho_lote]
+            )
+            if not linhas:
+                return movidas
+            ids = [linha['id'] for linha in linhas]
+            # De novo dentro da transação: uma nota pode ter sido lançada depois da checagem
+            conflitos = _conflitos(origem.objects.filter(id__in=ids), destino)
+            if conflitos:
+                raise ConflitoArquivo(conflitos)
+            # Sem ignore_conflicts: uma linha não inserida nunca é apagada da origem
+            destino.objects.bulk_create([destino(**linha) for linha in linhas], batch_size=tamanho_lote)
+            # SQL direto em vez de QuerySet.delete(): mover não é remover, então
+            # sem pre/post_delete (tombstone do sync, auditoria, eventos), e o
+            # delete() do ORM buscaria cada linha para o cascade. Nada referencia
+            # Notas/NotasArquivadas por FK. Apaga exatamente os ids copiados
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {connection.ops.quote_name(origem._meta.db_table)} '
+                    f'WHERE id IN ({", ".join(["%s"] * len(ids))})',
+                    ids,
+                )
+        movidas += len(linhas)
+        if progresso:
+            progresso(movidas)
+
+
+def arquivar_ano(ano_letivo, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Move as notas do ano para NotasArquivadas. Retorna quantas foram movidas."""
+    if ano_letivo >= ano_letivo_atual():
+        raise ValueError(f"O ano letivo {ano_letivo} ainda não foi encerrado.")
+    return _mover(Notas, NotasArquivadas, ano_letivo, tamanho_lote, progresso)
+
+
+def restaurar_ano(ano_letivo, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Devolve as notas arquivadas do ano para a tabela Notas. Retorna quantas foram movidas."""
+    return _mover(NotasArquivadas, Notas, ano_letivo, tamanho_lote, progresso)
+
+
+# --- Notas.ano_letivo ---
+
+@receiver(post_save, sender=Avaliacoes, dispatch_uid='api_arquivo_avaliacao')
+def atualizar_ano_das_notas_da_avaliacao(sender, instance, created, **kwargs):
+    if created:
+        return
+    notas = Notas.objects.filter(avaliacao=instance)
+    if instance.classe_id:
+        ano = Classes.objects.filter(pk=instance.classe_id).values('ano_letivo')
+        notas = notas.exclude(ano_letivo=Subquery(ano))
+        notas.update(ano_letivo=Subquery(ano), atualizado_em=timezone.now())
+    else:
+        notas.exclude(ano_letivo=ExtractYear('data_registro')).update(
+            ano_letivo=ExtractYear('data_registro'), atualizado_em=timezone.now(),
+        )
+
+
+@receiver(post_save, sender=Classes, dispatch_uid='api_arquivo_classe')
+def atualizar_ano_das_notas_da_turma(sender, instance, created, **kwargs):
+    if created:
+        return
+    avaliacoes = Avaliacoes.objects.filter(classe=instance).values('id')
+    Notas.objects.filter(avaliacao_id__in=avaliacoes).exclude(ano_letivo=instance.ano_letivo).update(
+        ano_letivo=instance.ano_letivo, atualizado_em=timezone.now(),
+    )
+
@@ -0,0 +1,156 @@
+# api/auditoria.py
+
+"""
+Auditoria das alterações de Notas (criação, atualização do valor e remoção).
+
+Os registros não são gravados no save da nota: cada alteração vai, no commit da
+transação, para um buffer em memória do processo, descarregado com um único
+`bulk_create`
+
+* ao fim de um request (depois da resposta enviada, fora da latência da
+  escrita), se o buffer tem `TAMANHO_BUFFER` registros ou o mais antigo tem
+  mais de `INTERVALO_DESCARGA` segundos;
+* na própria escrita só se chegar a `LIMITE_BUFFER` (scripts e comandos fora
+  de requests);
+* quando o processo encerra (atexit).
+
+O valor anterior vem de `Notas.from_db`, sem consulta extra. O autor é o
+usuário do request em `NotasViewSet` (via `autor()`); alterações feitas fora da
+API ficam com usuário vazio. Um processo morto antes da descarga perde no
+máximo o conteúdo do buffer.
+"""
+
+import atexit
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.pagination import CursorPagination
+
+from .models import AuditoriaNotas, Notas
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BUFFER = 200
+LIMITE_BUFFER = 2000
+INTERVALO_DESCARGA = 1.0
+
+_autor = contextvars.ContextVar('autor_auditoria', default='')
+
+
+@contextlib.contextmanager
+def autor(user):
+    """Atribui ao usuário as alterações de notas feitas dentro do bloco."""
+    token = _autor.set(user.get_username() if user and user.is_authenticated else '')
+    try:
+        yield
+    finally:
+        _autor.reset(token)
+
+
+class BufferAuditoria:
+    """Acumula registros de auditoria e os grava em lote. Thread-safe."""
+
+    def __init__(self, tamanho=TAMANHO_BUFFER, limite=LIMITE_BUFFER, intervalo=INTERVALO_DESCARGA):
+        self.tamanho = tamanho
+        self.limite = limite
+        self.intervalo = intervalo
+        self._registros = []
+        self._primeiro_em = None
+        self._lock = threading.Lock()
+
+    def adicionar(self, registro):
+        with self._lock:
+            if not self._registros:
+                self._primeiro_em = time.monotonic()
+            self._registros.append(registro)
+            cheio = len(self._registros) >= self.limite
+        if cheio:
+            self.descarregar_registrando_erros()
+
+    def pronto(self):
+        """Há um lote completo ou registros esperando há mais de `intervalo` segundos."""
+        if len(self._registros) >= self.tamanho:
+            return True
+        primeiro_em = self._primeiro_em
+        return bool(self._registros) and time.monotonic() - primeiro_em >= self.intervalo
+
+    def descarregar(self):
+        """Grava os registros pendentes (um INSERT em lote). Retorna quantos foram gravados."""
+        with self._lock:
+            registros, self._registros = self._registros, []
+        if registros:
+            try:
+                AuditoriaNotas.objects.bulk_create(registros, batch_size=self.tamanho)
+            except Exception:
+                # Volta para o buffer; a próxima descarga tenta de novo
+                with self._lock:
+                    self._registros[:0] = registros
+                raise
+        return len(registros)
+
+    def descarregar_registrando_erros(self):
+        # Usado fora do fluxo do chamador (on_commit, request_finished): falha não derruba o request
+        try:
+            return self.descarregar()
+        except Exception:
+            logger.exception("Falha ao gravar lote de auditoria de notas")
+            return 0
+
+    def __len__(self):
+        return len(self._registros)
+
+
+buffer = BufferAuditoria()
+
+
+def _registrar(nota, acao, valor_anterior, valor_novo):
+    registro = AuditoriaNotas(
+        nota_id=nota.pk,
+        aluno_id=nota.aluno_id,
+        avaliacao_id=nota.avaliacao_id,
+        acao=acao,
+        valor_anterior=valor_anterior,
+        valor_novo=valor_novo,
+        usuario=_autor.get(),
+        registrado_em=timezone.now(),
+    )
+    # Alteração desfeita por rollback não entra na trilha
+    transaction.on_commit(lambda: buffer.adicionar(registro))
+
+
+@receiver(post_save, sender=Notas, dispatch_uid='api_auditoria_nota_salva')
+def auditar_nota_salva(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_nota_original', None)
+    if created:
+        _registrar(instance, AuditoriaNotas.CRIADA, None, instance.nota)
+    elif anterior is None or anterior != instance.nota:
+        _registrar(instance, AuditoriaNotas.ATUALIZADA, anterior, instance.nota)
+    instance._nota_original = instance.nota
+
+
+@receiver(post_delete, sender=Notas, dispatch_uid='api_auditoria_nota_removida')
+def auditar_nota_removida(sender, instance, **kwargs):
+    _registrar(instance, AuditoriaNotas.REMOVIDA, getattr(instance, '_nota_original', instance.nota), None)
+
+
+@receiver(request_finished, dispatch_uid='api_auditoria_descarga')
+def descarregar_ao_fim_do_request(sender, **kwargs):
+    if buffer.pronto():
+        buffer.descarregar_registrando_erros()
+
+
+atexit.register(buffer.descarregar_registrando_erros)
+
+
+class AuditoriaPagination(CursorPagination):
+    """Mais recentes primeiro; cursor por id, estável enquanto novos registros chegam."""
+    page_size = 100
+    ordering = '-id'
@@ -0,0 +1,193 @@
+# api/boletins.py
+
+"""
+Geração dos boletins de fim de período para um `ano_letivo`.
+
+As notas do ano saem de `Notas.ano_letivo` (índice ano/aluno) ou, para anos já
+arquivados com `manage.py arquivar_notas`, de NotasArquivadas (mesmos campos).
+Os alunos são processados em lotes: para cada lote, notas e médias por matéria
+saem de poucas consultas agregadas; a classificação na turma é calculada uma
+vez para o ano inteiro com uma window function. A renderização (HTML) e a
+gravação em MEDIA_ROOT/boletins/<ano>/ rodam num pool de processos.
+
+A geração é retomável: cada boletim é gravado de forma atômica (arquivo
+temporário + rename) e alunos que já têm arquivo são pulados, a menos que
+`refazer=True`.
+"""
+
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db.models import Avg, Count, F, OuterRef, Subquery, Window
+from django.db.models.functions import Rank
+
+from .models import Alunos, Classes, Notas, NotasArquivadas
+
+TAMANHO_LOTE = 500
+
+ClassesAlunos = Classes.alunos.through
+
+
+def diretorio_boletins(ano_letivo):
+    return os.path.join(settings.MEDIA_ROOT, 'boletins', str(ano_letivo))
+
+
+def caminho_boletim(ano_letivo, aluno_id):
+    return os.path.join(diretorio_boletins(ano_letivo), f'{aluno_id}.html')
+
+
+def notas_do_ano(ano_letivo):
+    """
+    Notas do ano letivo: da tabela Notas enquanto o ano estiver nela, senão do
+    arquivo. Um ano é arquivado inteiro; durante o `arquivar_notas` ele fica
+    dividido entre as duas tabelas e os boletins devem esperar o fim.
+    """
+    notas = Notas.objects.filter(ano_letivo=ano_letivo)
+    if notas.exists():
+        return notas
+    return NotasArquivadas.objects.filter(ano_letivo=ano_letivo)
+
+
+def ids_alunos_do_ano(ano_letivo):
+    """IDs (ordenados) dos alunos matriculados em alguma turma do ano letivo."""
+    return list(
+        ClassesAlunos.objects
+        .filter(classes__ano_letivo=ano_letivo)
+        .values_list('alunos_id', flat=True)
+        .distinct()
+        .order_by('alunos_id')
+    )
+
+
+def classificacao_do_ano(ano_letivo, notas=None):
+    """{aluno_id: (turma, posição, total de alunos na turma)}, numa única consulta com RANK()."""
+    notas = notas_do_ano(ano_letivo) if notas is None else notas
+    media_do_aluno = (
+        notas
+        .filter(aluno_id=OuterRef('alunos_id'))
+        .values('aluno_id')
+        .annotate(media=Avg('nota'))
+        .values('media')
+    )
+    linhas = (
+        ClassesAlunos.objects
+        .filter(classes__ano_letivo=ano_letivo)
+        .annotate(
+            media=Subquery(media_do_aluno),
+            posicao=Window(Rank(), partition_by=F('classes_id'), order_by=F('media').desc(nulls_last=True)),
+            total=Window(Count('id'), partition_by=F('classes_id')),
+        )
+        .values_list('alunos_id', 'classes__nome', 'posicao', 'total')
+    )
+    # Aluno em mais de uma turma no ano: fica a primeira pelo nome da turma
+    classificacao = {}
+    for aluno_id, turma, posicao, total in sorted(linhas, key=lambda linha: linha[1]):
+        classificacao.setdefault(aluno_id, (turma, posicao, total))
+    return classificacao
+
+
+def dados_do_lote(ano_letivo, ids, classificacao, notas=None):
+    """Dados de boletim dos alunos do lote: três consultas, independente do tamanho do lote."""
+    notas = notas_do_ano(ano_letivo) if notas is None else notas
+    alunos = {
+        aluno['id']: {'aluno': aluno, 'notas': [], 'medias': [], 'classificacao': classificacao.get(aluno['id'])}
+        for aluno in Alunos.objects.filter(id__in=ids).values('id', 'nome', 'ra')
+    }
+    notas_do_lote = notas.filter(aluno_id__in=ids)
+    for nota in (
+        notas_do_lote
+        .values('aluno_id', 'nota', 'data_registro', 'avaliacao__nome', 'avaliacao__materia__nome')
+        .order_by('aluno_id', 'avaliacao__materia__nome', 'avaliacao__nome')
+    ):
+        alunos[nota['aluno_id']]['notas'].append(nota)
+    for media in (
+        notas_do_lote
+        .values('aluno_id', 'avaliacao__materia__nome')
+        .annotate(media=Avg('nota'), avaliacoes=Count('id'))
+        .order_by('aluno_id', 'avaliacao__materia__nome')
+    ):
+        alunos[media['aluno_id']]['medias'].append(media)
+    return list(alunos.values())
+
+
+def renderizar_boletim(ano_letivo, dados):
+    """HTML autocontido do boletim. Função pura, executada nos processos do pool."""
+    aluno = dados['aluno']
+    esc = lambda valor: html.escape(str(valor if valor is not None else '—'))
+    linhas_notas = ''.join(
+        f"<tr><td>{esc(nota['avaliacao__materia__nome'])}</td><td>{esc(nota['avaliacao__nome'])}</td>"
+        f"<td>{esc(nota['nota'])}</td><td>{esc(nota['data_registro'])}</td></tr>"
+        for nota in dados['notas']
+    )
+    linhas_medias = ''.join(
+        f"<tr><td>{esc(media['avaliacao__materia__nome'])}</td>"
+        f"<td>{esc(round(media['media'], 2))}</td><td>{esc(media['avaliacoes'])}</td></tr>"
+        for media in dados['medias']
+    )
+    if dados['classificacao']:
+        turma, posicao, total = dados['classificacao']
+        classificacao = f"<p>Turma {esc(turma)}: {esc(posicao)}º de {esc(total)}</p>"
+    else:
+        classificacao = "<p>Sem turma no ano letivo.</p>"
+    return (
+        "<!DOCTYPE html><html lang=\"pt-br\"><head><meta charset=\"utf-8\">"
+        f"<title>Boletim {esc(ano_letivo)} - {esc(aluno['nome'])}</title></head><body>"
+        f"<h1>Boletim {esc(ano_letivo)}</h1><p>{esc(aluno['nome'])} (RA {esc(aluno['ra'])})</p>{classificacao}"
+        "<h2>Médias por matéria</h2><table><tr><th>Matéria</th><th>Média</th><th>Avaliações</th></tr>"
+        f"{linhas_medias}</table>"
+        "<h2>Notas</h2><table><tr><th>Matéria</th><th>Avaliação</th><th>Nota</th><th>Data</th></tr>"
+        f"{linhas_notas}</table></body></html>"
+    )
+
+
+def _gravar_boletim(argumentos):
+    caminho, ano_letivo, dados = argumentos
+    temporario = f'{caminho}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(renderizar_boletim(ano_letivo, dados))
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def status_boletins(ano_letivo):
+    ids = ids_alunos_do_ano(ano_letivo)
+    gerados = sum(1 for aluno_id in ids if os.path.exists(caminho_boletim(ano_letivo, aluno_id)))
+    return {'ano_letivo': ano_letivo, 'total': len(ids), 'gerados': gerados}
+
+
+def gerar_boletins(ano_letivo, workers=None, refazer=False, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """
+    Gera os boletins do ano letivo. `progresso(feitos, total)` é chamado a cada
+    lote. Retorna {'total', 'gerados', 'pulados'}.
+    """
+    os.makedirs(diretorio_boletins(ano_letivo), exist_ok=True)
+    ids = ids_alunos_do_ano(ano_letivo)
+    pendentes = ids if refazer else [
+        aluno_id for aluno_id in ids if not os.path.exists(caminho_boletim(ano_letivo, aluno_id))
+    ]
+    pulados = len(ids) - len(pendentes)
+    if progresso:
+        progresso(pulados, len(ids))
+    if not pendentes:
+        return {'total': len(ids), 'gerados': 0, 'pulados': pulados}
+
+    notas = notas_do_ano(ano_letivo)
+    classificacao = classificacao_do_ano(ano_letivo, notas)
+    feitos = pulados
+    chunksize = max(1, tamanho_lote // (4 * (workers or os.cpu_count() or 1)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for inicio in range(0, len(pendentes), tamanho_lote):
+            lote = pendentes[inicio:inicio + tamanho_lote]
+            tarefas = [
+                (caminho_boletim(ano_letivo, dados['aluno']['id']), ano_letivo, dados)
+                for dados in dados_do_lote(ano_letivo, lote, classificacao, notas)
+            ]
+            # Consulta do próximo lote só começa depois que este foi gravado: memória limitada ao lote
+            for _ in pool.map(_gravar_boletim, tarefas, chunksize=chunksize):
+                pass
+            feitos += len(lote)
+            if progresso:
+                progresso(feitos, len(ids))
+    return {'total': len(ids), 'gerados': len(pendentes), 'pulados': pulados}
@@ -0,0 +1,250 @@
+# api/eventos.py
+
+"""
+Eventos de criação/atualização de Notas para o feed SSE (`/api/notas/eventos/`).
+
+* `HubEventos`: fan-out dentro do processo, uma fila asyncio por assinante;
+* backends de difusão entre processos, escolhidos por
+  `settings.NOTAS_EVENTOS_BACKEND`:
+    - `api.eventos.BackendLocal` (padrão): só o próprio processo recebe;
+    - `api.eventos.BackendPostgres`: LISTEN/NOTIFY, todos os workers recebem;
+* `EscopoEventos`: decide quais eventos cada assinante pode ver, com as mesmas
+  regras de `NotasViewSet.get_queryset`, e confere periodicamente se o usuário
+  continua ativo;
+* tickets do stream (`emitir_ticket`/`usar_ticket`): EventSource não envia
+  headers e um access token em `?token=` acabaria nos logs de acesso. O cliente
+  troca o JWT por um ticket assinado que vale `TICKET_VALIDADE` segundos e uma
+  única conexão. O stream termina quando o access token usado expira.
+
+Os eventos são publicados no commit da transação (post_save de Notas).
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import scopes
+from .models import Notas
+
+logger = logging.getLogger(__name__)
+
+# Eventos guardados por assinante; se o cliente não consome, os mais antigos são descartados
+TAMANHO_FILA = 100
+
+
+class Assinatura:
+    def __init__(self, loop):
+        self.loop = loop
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+
+    def entregar(self, evento):
+        # Executado no loop do assinante (call_soon_threadsafe)
+        if self.fila.full():
+            self.fila.get_nowait()
+        self.fila.put_nowait(evento)
+
+
+class HubEventos:
+    """Distribui eventos para os assinantes deste processo. Thread-safe."""
+
+    def __init__(self):
+        self._assinaturas = set()
+        self._lock = threading.Lock()
+
+    def assinar(self, loop):
+        assinatura = Assinatura(loop)
+        with self._lock:
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def distribuir(self, evento):
+        with self._lock:
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            try:
+                assinatura.loop.call_soon_threadsafe(assinatura.entregar, evento)
+            except RuntimeError:
+                # Loop já encerrado: a assinatura é removida quando o stream fecha
+                pass
+
+    def __len__(self):
+        return len(self._assinaturas)
+
+
+class BackendLocal:
+    """Difusão só dentro do processo (desenvolvimento, um único worker)."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publicar(self, evento):
+        self.hub.distribuir(evento)
+
+    def iniciar(self):
+        pass
+
+
+class BackendPostgres(BackendLocal):
+    """Difusão entre processos via LISTEN/NOTIFY do PostgreSQL (sem broker externo)."""
+    canal = 'notas_eventos'
+
+    def __init__(self, hub):
+        super().__init__(hub)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def publicar(self, evento):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.canal, json.dumps(evento)])
+
+    def iniciar(self):
+        # Um listener por processo, iniciado na primeira assinatura
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._escutar, name='notas-eventos', daemon=True)
+                self._thread.start()
+
+    def _escutar(self):
+        import select
+        import psycopg2
+
+        while True:
+            try:
+                conexao = psycopg2.connect(**connection.get_connection_params())
+                conexao.autocommit = True
+                with conexao.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.canal}')
+                while True:
+                    if select.select([conexao], [], [], 30) == ([], [], []):
+                        continue
+                    conexao.poll()
+                    while conexao.notifies:
+                        self.hub.distribuir(json.loads(conexao.notifies.pop(0).payload))
+            except Exception:
+                logger.exception("Listener de eventos de notas caiu; reconectando em 5s")
+                time.sleep(5)
+
+
+hub = HubEventos()
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        caminho = getattr(settings, 'NOTAS_EVENTOS_BACKEND', 'api.eventos.BackendLocal')
+        _backend = import_string(caminho)(hub)
+    return _backend
+
+
+def evento_de_nota(nota, acao):
+    return {
+        'acao': acao,
+        'id': nota.pk,
+        'nota': str(nota.nota),
+        'aluno': nota.aluno_id,
+        'avaliacao': nota.avaliacao_id,
+        'atribuida_por': nota.atribuida_por_id,
+        'data_registro': nota.data_registro.isoformat() if nota.data_registro else None,
+    }
+
+
+@receiver(post_save, sender=Notas, dispatch_uid='api_eventos_notas')
+def publicar_nota_salva(sender, instance, created, **kwargs):
+    evento = evento_de_nota(instance, 'criada' if created else 'atualizada')
+    transaction.on_commit(lambda: get_backend().publicar(evento))
+
+
+# Segundos entre a emissão do ticket e a abertura do stream
+TICKET_VALIDADE = 30
+TICKET_SALT = 'api.eventos.ticket'
+
+
+def emitir_ticket(user, expira_em):
+    """Ticket de uso único para abrir o stream; `expira_em` (epoch) é o `exp` do access token."""
+    return signing.dumps({'u': user.pk, 'exp': int(expira_em), 'n': uuid.uuid4().hex}, salt=TICKET_SALT)
+
+
+def usar_ticket(ticket):
+    """(user_id, expira_em) do ticket, ou None se inválido, vencido ou já usado."""
+    try:
+        dados = signing.loads(ticket, salt=TICKET_SALT, max_age=TICKET_VALIDADE)
+    except signing.BadSignature:
+        return None
+    # add() só grava se a chave não existe: a segunda conexão com o mesmo ticket é recusada.
+    # Com vários processos o cache precisa ser compartilhado (NOTAS_EVENTOS_TICKET_CACHE)
+    cache = caches[getattr(settings, 'NOTAS_EVENTOS_TICKET_CACHE', 'default')]
+    if not cache.add(f"eventos:ticket:{dados['n']}", 1, TICKET_VALIDADE):
+        return None
+    return dados['u'], dados['exp']
+
+
+class EscopoEventos:
+    """
+    Quais eventos de Notas um usuário pode receber. A cada `validade` segundos
+    o usuário é relido do banco (`ativo`) e, para professores e responsáveis,
+    o conjunto de alunos é recarregado.
+    """
+    validade = 60
+
+    def __init__(self, user):
+        self.user = user
+        self.todos = user.is_staff
+        self.professor_id = user.professor_profile.pk if hasattr(user, 'professor_profile') else None
+        self.alunos = set()
+        self.ativo = user.is_active
+        self.carregado_em = time.monotonic()
+        self.carregar_alunos()
+
+    @classmethod
+    def para_usuario(cls, user):
+        """Escopo do usuário ou None se ele não tem papel que veja notas."""
+        if not (user.is_staff or hasattr(user, 'professor_profile')
+                or hasattr(user, 'aluno_profile') or hasattr(user, 'responsavel_profile')):
+            return None
+        return cls(user)
+
+    def recarregar(self):
+        """Relê `is_active` (desativar o usuário encerra o stream) e o conjunto de alunos."""
+        self.ativo = type(self.user)._default_manager.filter(pk=self.user.pk, is_active=True).exists()
+        if self.ativo:
+            self.carregar_alunos()
+        self.carregado_em = time.monotonic()
+
+    def carregar_alunos(self):
+        if self.todos:
+            return
+        if self.professor_id is not None:
+            ids = scopes.ids_alunos_do_professor(self.user.professor_profile)
+            self.alunos = set(ids.values_list('alunos_id', flat=True))
+        elif hasattr(self.user, 'aluno_profile'):
+            self.alunos = {self.user.aluno_profile.pk}
+        else:
+            ids = scopes.ids_alunos_do_responsavel(self.user.responsavel_profile)
+            self.alunos = set(ids.values_list('alunos_id', flat=True))
+
+    @property
+    def expirado(self):
+        return time.monotonic() - self.carregado_em > self.validade
+
+    def permite(self, evento):
+        if self.todos:
+            return True
+        if self.professor_id is not None and evento['atribuida_por'] == self.professor_id:
+            return True
+        return evento['aluno'] in self.alunos
@@ -0,0 +1,61 @@
+# api/filters.py
+
+"""
+Filtros declarativos por query string para os ViewSets.
+
+A view declara `filtros_parametros = {parametro: (lookup, conversor)}` e o
+backend aplica `queryset.filter(**{lookup: conversor(valor)})` para cada
+parâmetro presente. Como roda depois de `get_queryset`, os filtros se somam ao
+escopo por papel e tudo vira uma única consulta no banco.
+"""
+
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def data_iso(valor):
+    return datetime.date.fromisoformat(valor)
+
+
+# Limites de um BIGINT: valores fora estouram no driver do banco (OverflowError)
+MAIOR_INTEIRO = 2 ** 63 - 1
+
+
+def inteiro(valor):
+    """Ids e anos: inteiro entre 1 e MAIOR_INTEIRO."""
+    numero = int(valor)
+    if not 1 <= numero <= MAIOR_INTEIRO:
+        raise ValueError(valor)
+    return numero
+
+
+def decimal(valor):
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        raise ValueError(valor)
+    if not numero.is_finite():  # NaN e Infinity não são comparáveis no banco
+        raise ValueError(valor)
+    return numero
+
+
+class FiltroPorParametros(BaseFilterBackend):
+    """Aplica os filtros declarados em `view.filtros_parametros`."""
+
+    def filter_queryset(self, request, queryset, view):
+        filtros = {}
+        erros = {}
+        for parametro, (lookup, conversor) in getattr(view, 'filtros_parametros', {}).items():
+            valor = request.query_params.get(parametro)
+            if valor in (None, ''):
+                continue
+            try:
+                filtros[lookup] = conversor(valor)
+            except (TypeError, ValueError):
+                erros[parametro] = [f"Valor inválido: '{valor}'."]
+        if erros:
+            raise ValidationError(erros)
+        return queryset.filter(**filtros) if filtros else queryset
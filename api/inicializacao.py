@@ -0,0 +1,104 @@
+# api/inicializacao.py
+
+"""
+Inicialização enxuta dos workers que servem a API (`DJANGO_PERFIL=api`, o
+padrão do `gunicorn.conf.py`).
+
+No perfil 'api':
+
+* o admin entra como `SimpleAdminConfig` (sem autodiscover no setup) e suas
+  URLs são montadas por `AdminSobDemanda` no primeiro request/reverse em
+  `/admin/`: `api/admin.py`, `UserAdmin` e formulários só são importados se
+  alguém abrir o admin;
+* sessão, CSRF, autenticação por sessão e mensagens rodam só em `/admin/`
+  (`MiddlewaresDoAdmin`, com a lista em `settings.ADMIN_MIDDLEWARE`); a API é
+  só JWT e não passa por eles;
+* `aquecer()` (chamado no `wsgi.py` e no `asgi.py`) importa URLconf, views e
+  serializers antes do primeiro request. Com `preload_app` isso acontece uma
+  vez no processo mestre do gunicorn e os workers compartilham essa memória
+  (copy-on-write); `antes_do_fork()` fecha as conexões de banco abertas no
+  mestre, para nenhum worker herdar o socket de outro.
+
+`manage.py medir_inicializacao` compara os perfis.
+"""
+
+import gc
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+PREFIXO_ADMIN = '/admin/'
+
+
+class AdminSobDemanda:
+    """URLconf do admin resolvida no primeiro uso: `path('admin/', AdminSobDemanda().urls)`."""
+
+    @cached_property
+    def urlpatterns(self):
+        from django.contrib import admin
+
+        admin.autodiscover()  # Idempotente: no perfil completo o AdminConfig já rodou
+        return admin.site.get_urls()
+
+    @property
+    def urls(self):
+        return self, 'admin', 'admin'
+
+
+class MiddlewaresDoAdmin:
+    """Aplica os middlewares de `settings.ADMIN_MIDDLEWARE` só em `/admin/`, montando a cadeia no primeiro uso."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+        self._cadeia = None
+        self._lock = threading.Lock()
+
+    @property
+    def cadeia(self):
+        if self._cadeia is None:
+            with self._lock:
+                if self._cadeia is None:
+                    handler = self.get_response
+                    for caminho in reversed(settings.ADMIN_MIDDLEWARE):
+                        handler = import_string(caminho)(handler)
+                    self._cadeia = handler
+        return self._cadeia
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if request.path_info.startswith(PREFIXO_ADMIN):
+            return self.cadeia(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path_info.startswith(PREFIXO_ADMIN):
+            return await self.cadeia(request)
+        return await self.get_response(request)
+
+
+def aquecer():
+    """Importa URLconf, views e serializers, sem tocar no banco."""
+    from django.urls import get_resolver
+
+    # Só os padrões: popular o reverse() desceria em todos os resolvers e montaria o admin
+    get_resolver().url_patterns
+    # Se algo abriu conexão durante o import, não deixa para os workers
+    connections.close_all()
+
+
+def antes_do_fork():
+    """Hook `pre_fork` do gunicorn (processo mestre, com `preload_app`)."""
+    connections.close_all()
+    # Objetos já criados vão para a geração permanente: o gc dos workers não
+    # os percorre e não suja as páginas compartilhadas com o mestre
+    gc.freeze()
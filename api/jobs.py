@@ -0,0 +1,225 @@
+# api/jobs.py
+
+"""
+Fila de tarefas em banco, sem broker externo.
+
+* `registrar('tipo')` associa um nome a uma função `handler(tarefa, **parametros)`;
+* `enfileirar('tipo', **parametros)` grava uma `Tarefa` pendente;
+* `manage.py run_worker` busca as pendentes, executa com concorrência limitada
+  e faz novas tentativas com backoff exponencial em caso de erro.
+
+Erros que uma nova tentativa não resolve falham a tarefa na hora, sem backoff:
+tipo sem handler, parâmetros que não batem com a assinatura do handler,
+`FalhaDefinitiva` e `ValidationError` levantadas pelo handler.
+
+A reserva de uma tarefa é um UPDATE condicional (`status = pendente`), então
+vários workers podem rodar ao mesmo tempo em qualquer banco suportado.
+
+Handlers longos chamam `atualizar_progresso` (heartbeat). Uma tarefa
+'executando' sem heartbeat há mais de `--stale-after` segundos é de um worker
+que morreu: qualquer worker a devolve à fila, contando como tentativa.
+
+Parâmetros declarados como sensíveis em `registrar` (ex: o CSV com senhas do
+cadastro em lote) não são expostos pela API nem pelo admin e são apagados
+quando a tarefa termina.
+"""
+
+import datetime
+import inspect
+import logging
+import os
+import socket
+import traceback
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .arquivo import arquivar_ano
+from .boletins import gerar_boletins
+from .models import Tarefa
+from .onboarding import ErroImportacao, importar, ler_csv
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+PARAMETROS_SENSIVEIS = {}  # tipo -> nomes dos parâmetros apagados ao fim da tarefa
+
+# Segundos de espera antes da tentativa N: BACKOFF_BASE * 2 ** (N - 1)
+BACKOFF_BASE = 30
+
+
+class FalhaDefinitiva(Exception):
+    """Erro de tarefa que não adianta repetir (dados ou parâmetros inválidos)."""
+
+
+def registrar(tipo, sensiveis=()):
+    """Decorator: registra `funcao(tarefa, **parametros)` como handler do tipo."""
+    def decorator(funcao):
+        HANDLERS[tipo] = funcao
+        PARAMETROS_SENSIVEIS[tipo] = tuple(sensiveis)
+        return funcao
+    return decorator
+
+
+def enfileirar(tipo, criada_por=None, max_tentativas=3, **parametros):
+    if tipo not in HANDLERS:
+        raise ValueError(f"Tipo de tarefa desconhecido: '{tipo}'.")
+    return Tarefa.objects.create(
+        tipo=tipo,
+        parametros=parametros,
+        criada_por=criada_por,
+        max_tentativas=max_tentativas,
+    )
+
+
+def conferir_parametros(tipo, parametros):
+    """Levanta FalhaDefinitiva se não há handler para o tipo ou se os parâmetros não servem para ele."""
+    if tipo not in HANDLERS:
+        raise FalhaDefinitiva(f"Tipo de tarefa desconhecido: '{tipo}'.")
+    try:
+        inspect.signature(HANDLERS[tipo]).bind(None, **parametros)
+    except TypeError as exc:
+        raise FalhaDefinitiva(f"Parâmetros inválidos para '{tipo}': {exc}.") from exc
+
+
+def atualizar_progresso(tarefa, feito, total=None):
+    """Grava o progresso (e serve de heartbeat para detectar workers mortos)."""
+    campos = {'progresso_feito': feito, 'atualizada_em': timezone.now()}
+    if total is not None:
+        campos['progresso_total'] = total
+    Tarefa.objects.filter(pk=tarefa.pk).update(**campos)
+    for campo, valor in campos.items():
+        setattr(tarefa, campo, valor)
+
+
+def identificacao_worker():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def reservar_proximas(limite, worker=None):
+    """Reserva até `limite` tarefas pendentes para este worker. Retorna as reservadas."""
+    agora = timezone.now()
+    worker = worker or identificacao_worker()
+    candidatas = (
+        Tarefa.objects
+        .filter(Q(executar_apos__isnull=True) | Q(executar_apos__lte=agora), status=Tarefa.PENDENTE)
+        .order_by('id')
+        .values_list('id', flat=True)[:limite * 2]
+    )
+    reservadas = []
+    for tarefa_id in candidatas:
+        if len(reservadas) >= limite:
+            break
+        # Compare-and-set: só um worker consegue mudar pendente -> executando
+        ganhou = Tarefa.objects.filter(pk=tarefa_id, status=Tarefa.PENDENTE).update(
+            status=Tarefa.EXECUTANDO, worker=worker, iniciada_em=agora, atualizada_em=agora,
+        )
+        if ganhou:
+            reservadas.append(Tarefa.objects.get(pk=tarefa_id))
+    return reservadas
+
+
+def liberar_travadas(tempo_limite):
+    """
+    Tarefas 'executando' sem heartbeat há mais de `tempo_limite` segundos: a
+    execução perdida conta como tentativa; voltam para a fila ou, esgotadas as
+    tentativas, falham. Retorna (devolvidas, falhas).
+    """
+    agora = timezone.now()
+    travadas = Tarefa.objects.filter(
+        status=Tarefa.EXECUTANDO, atualizada_em__lt=agora - datetime.timedelta(seconds=tempo_limite),
+    )
+    # Uma tarefa que derruba o worker toda vez não é repetida para sempre
+    esgotadas = list(travadas.filter(tentativas__gte=F('max_tentativas') - 1))
+    falhas = 0
+    for tarefa in esgotadas:
+        _apagar_sensiveis(tarefa)
+        # Condicional ao status: outro worker pode estar liberando as mesmas tarefas
+        falhas += travadas.filter(pk=tarefa.pk).update(
+            status=Tarefa.FALHOU, tentativas=F('tentativas') + 1, worker='', parametros=tarefa.parametros,
+            erro=f"Sem heartbeat há mais de {tempo_limite}s: o worker parou durante a execução.",
+            concluida_em=agora, atualizada_em=agora,
+        )
+    devolvidas = travadas.update(
+        status=Tarefa.PENDENTE, tentativas=F('tentativas') + 1, worker='', atualizada_em=agora,
+    )
+    return devolvidas, falhas
+
+
+def _apagar_sensiveis(tarefa):
+    for nome in PARAMETROS_SENSIVEIS.get(tarefa.tipo, ()):
+        tarefa.parametros.pop(nome, None)
+
+
+def executar(tarefa):
+    """Executa uma tarefa já reservada e grava o resultado, reagendando em caso de erro."""
+    close_old_connections()
+    try:
+        # Fora do handler: um TypeError de dentro dele continua sendo erro comum
+        conferir_parametros(tarefa.tipo, tarefa.parametros)
+        resultado = HANDLERS[tarefa.tipo](tarefa, **tarefa.parametros)
+    except Exception as exc:
+        tarefa.tentativas += 1
+        tarefa.erro = traceback.format_exc()
+        definitiva = isinstance(exc, (FalhaDefinitiva, ValidationError))
+        if tarefa.tentativas < tarefa.max_tentativas and not definitiva:
+            tarefa.status = Tarefa.PENDENTE
+            tarefa.executar_apos = timezone.now() + datetime.timedelta(
+                seconds=BACKOFF_BASE * 2 ** (tarefa.tentativas - 1)
+            )
+        else:
+            tarefa.status = Tarefa.FALHOU
+            tarefa.concluida_em = timezone.now()
+            _apagar_sensiveis(tarefa)
+        logger.exception("Tarefa %s falhou (tentativa %s)", tarefa.pk, tarefa.tentativas)
+        tarefa.save(update_fields=[
+            'tentativas', 'erro', 'status', 'executar_apos', 'concluida_em', 'atualizada_em', 'parametros',
+        ])
+    else:
+        tarefa.tentativas += 1
+        tarefa.status = Tarefa.CONCLUIDA
+        tarefa.resultado = resultado
+        tarefa.erro = ''
+        tarefa.concluida_em = timezone.now()
+        _apagar_sensiveis(tarefa)
+        tarefa.save(update_fields=[
+            'tentativas', 'status', 'resultado', 'erro', 'concluida_em', 'atualizada_em', 'parametros',
+        ])
+    finally:
+        close_old_connections()
+    return tarefa
+
+
+# --- Tarefas disponíveis ---
+
+@registrar('gerar_boletins')
+def tarefa_gerar_boletins(tarefa, ano_letivo, refazer=False, workers=None):
+    return gerar_boletins(
+        ano_letivo, workers=workers, refazer=refazer,
+        progresso=lambda feito, total: atualizar_progresso(tarefa, feito, total),
+    )
+
+
+@registrar('importar_pessoas', sensiveis=('conteudo',))  # CSV com as senhas em texto
+def tarefa_importar_pessoas(tarefa, conteudo, workers=None, administracao_staff=False):
+    try:
+        return importar(
+            ler_csv(conteudo), workers=workers, administracao_staff=administracao_staff,
+            progresso=lambda feito, total: atualizar_progresso(tarefa, feito, total),
+        )
+    except ErroImportacao as exc:
+        raise FalhaDefinitiva({'erros': exc.erros})
+
+
+@registrar('rebuild_search_index')
+def tarefa_rebuild_search_index(tarefa):
+    call_command('rebuild_search_index', progresso=lambda feito, total: atualizar_progresso(tarefa, feito, total))
+    return {'ok': True}
+
+
+@registrar('arquivar_notas')
+def tarefa_arquivar_notas(tarefa, ano_letivo):
+    return {'arquivadas': arquivar_ano(ano_letivo, progresso=lambda feito: atualizar_progresso(tarefa, feito))}
@@ -0,0 +1,307 @@
+# api/limites.py
+
+"""
+Limites de taxa (throttles do DRF com token bucket) e controle de admissão.
+
+Throttles, configurados em REST_FRAMEWORK['DEFAULT_THROTTLE_CLASSES'] com as
+taxas em REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] ('N/periodo' = rajada de N
+requisições, reposição de N por período):
+
+* `LimitePorIP`: anônimos, por IP (escopo 'anon');
+* `LimitePorPapel`: autenticados, por usuário, com a taxa do papel
+  ('staff', 'professor', 'aluno', 'responsavel' ou 'user');
+* `LimitePorEscopo`: views com `throttle_scope` (token, registro), por IP,
+  somado aos anteriores.
+
+Os baldes ficam em `settings.LIMITES_BACKEND`:
+
+* `api.limites.BaldesMemoria` (padrão): dict no processo, O(1) por request;
+* `api.limites.BaldesCache`: cache do Django (`settings.LIMITES_CACHE`),
+  compartilhado entre os workers quando o cache é (memcached, redis, arquivo).
+  Leitura e escrita não são atômicas: sob concorrência o limite pode passar
+  um pouco.
+
+`ControleAdmissao` (middleware) recusa com 503 antes de chegar ao banco quando
+o processo já tem `ADMISSAO_MAX_CONCORRENCIA` requests em andamento, ou quando
+o request esperou mais de `ADMISSAO_MAX_ESPERA_FILA_MS` na fila do
+roteador/proxy (header X-Request-Start). O segundo critério vale também para
+workers síncronos do gunicorn, em que cada processo atende um request por vez.
+
+Os contadores (`contadores.copia()`) são por processo, expostos em
+`/api/limites/` para staff.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+# Rotas de longa duração que não ocupam slot de concorrência
+ROTAS_SEM_ADMISSAO = ('/api/notas/eventos/',)
+
+
+class Contadores:
+    """Contadores por processo para monitoramento. Thread-safe."""
+
+    def __init__(self):
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, nome, valor=1):
+        with self._lock:
+            self._valores[nome] = self._valores.get(nome, 0) + valor
+
+    def maximo(self, nome, valor):
+        with self._lock:
+            self._valores[nome] = max(self._valores.get(nome, 0), valor)
+
+    def copia(self):
+        with self._lock:
+            return dict(self._valores)
+
+    def zerar(self):
+        with self._lock:
+            self._valores.clear()
+
+
+contadores = Contadores()
+
+
+# --- Baldes ---
+
+def _reabastecer(balde, capacidade, taxa, agora):
+    """(tokens, atualizado_em) -> tokens disponíveis agora."""
+    if balde is None:
+        return capacidade
+    tokens, atualizado_em = balde
+    return min(capacidade, tokens + (agora - atualizado_em) * taxa)
+
+
+def _consumir(tokens, taxa):
+    """Retorna (permitido, tokens restantes, segundos até o próximo token)."""
+    if tokens >= 1:
+        return True, tokens - 1, 0
+    return False, tokens, (1 - tokens) / taxa
+
+
+class BaldesMemoria:
+    """
+    Token buckets em um dict do processo, em ordem de último uso (LRU). Acima de
+    `max_chaves` sai o balde usado há mais tempo, que é o que mais
+    provavelmente já encheu de novo (e balde cheio equivale a inexistente).
+    """
+    max_chaves = 100_000
+
+    def __init__(self):
+        self._baldes = OrderedDict()  # chave -> (tokens, atualizado_em)
+        self._lock = threading.Lock()
+
+    def consumir(self, chave, capacidade, taxa):
+        agora = time.monotonic()
+        with self._lock:
+            tokens = _reabastecer(self._baldes.get(chave), capacidade, taxa, agora)
+            permitido, tokens, espera = _consumir(tokens, taxa)
+            self._baldes[chave] = (tokens, agora)
+            self._baldes.move_to_end(chave)
+            if len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+        return permitido, espera
+
+    def limpar(self):
+        with self._lock:
+            self._baldes.clear()
+
+
+class BaldesCache:
+    """Token buckets no cache do Django, compartilhados entre processos."""
+    prefixo = 'limites'
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'LIMITES_CACHE', 'default')]
+
+    def consumir(self, chave, capacidade, taxa):
+        agora = time.time()
+        chave = f'{self.prefixo}:{chave}'
+        tokens = _reabastecer(self.cache.get(chave), capacidade, taxa, agora)
+        permitido, tokens, espera = _consumir(tokens, taxa)
+        # Depois de encher de novo o balde pode expirar
+        self.cache.set(chave, (tokens, agora), timeout=math.ceil(capacidade / taxa) + 1)
+        return permitido, espera
+
+    def limpar(self):
+        self.cache.clear()
+
+
+_baldes = None
+
+
+def get_baldes():
+    global _baldes
+    if _baldes is None:
+        caminho = getattr(settings, 'LIMITES_BACKEND', 'api.limites.BaldesMemoria')
+        _baldes = import_string(caminho)()
+    return _baldes
+
+
+# --- Throttles ---
+
+PERIODOS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def ler_taxa(escopo):
+    """'N/periodo' do escopo -> (capacidade, tokens por segundo), ou None se sem limite."""
+    taxa = api_settings.DEFAULT_THROTTLE_RATES.get(escopo)
+    if not taxa:
+        return None
+    quantidade, periodo = taxa.split('/')
+    return int(quantidade), int(quantidade) / PERIODOS[periodo[0]]
+
+
+class LimiteTokenBucket(BaseThrottle):
+    """Base: um balde por (escopo, identificação). Subclasses definem os dois."""
+
+    def get_escopo(self, request, view):
+        raise NotImplementedError
+
+    def get_chave(self, request, view):
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        self.espera = None
+        escopo = self.get_escopo(request, view)
+        taxa = escopo and ler_taxa(escopo)
+        if not taxa:
+            return True
+        permitido, self.espera = get_baldes().consumir(f'{escopo}:{self.get_chave(request, view)}', *taxa)
+        if not permitido:
+            contadores.incrementar(f'limitados.{escopo}')
+        return permitido
+
+    def wait(self):
+        return self.espera
+
+
+class LimitePorIP(LimiteTokenBucket):
+    def get_escopo(self, request, view):
+        return None if request.user and request.user.is_authenticated else 'anon'
+
+
+class LimitePorPapel(LimiteTokenBucket):
+    def get_escopo(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return None
+        if user.is_staff:
+            return 'staff'
+        for papel, perfil in (('professor', 'professor_profile'), ('aluno', 'aluno_profile'),
+                              ('responsavel', 'responsavel_profile')):
+            if hasattr(user, perfil):
+                return papel
+        return 'user'
+
+    def get_chave(self, request, view):
+        return request.user.pk
+
+
+class LimitePorEscopo(LimiteTokenBucket):
+    def get_escopo(self, request, view):
+        return getattr(view, 'throttle_scope', None)
+
+
+# --- Admissão ---
+
+def espera_na_fila_ms(request):
+    """
+    Tempo que o request esperou antes de chegar ao Django, pelo header
+    X-Request-Start ('1697700000123' em ms, como no Heroku, ou 't=1697700000.123'
+    em segundos, como no nginx), ou None sem header.
+    """
+    valor = request.META.get('HTTP_X_REQUEST_START', '').removeprefix('t=')
+    try:
+        inicio = float(valor)
+    except ValueError:
+        return None
+    if inicio < 1e11:  # Segundos
+        inicio *= 1000
+    elif inicio > 1e14:  # Microssegundos
+        inicio /= 1000
+    return max(0.0, time.time() * 1000 - inicio)
+
+
+class ControleAdmissao:
+    """Middleware: recusa com 503 quando o processo está saturado ou o request envelheceu na fila."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+        self.max_concorrencia = getattr(settings, 'ADMISSAO_MAX_CONCORRENCIA', None)
+        self.max_espera_fila_ms = getattr(settings, 'ADMISSAO_MAX_ESPERA_FILA_MS', None)
+        self.em_andamento = 0
+        self._lock = threading.Lock()
+
+    def recusar(self, motivo):
+        contadores.incrementar(f'recusados.{motivo}')
+        response = JsonResponse(
+            {'detail': "Servidor sobrecarregado. Tente novamente em instantes."}, status=503
+        )
+        response['Retry-After'] = '1'
+        return response
+
+    def admitir(self, request):
+        """Ocupa um slot e retorna None, ou retorna a resposta de recusa."""
+        espera = espera_na_fila_ms(request)
+        if espera is not None and self.max_espera_fila_ms and espera > self.max_espera_fila_ms:
+            # O cliente provavelmente já desistiu: não vale gastar banco com ele
+            return self.recusar('fila')
+        with self._lock:
+            if self.max_concorrencia and self.em_andamento >= self.max_concorrencia:
+                lotado = True
+            else:
+                lotado = False
+                self.em_andamento += 1
+                em_andamento = self.em_andamento
+        if lotado:
+            return self.recusar('concorrencia')
+        contadores.incrementar('admitidos')
+        contadores.maximo('pico_concorrencia', em_andamento)
+        return None
+
+    def liberar(self):
+        with self._lock:
+            self.em_andamento -= 1
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if request.path in ROTAS_SEM_ADMISSAO:
+            return self.get_response(request)
+        recusa = self.admitir(request)
+        if recusa is not None:
+            return recusa
+        try:
+            return self.get_response(request)
+        finally:
+            self.liberar()
+
+    async def __acall__(self, request):
+        if request.path in ROTAS_SEM_ADMISSAO:
+            return await self.get_response(request)
+        recusa = self.admitir(request)
+        if recusa is not None:
+            return recusa
+        try:
+            return await self.get_response(request)
+        finally:
+            self.liberar()
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.arquivo import TAMANHO_LOTE, arquivar_ano, restaurar_ano
+
+
+class Command(BaseCommand):
+    help = "Move as notas de um ano letivo encerrado para o arquivo (NotasArquivadas), ou de volta com --restaurar."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano_letivo', type=int)
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Notas movidas por transação.")
+        parser.add_argument('--restaurar', action='store_true', help="Devolve as notas arquivadas do ano para a tabela Notas.")
+
+    def handle(self, *args, **options):
+        def progresso(movidas):
+            self.stdout.write(f"\r{movidas} nota(s) movida(s)", ending='')
+            self.stdout.flush()
+
+        mover = restaurar_ano if options['restaurar'] else arquivar_ano
+        try:
+            movidas = mover(options['ano_letivo'], tamanho_lote=options['lote'], progresso=progresso)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"{movidas} nota(s) de {options['ano_letivo']} {'restaurada(s)' if options['restaurar'] else 'arquivada(s)'}."
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.boletins import TAMANHO_LOTE, diretorio_boletins, gerar_boletins
+
+
+class Command(BaseCommand):
+    help = "Gera os boletins (HTML) de todos os alunos de um ano letivo em MEDIA_ROOT/boletins/<ano>/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano_letivo', type=int)
+        parser.add_argument('--workers', type=int, default=None, help="Processos de renderização (padrão: núcleos da máquina).")
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Alunos por lote de consultas.")
+        parser.add_argument('--refazer', action='store_true', help="Regera também os boletins já existentes.")
+
+    def handle(self, *args, **options):
+        ano_letivo = options['ano_letivo']
+
+        def progresso(feitos, total):
+            self.stdout.write(f"\r{feitos}/{total} boletins", ending='')
+            self.stdout.flush()
+
+        resumo = gerar_boletins(
+            ano_letivo,
+            workers=options['workers'],
+            refazer=options['refazer'],
+            tamanho_lote=options['lote'],
+            progresso=progresso,
+        )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumo['gerados']} gerado(s), {resumo['pulados']} já existente(s) em {diretorio_boletins(ano_letivo)}."
+        ))
@@ -0,0 +1,45 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.onboarding import ErroImportacao, importar, ler_csv, validar
+
+
+class Command(BaseCommand):
+    help = "Cadastra em lote usuários e perfis (alunos, professores, responsáveis, administração) a partir de um CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="Caminho do CSV (ver api/onboarding.py para as colunas).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Processos usados para gerar os hashes de senha.")
+        parser.add_argument('--dry-run', action='store_true', help="Apenas valida o arquivo.")
+        parser.add_argument('--administracao-staff', action='store_true',
+                            help="Dá acesso de staff aos usuários do tipo 'administracao'.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                conteudo = arquivo.read()
+        except OSError as exc:
+            raise CommandError(f"Não foi possível ler o arquivo: {exc}")
+
+        inicio = time.perf_counter()
+        try:
+            linhas = ler_csv(conteudo)
+            if options['dry_run']:
+                validar(linhas)
+                self.stdout.write(self.style.SUCCESS(f"{len(linhas)} linha(s) válida(s)."))
+                return
+            resumo = importar(linhas, workers=options['workers'], administracao_staff=options['administracao_staff'])
+        except ErroImportacao as exc:
+            for numero, mensagens in exc.erros.items():
+                for mensagem in mensagens:
+                    self.stderr.write(f"Linha {numero}: {mensagem}")
+            raise CommandError(str(exc))
+
+        for tipo, total in resumo.items():
+            self.stdout.write(f"{tipo}: {total}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(linhas)} pessoa(s) cadastrada(s) em {time.perf_counter() - inicio:.1f}s."
+        ))
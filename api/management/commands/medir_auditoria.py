@@ -0,0 +1,101 @@
+import datetime
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import auditoria
+from api.models import Alunos, AuditoriaNotas, Avaliacoes, Classes, Notas
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o custo da auditoria de notas: PATCH /api/notas/<id>/ com e sem os receivers, "
+        "em rodadas intercaladas, e a descarga do buffer. Roda num banco de teste descartável."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="PATCHs por rodada e modo.")
+        parser.add_argument('--rodadas', type=int, default=8)
+
+    def handle(self, *args, **options):
+        # Banco novo (como o do `manage.py test`): os dados e a trilha gerados não tocam o real
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Sem taxas: o limite por usuário cortaria as rodadas seguintes
+            sem_limites = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+            with override_settings(ALLOWED_HOSTS=['testserver'], REST_FRAMEWORK=sem_limites):
+                self.medir(options['requests'], options['rodadas'])
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+    def preparar(self, quantidade):
+        staff = User.objects.create_user('medir-auditoria', password='x', is_staff=True)
+        turma = Classes.objects.create(nome='Turma medição', ano_letivo=datetime.date.today().year)
+        avaliacao = Avaliacoes.objects.create(nome='Avaliação medição', classe=turma)
+        notas = []
+        for indice in range(quantidade):
+            aluno = Alunos.objects.create(
+                nome=f'Aluno {indice}', rg=f'RG{indice}', ra=f'RA{indice}',
+                data_de_nascimento=datetime.date(2010, 1, 1),
+            )
+            notas.append(Notas.objects.create(aluno=aluno, avaliacao=avaliacao, nota=5))
+        client = APIClient()
+        client.force_authenticate(staff)
+        return client, [nota.id for nota in notas]
+
+    def rodada(self, client, ids, valor, auditando):
+        if not auditando:
+            post_save.disconnect(sender=Notas, dispatch_uid='api_auditoria_nota_salva')
+            post_delete.disconnect(sender=Notas, dispatch_uid='api_auditoria_nota_removida')
+        try:
+            inicio = time.perf_counter()
+            for nota_id in ids:
+                response = client.patch(f'/api/notas/{nota_id}/', {'nota': valor}, format='json')
+                if response.status_code != 200:
+                    raise RuntimeError(f"PATCH {nota_id}: {response.status_code} {response.content[:200]!r}")
+            return (time.perf_counter() - inicio) / len(ids) * 1e6
+        finally:
+            if not auditando:
+                post_save.connect(auditoria.auditar_nota_salva, sender=Notas, dispatch_uid='api_auditoria_nota_salva')
+                post_delete.connect(auditoria.auditar_nota_removida, sender=Notas, dispatch_uid='api_auditoria_nota_removida')
+
+    def medir(self, quantidade, rodadas):
+        client, ids = self.preparar(quantidade)
+        auditoria.buffer.descarregar()
+        tempos = {True: [], False: []}
+        for indice in range(rodadas):
+            # Alterna quem vai primeiro para não favorecer um dos modos (cache, JIT do SQLite)
+            modos = (False, True) if indice % 2 == 0 else (True, False)
+            for auditando in modos:
+                # Valor novo a cada rodada: PATCH com o mesmo valor não gera registro
+                valor = f'{(indice * 2 + auditando) % 10}.5'
+                tempos[auditando].append(self.rodada(client, ids, valor, auditando))
+        auditoria.buffer.descarregar()
+        gravados = AuditoriaNotas.objects.filter(acao=AuditoriaNotas.ATUALIZADA).count()
+
+        # Descarga isolada de um lote do tamanho que dispara a gravação ao fim do request
+        for nota in Notas.objects.all()[:auditoria.TAMANHO_BUFFER]:
+            auditoria.buffer.adicionar(AuditoriaNotas(
+                nota_id=nota.id, aluno_id=nota.aluno_id, avaliacao_id=nota.avaliacao_id,
+                acao=AuditoriaNotas.ATUALIZADA, valor_anterior=nota.nota, valor_novo=nota.nota,
+                registrado_em=timezone.now(),
+            ))
+        lote = len(auditoria.buffer)
+        inicio = time.perf_counter()
+        auditoria.buffer.descarregar()
+        descarga_ms = (time.perf_counter() - inicio) * 1000
+
+        sem, com = statistics.median(tempos[False]), statistics.median(tempos[True])
+        self.stdout.write(f"{connection.vendor}, {quantidade} PATCH x {rodadas} rodadas intercaladas (mediana por rodada)")
+        self.stdout.write(f"  sem auditoria: {sem:8.0f} us/request")
+        self.stdout.write(f"  com auditoria: {com:8.0f} us/request  ({(com - sem) / sem:+.1%}, {gravados} registros)")
+        self.stdout.write(f"  descarga de {lote} registros: {descarga_ms:.1f} ms")
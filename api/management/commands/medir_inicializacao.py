@@ -0,0 +1,112 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Executado num processo novo: importa a aplicação WSGI e atende um request
+SCRIPT = r'''
+import io, json, os, resource, sys, time
+inicio = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'escola_dashboard.settings')
+from escola_dashboard.wsgi import application
+importado = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+
+
+def atender():
+    environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'localhost', 'wsgi.input': io.BytesIO()}
+    setup_testing_defaults(environ)
+    status = []
+    b''.join(application(environ, lambda s, h, exc_info=None: status.append(s)))
+    return status[0]
+
+
+def memoria_privada_mb():
+    # Páginas só deste processo (as herdadas do mestre e não alteradas não contam)
+    try:
+        with open('/proc/self/smaps_rollup') as arquivo:
+            linhas = dict(linha.split(':', 1) for linha in arquivo if ':' in linha)
+    except OSError:
+        return None
+    return sum(int(linhas[chave].split()[0]) for chave in ('Private_Clean', 'Private_Dirty')) / 1024
+
+
+# Worker criado por fork depois do import, como com preload_app do gunicorn
+if getattr(os, 'fork', None):
+    from api.inicializacao import antes_do_fork
+    antes_do_fork()
+    leitura, escrita = os.pipe()
+    bifurcado = time.perf_counter()
+    if os.fork() == 0:
+        atender()
+        medida = {'preload_resposta_ms': (time.perf_counter() - bifurcado) * 1000, 'preload_privada_mb': memoria_privada_mb()}
+        os.write(escrita, json.dumps(medida).encode())
+        os._exit(0)
+    os.close(escrita)
+    os.wait()
+    with os.fdopen(leitura) as pipe:
+        preload = json.loads(pipe.read())
+else:
+    preload = {'preload_resposta_ms': None, 'preload_privada_mb': None}
+
+antes = time.perf_counter()
+status = atender()
+respondido = time.perf_counter()
+print(json.dumps({
+    'importacao_ms': (importado - inicio) * 1000,
+    'primeira_resposta_ms': (respondido - antes) * 1000,
+    'status': status,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modulos': len(sys.modules),
+    **preload,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a inicialização de um worker em processos novos: importação da aplicação WSGI, "
+        "tempo até a primeira resposta e memória, por perfil de settings (DJANGO_PERFIL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfis', default='completo,api', help="Perfis comparados (separados por vírgula).")
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument('--url', default='/api/materias/', help="Caminho do primeiro request.")
+
+    def medir(self, perfil, url):
+        env = {**os.environ, 'DJANGO_PERFIL': perfil, 'PYTHONDONTWRITEBYTECODE': '1'}
+        processo = subprocess.run(
+            [sys.executable, '-c', SCRIPT, url],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if processo.returncode != 0:
+            raise CommandError(f"Perfil '{perfil}' falhou:\n{processo.stderr}")
+        return json.loads(processo.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        def formatar(valor, unidade):
+            return '-' if valor is None else f'{valor:.1f}{unidade}'
+
+        colunas = ('importação', '1ª resposta', 'RSS', 'módulos', 'fork: 1ª resposta', 'fork: privada')
+        self.stdout.write(f"{'perfil':<10}" + ''.join(f'{coluna:>19}' for coluna in colunas) + '  status')
+        for perfil in options['perfis'].split(','):
+            medidas = [self.medir(perfil, options['url']) for _ in range(options['repeticoes'])]
+
+            def mediana(chave):
+                valores = [medida[chave] for medida in medidas if medida[chave] is not None]
+                return statistics.median(valores) if valores else None
+
+            valores = (
+                formatar(mediana('importacao_ms'), 'ms'),
+                formatar(mediana('primeira_resposta_ms'), 'ms'),
+                formatar(mediana('rss_mb'), 'MB'),
+                str(mediana('modulos')),
+                formatar(mediana('preload_resposta_ms'), 'ms'),
+                formatar(mediana('preload_privada_mb'), 'MB'),
+            )
+            self.stdout.write(f'{perfil:<10}' + ''.join(f'{valor:>19}' for valor in valores) + f"  {medidas[-1]['status']}")
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import Administracao, Professores, Responsaveis, Alunos
+from api.search import instalar_indice_busca
+
+MODELOS_BUSCAVEIS = (Administracao, Professores, Responsaveis, Alunos)
+
+
+class Command(BaseCommand):
+    help = "Recalcula termos_busca e recria os índices de busca (FTS5 no SQLite, trigram no PostgreSQL)."
+    # Callback (feito, total) usado pela tarefa 'rebuild_search_index' (api/jobs.py)
+    stealth_options = ('progresso',)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        progresso = options.get('progresso')
+        total_geral = sum(model.objects.count() for model in MODELOS_BUSCAVEIS) if progresso else None
+        feito = 0
+        for model in MODELOS_BUSCAVEIS:
+            total = 0
+            ultimo_id = 0
+            while True:
+                # Um lote por transação: o progresso (heartbeat da tarefa) fica visível aos outros workers
+                with transaction.atomic():
+                    lote = list(
+                        model.objects.filter(id__gt=ultimo_id).order_by('id')
+                        .only('id', *model.campos_busca)[:batch_size]
+                    )
+                    for pessoa in lote:
+                        pessoa.atualizar_termos_busca()
+                    model.objects.bulk_update(lote, ['termos_busca'])
+                if not lote:
+                    break
+                ultimo_id = lote[-1].id
+                total += len(lote)
+                feito += len(lote)
+                if progresso:
+                    progresso(feito, total_geral)
+            instalar_indice_busca(connection, model)
+            self.stdout.write(f"{model.__name__}: {total} registros indexados")
+        self.stdout.write(self.style.SUCCESS("Índices de busca atualizados."))
@@ -0,0 +1,66 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import executar, identificacao_worker, liberar_travadas, reservar_proximas
+
+# Segundos entre buscas por tarefas travadas (no máximo --stale-after)
+INTERVALO_LIBERACAO = 60
+
+
+class Command(BaseCommand):
+    help = "Executa as tarefas da fila em banco (api.models.Tarefa) com concorrência limitada."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="Tarefas executadas ao mesmo tempo.")
+        parser.add_argument('--poll', type=float, default=2.0, help="Segundos entre consultas à fila quando ociosa.")
+        parser.add_argument('--stale-after', type=int, default=900,
+                            help="Segundos sem heartbeat para devolver uma tarefa 'executando' à fila.")
+        parser.add_argument('--once', action='store_true', help="Processa o que estiver pendente e sai.")
+
+    def handle(self, *args, **options):
+        concorrencia = options['concurrency']
+        worker = identificacao_worker()
+        self.parar = False
+        signal.signal(signal.SIGTERM, self._sinal_parar)
+        signal.signal(signal.SIGINT, self._sinal_parar)
+
+        self.stdout.write(f"Worker {worker} iniciado (concorrência {concorrencia}).")
+
+        em_execucao = set()
+        # Tarefas de workers que morreram enquanto este roda também precisam voltar à fila
+        intervalo_liberacao = min(INTERVALO_LIBERACAO, options['stale_after'])
+        proxima_liberacao = 0
+        with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+            while not self.parar:
+                if time.monotonic() >= proxima_liberacao:
+                    self._liberar_travadas(options['stale_after'])
+                    proxima_liberacao = time.monotonic() + intervalo_liberacao
+                em_execucao = {futuro for futuro in em_execucao if not futuro.done()}
+                livres = concorrencia - len(em_execucao)
+                tarefas = reservar_proximas(livres, worker=worker) if livres else []
+                for tarefa in tarefas:
+                    self.stdout.write(f"Executando {tarefa}")
+                    em_execucao.add(pool.submit(self._executar, tarefa))
+                if options['once'] and not tarefas and not em_execucao:
+                    break
+                if not tarefas:
+                    time.sleep(options['poll'] if not options['once'] else 0.1)
+        self.stdout.write("Worker finalizado.")
+
+    def _liberar_travadas(self, tempo_limite):
+        devolvidas, falhas = liberar_travadas(tempo_limite)
+        if devolvidas:
+            self.stdout.write(f"{devolvidas} tarefa(s) travada(s) devolvida(s) à fila.")
+        if falhas:
+            self.stdout.write(f"{falhas} tarefa(s) travada(s) sem tentativas restantes marcada(s) como falha.")
+
+    def _executar(self, tarefa):
+        tarefa = executar(tarefa)
+        self.stdout.write(f"{tarefa}")
+
+    def _sinal_parar(self, signum, frame):
+        # Termina as tarefas em andamento e para de reservar novas
+        self.parar = True
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avaliacoes',
+            name='classe',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='avaliacoes', to='api.classes'),
+        ),
+        migrations.AddField(
+            model_name='avaliacoes',
+            name='materia',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='avaliacoes', to='api.materias'),
+        ),
+        migrations.AddIndex(
+            model_name='avaliacoes',
+            index=models.Index(fields=['classe', 'materia'], name='avaliacao_classe_materia_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:46
+
+from django.db import migrations, models
+
+from api.search import instalar_indice_busca, normalizar_busca, remover_indice_busca
+
+CAMPOS_BUSCA = {
+    'Administracao': ('nome', 'cpf'),
+    'Professores': ('nome', 'cpf'),
+    'Responsaveis': ('nome', 'cpf'),
+    'Alunos': ('nome', 'ra', 'rg'),
+}
+
+
+def preencher_e_indexar(apps, schema_editor):
+    for nome_modelo, campos in CAMPOS_BUSCA.items():
+        model = apps.get_model('api', nome_modelo)
+        pessoas = list(model.objects.only('id', *campos))
+        for pessoa in pessoas:
+            pessoa.termos_busca = normalizar_busca(*(getattr(pessoa, campo) for campo in campos))
+        model.objects.bulk_update(pessoas, ['termos_busca'], batch_size=1000)
+        instalar_indice_busca(schema_editor.connection, model)
+
+
+def remover_indices(apps, schema_editor):
+    for nome_modelo in CAMPOS_BUSCA:
+        remover_indice_busca(schema_editor.connection, apps.get_model('api', nome_modelo))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_avaliacoes_classe_materia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='administracao',
+            name='termos_busca',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='alunos',
+            name='termos_busca',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='professores',
+            name='termos_busca',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='responsaveis',
+            name='termos_busca',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(preencher_e_indexar, remover_indices),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_termos_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notas',
+            index=models.Index(fields=['data_registro'], name='nota_data_registro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notas',
+            index=models.Index(fields=['nota'], name='nota_valor_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_notas_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=100)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('max_tentativas', models.PositiveIntegerField(default=3)),
+                ('progresso_feito', models.PositiveIntegerField(default=0)),
+                ('progresso_total', models.PositiveIntegerField(blank=True, null=True)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('worker', models.CharField(blank=True, default='', max_length=255)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('executar_apos', models.DateTimeField(blank=True, null=True)),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+                ('criada_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tarefas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'executar_apos', 'id'], name='tarefa_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:14
+
+from django.db import migrations, models
+
+from api.search import instalar_indice_busca
+
+
+def reinstalar_indices_busca(apps, schema_editor):
+    # No SQLite o AddField acima recria as tabelas e descarta os triggers do FTS5
+    for nome_modelo in ('Administracao', 'Professores', 'Responsaveis', 'Alunos'):
+        instalar_indice_busca(schema_editor.connection, apps.get_model('api', nome_modelo))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_tarefa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='administracao',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='alunos',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='avaliacoes',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='classes',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='materias',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='notas',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='professores',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='responsaveis',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='RegistroRemocao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=50)),
+                ('objeto_id', models.BigIntegerField()),
+                ('aluno_id', models.BigIntegerField(blank=True, null=True)),
+                ('removido_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['modelo', 'removido_em'], name='remocao_modelo_data_idx')],
+            },
+        ),
+        migrations.RunPython(reinstalar_indices_busca, migrations.RunPython.noop),
+    ]
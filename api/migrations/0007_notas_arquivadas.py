@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import ExtractYear
+
+
+def preencher_ano_letivo(apps, schema_editor):
+    Notas = apps.get_model('api', 'Notas')
+    Avaliacoes = apps.get_model('api', 'Avaliacoes')
+    ano_da_turma = Avaliacoes.objects.filter(pk=OuterRef('avaliacao_id')).values('classe__ano_letivo')[:1]
+    Notas.objects.filter(avaliacao__classe__isnull=False).update(ano_letivo=Subquery(ano_da_turma))
+    Notas.objects.filter(avaliacao__classe__isnull=True).update(ano_letivo=ExtractYear('data_registro'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_rastreamento_alteracoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotasArquivadas',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('nota', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('data_registro', models.DateField()),
+                ('ano_letivo', models.PositiveSmallIntegerField()),
+                ('atualizado_em', models.DateTimeField()),
+                ('arquivada_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='notas',
+            name='ano_letivo',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(preencher_ano_letivo, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notas',
+            index=models.Index(fields=['ano_letivo', 'aluno'], name='nota_ano_aluno_idx'),
+        ),
+        migrations.AddField(
+            model_name='notasarquivadas',
+            name='aluno',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notas_arquivadas', to='api.alunos'),
+        ),
+        migrations.AddField(
+            model_name='notasarquivadas',
+            name='atribuida_por',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notas_arquivadas_atribuidas', to='api.professores'),
+        ),
+        migrations.AddField(
+            model_name='notasarquivadas',
+            name='avaliacao',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notas_arquivadas', to='api.avaliacoes'),
+        ),
+        migrations.AddIndex(
+            model_name='notasarquivadas',
+            index=models.Index(fields=['aluno', 'ano_letivo'], name='nota_arq_aluno_ano_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notasarquivadas',
+            index=models.Index(fields=['ano_letivo'], name='nota_arq_ano_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_notas_arquivadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditoriaNotas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nota_id', models.BigIntegerField()),
+                ('aluno_id', models.BigIntegerField()),
+                ('avaliacao_id', models.BigIntegerField()),
+                ('acao', models.CharField(choices=[('criada', 'Criada'), ('atualizada', 'Atualizada'), ('removida', 'Removida')], max_length=10)),
+                ('valor_anterior', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('valor_novo', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('usuario', models.CharField(blank=True, max_length=150)),
+                ('registrado_em', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['aluno_id', 'id'], name='auditoria_aluno_idx'), models.Index(fields=['avaliacao_id', 'id'], name='auditoria_avaliacao_idx')],
+            },
+        ),
+    ]
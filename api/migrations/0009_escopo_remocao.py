@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_auditoria_notas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscopoRemocao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('responsavel', 'Responsável'), ('classe', 'Turma'), ('professor', 'Professor')], max_length=20)),
+                ('ref_id', models.BigIntegerField()),
+                ('remocao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escopo', to='api.registroremocao')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tipo', 'ref_id'], name='escopo_remocao_ref_idx')],
+            },
+        ),
+    ]
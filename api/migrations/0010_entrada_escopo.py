@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_escopo_remocao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntradaEscopo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classe_id', models.BigIntegerField(blank=True, null=True)),
+                ('aluno_id', models.BigIntegerField(blank=True, null=True)),
+                ('professor_id', models.BigIntegerField(blank=True, null=True)),
+                ('materia_id', models.BigIntegerField(blank=True, null=True)),
+                ('responsavel_id', models.BigIntegerField(blank=True, null=True)),
+                ('criada_em', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
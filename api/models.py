@@ -1,7 +1,39 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
-class Administracao(models.Model):
+from .search import normalizar_busca
+
+
+class Rastreavel(models.Model):
+    """Base abstrata com a data da última alteração, usada pelo sync incremental (/api/sync/)."""
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+
+class PessoaBuscavel(Rastreavel):
+    """Base abstrata para cadastros de pessoas pesquisáveis via `?search=` (ver api/search.py)."""
+    campos_busca = ('nome', 'cpf')
+
+    # Texto normalizado indexado pela busca; mantido em save()
+    termos_busca = models.TextField(editable=False, blank=True, default='')
+
+    class Meta(Rastreavel.Meta):
+        abstract = True
+
+    def atualizar_termos_busca(self):
+        self.termos_busca = normalizar_busca(*(getattr(self, campo) for campo in self.campos_busca))
+
+    def save(self, *args, **kwargs):
+        self.atualizar_termos_busca()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.campos_busca):
+            kwargs['update_fields'] = set(update_fields) | {'termos_busca'}
+        super().save(*args, **kwargs)
+
+class Administracao(PessoaBuscavel):
     """Modelo para funcionários administrativos da escola."""
     nome = models.CharField(max_length=255)
     cpf = models.CharField(max_length=14, unique=True) # Assumindo formato padrão de CPF
@@ -12,7 +44,7 @@ class Administracao(models.Model):
     def __str__(self):
         return self.nome
 
-class Professores(models.Model):
+class Professores(PessoaBuscavel):
     """Modelo para professores."""
     nome = models.CharField(max_length=255)
     cpf = models.CharField(max_length=14, unique=True)
@@ -23,7 +55,7 @@ class Professores(models.Model):
     def __str__(self):
         return self.nome
 
-class Responsaveis(models.Model):
+class Responsaveis(PessoaBuscavel):
     """Modelo para responsáveis de alunos."""
     nome = models.CharField(max_length=255)
     cpf = models.CharField(max_length=14, unique=True)
@@ -34,8 +66,10 @@ class Responsaveis(models.Model):
     def __str__(self):
         return self.nome
 
-class Alunos(models.Model):
+class Alunos(PessoaBuscavel):
     """Modelo para alunos."""
+    campos_busca = ('nome', 'ra', 'rg')
+
     nome = models.CharField(max_length=255)
     rg = models.CharField(max_length=20, unique=True) # Assumindo RG é único
     data_de_nascimento = models.DateField()
@@ -50,7 +84,7 @@ class Alunos(models.Model):
     def __str__(self):
         return f"{self.nome} ({self.ra})"
 
-class Materias(models.Model):
+class Materias(Rastreavel):
     """Modelo para matérias de estudo (ex: Matemática, História)."""
     nome = models.CharField(max_length=100, unique=True)
     descricao = models.TextField(blank=True, null=True) # Campo opcional
@@ -58,7 +92,7 @@ class Materias(models.Model):
     def __str__(self):
         return self.nome
 
-class Classes(models.Model):
+class Classes(Rastreavel):
     """Modelo para turmas ou classes de alunos."""
     nome = models.CharField(max_length=255, unique=True)
     ano_letivo = models.IntegerField() # Usando IntegerField para o ano letivo
@@ -75,17 +109,26 @@ class Classes(models.Model):
     def __str__(self):
         return self.nome
 
-class Avaliacoes(models.Model):
+class Avaliacoes(Rastreavel):
     """Modelo para tipos de avaliações (ex: 'Prova', 'Trabalho', 'Participação')."""
     nome = models.CharField(max_length=255, unique=True) # Assumindo nomes de avaliações são únicos globalmente
     descricao = models.TextField(blank=True, null=True) # Campo opcional
     #Professor responsável
     professor_responsavel = models.ForeignKey(Professores, on_delete=models.SET_NULL, null=True, blank=True, related_name='avaliacoes_criadas') # Se o professor for deletado, set to NULL
+    # Turma e matéria às quais a avaliação se aplica (usadas para filtrar o que alunos/responsáveis veem)
+    classe = models.ForeignKey(Classes, on_delete=models.SET_NULL, null=True, blank=True, related_name='avaliacoes', db_index=False) # Coberto pelo índice (classe, materia)
+    materia = models.ForeignKey(Materias, on_delete=models.SET_NULL, null=True, blank=True, related_name='avaliacoes')
 
     def __str__(self):
         return self.nome
 
-class Notas(models.Model):
+    class Meta:
+        indexes = [
+            # Listagem das avaliações de uma turma, opcionalmente por matéria
+            models.Index(fields=['classe', 'materia'], name='avaliacao_classe_materia_idx'),
+        ]
+
+class Notas(Rastreavel):
     """Modelo para armazenar a nota de um aluno para uma avaliação específica, vinculada a um professor."""
     # Armazenar nota como Decimal para precisão
     nota = models.DecimalField(max_digits=5, decimal_places=2)
@@ -102,12 +145,209 @@ class Notas(models.Model):
     # Adicionar um campo de data para quando a nota foi registrada
     data_registro = models.DateField(auto_now_add=True)
 
+    # Ano letivo da nota (turma da avaliação ou, sem turma, ano do registro); mantido em save()
+    # e por api/arquivo.py quando a avaliação/turma muda. Anos encerrados vão para NotasArquivadas
+    ano_letivo = models.PositiveSmallIntegerField(editable=False)
+
     def __str__(self):
         return f"Nota de {self.aluno.nome} para {self.avaliacao.nome}: {self.nota}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Valor lido do banco, para a auditoria registrar o valor anterior sem outra consulta
+        instancia._nota_original = instancia.__dict__.get('nota')
+        # Avaliação lida do banco: ano_letivo só é recalculado se ela mudar
+        instancia._avaliacao_original = instancia.__dict__.get('avaliacao_id')
+        return instancia
+
+    def definir_ano_letivo(self):
+        ano_da_turma = (
+            Avaliacoes.objects.filter(pk=self.avaliacao_id)
+            .values_list('classe__ano_letivo', flat=True).first()
+        )
+        self.ano_letivo = ano_da_turma or (self.data_registro or timezone.localdate()).year
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # __dict__: um ano_letivo adiado (only/defer) não deve gerar consulta aqui
+        recalcular = (self.__dict__.get('ano_letivo') is None
+                      or self.avaliacao_id != getattr(self, '_avaliacao_original', None))
+        if recalcular and (update_fields is None or 'avaliacao' in update_fields):
+            self.definir_ano_letivo()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'ano_letivo'}
+        super().save(*args, **kwargs)
+        self._avaliacao_original = self.avaliacao_id
+
     class Meta:
         # Opcional: Adicionar uma restrição para evitar notas duplicadas para o mesmo aluno/avaliação
         # Dependendo dos requisitos, você pode permitir várias notas para a mesma avaliação (ex: recuperações)
         # Adicionar unique_together para aluno e avaliacao é comum se apenas uma nota por avaliação for permitida
         unique_together = ('aluno', 'avaliacao')
-        pass
\ No newline at end of file
+        indexes = [
+            # Filtros/ordenação por período e faixa de nota (?data_registro_de=, ?nota_min=, ?ordering=)
+            models.Index(fields=['data_registro'], name='nota_data_registro_idx'),
+            models.Index(fields=['nota'], name='nota_valor_idx'),
+            # Listagem padrão (ano letivo atual), por aluno
+            models.Index(fields=['ano_letivo', 'aluno'], name='nota_ano_aluno_idx'),
+        ]
+
+
+class NotasArquivadas(models.Model):
+    """
+    Notas de anos letivos encerrados, movidas da tabela Notas por
+    `manage.py arquivar_notas` (ver api/arquivo.py). Mantêm o id original.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    nota = models.DecimalField(max_digits=5, decimal_places=2)
+    aluno = models.ForeignKey(Alunos, on_delete=models.CASCADE, related_name='notas_arquivadas', db_index=False) # Coberto pelo índice (aluno, ano_letivo)
+    avaliacao = models.ForeignKey(Avaliacoes, on_delete=models.CASCADE, related_name='notas_arquivadas')
+    atribuida_por = models.ForeignKey(Professores, on_delete=models.SET_NULL, null=True, blank=True, related_name='notas_arquivadas_atribuidas')
+    data_registro = models.DateField()
+    ano_letivo = models.PositiveSmallIntegerField()
+    atualizado_em = models.DateTimeField()
+    arquivada_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Nota arquivada {self.id} ({self.ano_letivo}): {self.nota}"
+
+    class Meta:
+        indexes = [
+            # Histórico de um aluno, opcionalmente por ano; e arquivamento/restauração de um ano inteiro
+            models.Index(fields=['aluno', 'ano_letivo'], name='nota_arq_aluno_ano_idx'),
+            models.Index(fields=['ano_letivo'], name='nota_arq_ano_idx'),
+        ]
+
+
+class Tarefa(models.Model):
+    """Tarefa pesada executada fora do request pelo `manage.py run_worker` (ver api/jobs.py)."""
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDA = 'concluida'
+    FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (CONCLUIDA, 'Concluída'),
+        (FALHOU, 'Falhou'),
+    ]
+
+    tipo = models.CharField(max_length=100) # Nome registrado em api/jobs.py
+    parametros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDENTE)
+    tentativas = models.PositiveIntegerField(default=0)
+    max_tentativas = models.PositiveIntegerField(default=3)
+    progresso_feito = models.PositiveIntegerField(default=0)
+    progresso_total = models.PositiveIntegerField(null=True, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    erro = models.TextField(blank=True, default='')
+    criada_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='tarefas')
+    worker = models.CharField(max_length=255, blank=True, default='') # Identificação do processo que executa a tarefa
+    criada_em = models.DateTimeField(auto_now_add=True)
+    executar_apos = models.DateTimeField(null=True, blank=True) # Backoff entre tentativas
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    atualizada_em = models.DateTimeField(auto_now=True) # Heartbeat: atualizado a cada progresso
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Fila: próximas tarefas pendentes em ordem de criação
+            models.Index(fields=['status', 'executar_apos', 'id'], name='tarefa_fila_idx'),
+        ]
+
+class RegistroRemocao(models.Model):
+    """Tombstone: registro apagado, para o sync incremental informar remoções aos clientes."""
+    modelo = models.CharField(max_length=50) # Nome do recurso na API (ex: 'notas')
+    objeto_id = models.BigIntegerField()
+    # Aluno ao qual o registro pertencia (Alunos/Notas), usado para filtrar por escopo
+    aluno_id = models.BigIntegerField(null=True, blank=True)
+    removido_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} removido em {self.removido_em}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['modelo', 'removido_em'], name='remocao_modelo_data_idx'),
+        ]
+
+
+class EscopoRemocao(models.Model):
+    """
+    Quem podia ver um registro removido, capturado no pre_delete (antes do
+    cascade apagar matrículas e vínculos com responsáveis).
+    """
+    RESPONSAVEL = 'responsavel'
+    CLASSE = 'classe'
+    PROFESSOR = 'professor' # Professor que atribuiu a nota
+    TIPO_CHOICES = [
+        (RESPONSAVEL, 'Responsável'),
+        (CLASSE, 'Turma'),
+        (PROFESSOR, 'Professor'),
+    ]
+
+    remocao = models.ForeignKey(RegistroRemocao, on_delete=models.CASCADE, related_name='escopo')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    ref_id = models.BigIntegerField() # Sem FK: o registro referenciado pode ser removido depois
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tipo', 'ref_id'], name='escopo_remocao_ref_idx'),
+        ]
+
+
+class EntradaEscopo(models.Model):
+    """
+    Vínculo criado entre dois registros (matrícula, professor ou matéria na
+    turma, responsável do aluno), para o sync incremental entregar a quem
+    passou a vê-los os registros que entraram no seu escopo sem terem sido
+    alterados. Cada linha liga um dono a um membro; os demais campos ficam nulos.
+    """
+    classe_id = models.BigIntegerField(null=True, blank=True)
+    aluno_id = models.BigIntegerField(null=True, blank=True)
+    professor_id = models.BigIntegerField(null=True, blank=True)
+    materia_id = models.BigIntegerField(null=True, blank=True)
+    responsavel_id = models.BigIntegerField(null=True, blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Entrada no escopo em {self.criada_em}"
+
+
+class AuditoriaNotas(models.Model):
+    """
+    Trilha de auditoria das notas, só de inserção: quem alterou, valor anterior e
+    novo. Gravada em lotes por api/auditoria.py; sem FKs para não checar
+    restrições a cada lote e para sobreviver à remoção da nota/usuário.
+    """
+    CRIADA = 'criada'
+    ATUALIZADA = 'atualizada'
+    REMOVIDA = 'removida'
+    ACAO_CHOICES = [
+        (CRIADA, 'Criada'),
+        (ATUALIZADA, 'Atualizada'),
+        (REMOVIDA, 'Removida'),
+    ]
+
+    nota_id = models.BigIntegerField()
+    aluno_id = models.BigIntegerField()
+    avaliacao_id = models.BigIntegerField()
+    acao = models.CharField(max_length=10, choices=ACAO_CHOICES)
+    valor_anterior = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    valor_novo = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    usuario = models.CharField(max_length=150, blank=True) # Username de quem alterou ('' = fora da API)
+    registrado_em = models.DateTimeField() # Momento da alteração, não da gravação do lote
+
+    def __str__(self):
+        return f"Nota #{self.nota_id} {self.acao}: {self.valor_anterior} -> {self.valor_novo}"
+
+    class Meta:
+        indexes = [
+            # Consulta por aluno ou por avaliação, paginada por id (CursorPagination)
+            models.Index(fields=['aluno_id', 'id'], name='auditoria_aluno_idx'),
+            models.Index(fields=['avaliacao_id', 'id'], name='auditoria_avaliacao_idx'),
+        ]
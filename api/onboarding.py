@@ -0,0 +1,273 @@
+# api/onboarding.py
+
+"""
+Cadastro em lote de pessoas (User + perfil) a partir de um CSV.
+
+Colunas: tipo (aluno | professor | responsavel | administracao), username,
+password, email, first_name, last_name, nome, cpf, rg, ra, data_de_nascimento
+(AAAA-MM-DD), celular e responsaveis_cpf (CPFs separados por ';', só para alunos).
+
+Os valores passam pelos validadores dos campos dos modelos (tamanho máximo,
+formato do username, email) e as senhas pelos AUTH_PASSWORD_VALIDATORS, como
+no cadastro individual. Linhas 'administracao' só recebem `is_staff` com
+`administracao_staff=True` (flag explícita da view e do comando).
+
+Fluxo: valida todas as linhas, checa unicidade contra o banco com uma consulta
+`IN` por campo (em lotes), gera os hashes de senha num pool de processos e
+insere tudo com `bulk_create` numa única transação. Usado pela view
+`OnboardingView` e pelo comando `manage.py importar_pessoas`.
+"""
+
+import csv
+import datetime
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Administracao, Professores, Responsaveis, Alunos
+
+TIPOS = {
+    'aluno': Alunos,
+    'professor': Professores,
+    'responsavel': Responsaveis,
+    'administracao': Administracao,
+}
+
+# Campos do perfil obrigatórios / únicos por tipo
+CAMPOS_OBRIGATORIOS = {
+    'aluno': ('nome', 'rg', 'ra', 'data_de_nascimento'),
+    'professor': ('nome', 'cpf', 'email', 'celular'),
+    'responsavel': ('nome', 'cpf', 'email', 'celular'),
+    'administracao': ('nome', 'cpf', 'email', 'celular'),
+}
+CAMPOS_UNICOS = {
+    'aluno': ('rg', 'ra', 'email'),
+    'professor': ('cpf', 'email'),
+    'responsavel': ('cpf', 'email'),
+    'administracao': ('cpf', 'email'),
+}
+CAMPOS_PERFIL = {
+    'aluno': ('nome', 'rg', 'ra', 'data_de_nascimento', 'email', 'celular'),
+    'professor': ('nome', 'cpf', 'email', 'celular'),
+    'responsavel': ('nome', 'cpf', 'email', 'celular'),
+    'administracao': ('nome', 'cpf', 'email', 'celular'),
+}
+
+# Colunas gravadas em User
+CAMPOS_USUARIO = ('username', 'email', 'first_name', 'last_name')
+
+TAMANHO_LOTE = 500
+
+# Máximo de linhas importadas dentro do request (sem ?assincrono=1). Cada hash de
+# senha custa ~0,5 s de CPU: bem mais que isso passaria do timeout do gunicorn
+MAX_LINHAS_SINCRONO = 20
+
+
+class ErroImportacao(Exception):
+    """Linhas inválidas: `erros` mapeia número da linha (1 = primeira linha de dados) -> mensagens."""
+
+    def __init__(self, erros):
+        super().__init__(f"{len(erros)} linha(s) inválida(s)")
+        self.erros = erros
+
+
+def decodificar(conteudo):
+    """Texto do arquivo enviado (UTF-8, com ou sem BOM). Levanta ErroImportacao."""
+    if isinstance(conteudo, str):
+        return conteudo
+    try:
+        return conteudo.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ErroImportacao({0: ["O arquivo precisa estar em UTF-8."]})
+
+
+def ler_csv(conteudo):
+    """
+    Lê o CSV (str ou bytes) em uma lista de dicts com valores sem espaços nas
+    pontas. Levanta ErroImportacao (linha 0) se o arquivo não puder ser lido.
+    """
+    leitor = csv.DictReader(io.StringIO(decodificar(conteudo)), strict=True)
+    try:
+        return [
+            {(chave or '').strip(): (valor or '').strip() for chave, valor in linha.items()}
+            for linha in leitor
+        ]
+    except csv.Error as exc:
+        raise ErroImportacao({0: [f"CSV inválido (linha {leitor.line_num}): {exc}."]})
+
+
+def _em_lotes(valores, tamanho=TAMANHO_LOTE):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def _existentes(model, campo, valores):
+    """Valores de `campo` que já existem no banco (uma consulta IN por lote)."""
+    encontrados = set()
+    for lote in _em_lotes(valores):
+        encontrados.update(model.objects.filter(**{f'{campo}__in': lote}).values_list(campo, flat=True))
+    return encontrados
+
+
+def _inicializar_worker():
+    # Com o start method "spawn" o processo filho não herda o Django configurado
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'escola_dashboard.settings')
+    django.setup()
+
+
+def _hash_lote(senhas):
+    return [make_password(senha) for senha in senhas]
+
+
+def gerar_hashes(senhas, workers=None, progresso=None):
+    """Hashes das senhas, em paralelo quando há mais de um lote. `progresso(feito, total)` a cada lote."""
+    lotes = list(_em_lotes(senhas, 50))
+    hashes = []
+
+    def coletar(resultados):
+        for resultado in resultados:
+            hashes.extend(resultado)
+            if progresso:
+                progresso(len(hashes), len(senhas))
+        return hashes
+
+    if workers == 1 or len(lotes) <= 1:
+        return coletar(_hash_lote(lote) for lote in lotes)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker) as pool:
+        return coletar(pool.map(_hash_lote, lotes))
+
+
+def validar(linhas):
+    """Valida as linhas contra si mesmas e contra o banco. Levanta ErroImportacao."""
+    erros = {}
+
+    def erro(numero, mensagem):
+        erros.setdefault(numero, []).append(mensagem)
+
+    vistos = {}  # (model, campo) -> {valor: primeira linha}
+    for numero, linha in enumerate(linhas, start=1):
+        tipo = linha.get('tipo', '').lower()
+        if tipo not in TIPOS:
+            erro(numero, f"tipo inválido: '{linha.get('tipo', '')}'.")
+            continue
+        linha['tipo'] = tipo
+        for campo in ('username', 'password') + CAMPOS_OBRIGATORIOS[tipo]:
+            if not linha.get(campo):
+                erro(numero, f"{campo} é obrigatório.")
+        # Mesmos validadores do cadastro individual: tamanho máximo, formato do username, email...
+        campos = {campo: User for campo in CAMPOS_USUARIO}
+        for campo in CAMPOS_PERFIL[tipo]:
+            campos.setdefault(campo, TIPOS[tipo])  # email: validado uma vez só
+        for campo, model in campos.items():
+            if campo == 'data_de_nascimento' or not linha.get(campo):
+                continue
+            try:
+                model._meta.get_field(campo).run_validators(linha[campo])
+            except ValidationError as exc:
+                erro(numero, f"{campo}: {' '.join(exc.messages)}")
+        if linha.get('password'):
+            usuario = User(**{campo: linha.get(campo, '') for campo in CAMPOS_USUARIO})
+            try:
+                validate_password(linha['password'], user=usuario)
+            except ValidationError as exc:
+                erro(numero, f"password: {' '.join(exc.messages)}")
+        if tipo == 'aluno' and linha.get('data_de_nascimento'):
+            try:
+                linha['data_de_nascimento'] = datetime.date.fromisoformat(linha['data_de_nascimento'])
+            except ValueError:
+                erro(numero, "data_de_nascimento deve estar no formato AAAA-MM-DD.")
+
+        chaves = [(User, 'username')] + [(TIPOS[tipo], campo) for campo in CAMPOS_UNICOS[tipo]]
+        for model, campo in chaves:
+            valor = linha.get(campo)
+            if not valor:
+                continue
+            primeira = vistos.setdefault((model, campo), {}).setdefault(valor, numero)
+            if primeira != numero:
+                erro(numero, f"{campo} '{valor}' repetido (linha {primeira}).")
+
+    # Unicidade contra o banco: uma consulta por (modelo, campo), independente do número de linhas
+    for (model, campo), valores in vistos.items():
+        for valor in _existentes(model, campo, valores):
+            erro(valores[valor], f"{campo} '{valor}' já cadastrado.")
+
+    cpfs_no_arquivo = set(vistos.get((Responsaveis, 'cpf'), {}))
+    cpfs_citados = {
+        cpf.strip()
+        for linha in linhas if linha.get('tipo') == 'aluno'
+        for cpf in linha.get('responsaveis_cpf', '').split(';') if cpf.strip()
+    }
+    cpfs_conhecidos = cpfs_no_arquivo | _existentes(Responsaveis, 'cpf', cpfs_citados - cpfs_no_arquivo)
+    for numero, linha in enumerate(linhas, start=1):
+        if linha.get('tipo') != 'aluno':
+            continue
+        for cpf in linha.get('responsaveis_cpf', '').split(';'):
+            if cpf.strip() and cpf.strip() not in cpfs_conhecidos:
+                erro(numero, f"responsável com CPF '{cpf.strip()}' não encontrado.")
+
+    if erros:
+        raise ErroImportacao(dict(sorted(erros.items())))
+
+
+def importar(linhas, workers=None, administracao_staff=False, progresso=None):
+    """
+    Valida e grava as linhas. Retorna a contagem de registros criados por tipo
+    (e de vínculos aluno-responsável). Tudo ou nada: qualquer erro aborta.
+    Com `administracao_staff` os usuários 'administracao' recebem is_staff.
+    `progresso(feito, total)` é chamado durante a geração dos hashes (a etapa longa).
+    """
+    validar(linhas)
+    hashes = gerar_hashes([linha['password'] for linha in linhas], workers=workers, progresso=progresso)
+
+    with transaction.atomic():
+        usuarios = User.objects.bulk_create([
+            User(
+                username=linha['username'],
+                password=senha,
+                email=linha.get('email', ''),
+                first_name=linha.get('first_name', ''),
+                last_name=linha.get('last_name', ''),
+                is_staff=administracao_staff and linha['tipo'] == 'administracao',
+            )
+            for linha, senha in zip(linhas, hashes)
+        ], batch_size=TAMANHO_LOTE)
+
+        perfis_por_tipo = {tipo: [] for tipo in TIPOS}
+        for linha, usuario in zip(linhas, usuarios):
+            tipo = linha['tipo']
+            dados = {campo: linha.get(campo) or None for campo in CAMPOS_PERFIL[tipo]}
+            perfil = TIPOS[tipo](user=usuario, **dados)
+            perfil.atualizar_termos_busca()  # bulk_create não passa por save()
+            perfis_por_tipo[tipo].append((linha, perfil))
+
+        resumo = {}
+        for tipo, itens in perfis_por_tipo.items():
+            TIPOS[tipo].objects.bulk_create([perfil for _, perfil in itens], batch_size=TAMANHO_LOTE)
+            resumo[tipo] = len(itens)
+
+        cpfs_citados = {
+            cpf.strip()
+            for linha, _ in perfis_por_tipo['aluno']
+            for cpf in linha.get('responsaveis_cpf', '').split(';') if cpf.strip()
+        }
+        responsavel_por_cpf = {}
+        for lote in _em_lotes(cpfs_citados):
+            responsavel_por_cpf.update(Responsaveis.objects.filter(cpf__in=lote).values_list('cpf', 'id'))
+        Vinculo = Alunos.responsaveis.through
+        vinculos = [
+            Vinculo(alunos_id=aluno.id, responsaveis_id=responsavel_por_cpf[cpf.strip()])
+            for linha, aluno in perfis_por_tipo['aluno']
+            for cpf in linha.get('responsaveis_cpf', '').split(';') if cpf.strip()
+        ]
+        Vinculo.objects.bulk_create(vinculos, batch_size=TAMANHO_LOTE, ignore_conflicts=True)
+        resumo['vinculos_responsaveis'] = len(vinculos)
+
+    return resumo
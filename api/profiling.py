@@ -0,0 +1,258 @@
+# api/profiling.py
+
+"""
+Profiling sob demanda de requests individuais, só para staff.
+
+Um request com o header `X-Profile: cprofile|amostragem` (ou `?_profile=...`)
+feito por um usuário staff (JWT ou sessão) é executado sob um profiler:
+
+* `cprofile` (padrão): determinístico, todas as chamadas; mais overhead;
+* `amostragem`: uma thread coleta a pilha do request a cada
+  `INTERVALO_AMOSTRAGEM` segundos; pouco overhead, saída em stacks colapsadas
+  (formato do flamegraph.pl / speedscope).
+
+Junto vai o log de SQL do request (texto com placeholders e duração, sem os
+parâmetros). Cada profile é gravado em `settings.PROFILING_DIR` como
+`<id>.json` (metadados, SQL, funções mais caras) + `<id>.prof` (pstats) ou
+`<id>.txt` (stacks), mantendo os `PROFILING_MAX_ARQUIVOS` mais recentes. O id
+volta no header `X-Profile-Id`; listagem e download em `/api/profiles/`.
+
+Requests sem o header/parâmetro passam direto, com custo de uma consulta a
+um dict. Só funciona no servidor WSGI (gunicorn do Procfile).
+"""
+
+import cProfile
+import collections
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+
+MODOS = ('cprofile', 'amostragem')
+INTERVALO_AMOSTRAGEM = 0.005
+FUNCOES_NO_RESUMO = 40
+
+
+def diretorio_profiles():
+    return getattr(settings, 'PROFILING_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'profiles')
+
+
+def caminho_profile(profile_id, extensao):
+    return os.path.join(diretorio_profiles(), f'{profile_id}.{extensao}')
+
+
+def _usuario_staff(request):
+    """Usuário staff do request (sessão ou JWT) ou None."""
+    user = getattr(request, 'user', None)
+    if not (user and user.is_authenticated):
+        autenticacao = JWTAuthentication()
+        try:
+            resultado = autenticacao.authenticate(request)
+        except (AuthenticationFailed, TokenError):
+            return None
+        user = resultado[0] if resultado else None
+    return user if user is not None and user.is_staff else None
+
+
+class LogSQL:
+    """execute_wrapper: registra SQL e duração de cada consulta do request."""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append({
+                'banco': context['connection'].alias,
+                'sql': sql,
+                'ms': round((time.perf_counter() - inicio) * 1000, 3),
+            })
+
+
+class Amostrador:
+    """Coleta periodicamente a pilha de uma thread e conta stacks colapsadas."""
+
+    def __init__(self, thread_id, intervalo=INTERVALO_AMOSTRAGEM):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.stacks = collections.Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name='profiling-amostragem', daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if pilha:
+                self.stacks[';'.join(reversed(pilha))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+    def colapsadas(self):
+        return ''.join(f'{pilha} {n}\n' for pilha, n in self.stacks.most_common())
+
+    def resumo(self):
+        # Funções (folhas das pilhas) com mais amostras
+        folhas = collections.Counter()
+        for pilha, n in self.stacks.items():
+            folhas[pilha.rsplit(';', 1)[-1]] += n
+        return [{'funcao': funcao, 'amostras': n} for funcao, n in folhas.most_common(FUNCOES_NO_RESUMO)]
+
+
+def _resumo_cprofile(profiler):
+    saida = io.StringIO()
+    pstats.Stats(profiler, stream=saida).sort_stats('cumulative').print_stats(FUNCOES_NO_RESUMO)
+    return saida.getvalue()
+
+
+def _limpar_antigos():
+    maximo = getattr(settings, 'PROFILING_MAX_ARQUIVOS', 200)
+    metadados = sorted(
+        (nome for nome in os.listdir(diretorio_profiles()) if nome.endswith('.json')),
+        key=lambda nome: os.path.getmtime(os.path.join(diretorio_profiles(), nome)),
+    )
+    for nome in metadados[:max(0, len(metadados) - maximo)]:
+        profile_id = nome[:-len('.json')]
+        for extensao in ('json', 'prof', 'txt'):
+            try:
+                os.remove(caminho_profile(profile_id, extensao))
+            except FileNotFoundError:
+                pass
+
+
+def listar_profiles():
+    """Metadados (sem SQL nem resumo) dos profiles gravados, mais recentes primeiro."""
+    diretorio = diretorio_profiles()
+    if not os.path.isdir(diretorio):
+        return []
+    profiles = []
+    for nome in os.listdir(diretorio):
+        if nome.endswith('.json'):
+            dados = ler_profile(nome[:-len('.json')])
+            if dados:
+                profiles.append({chave: valor for chave, valor in dados.items() if chave not in ('sql', 'resumo')})
+    return sorted(profiles, key=lambda dados: dados['criado_em'], reverse=True)
+
+
+def ler_profile(profile_id):
+    try:
+        uuid.UUID(profile_id)  # Só ids gerados aqui: nada de caminhos arbitrários
+        with open(caminho_profile(profile_id, 'json'), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (ValueError, FileNotFoundError):
+        return None
+
+
+def arquivo_do_profile(profile_id):
+    """Caminho e content type do profile bruto (.prof do cProfile ou .txt das stacks), ou None."""
+    dados = ler_profile(profile_id)
+    if dados is None:
+        return None
+    if dados['modo'] == 'cprofile':
+        return caminho_profile(profile_id, 'prof'), 'application/octet-stream'
+    return caminho_profile(profile_id, 'txt'), 'text/plain; charset=utf-8'
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def modo_pedido(self, request):
+        modo = request.META.get('HTTP_X_PROFILE') or request.GET.get('_profile')
+        if not modo:
+            return None
+        modo = 'cprofile' if modo in ('1', 'true') else modo
+        return modo if modo in MODOS else None
+
+    def __call__(self, request):
+        if self.assincrono:
+            # No servidor ASGI os requests passam direto: os profilers acompanham uma thread, não o event loop
+            return self.__acall__(request)
+        modo = self.modo_pedido(request)
+        if modo is None:
+            return self.get_response(request)
+        user = _usuario_staff(request)
+        if user is None:
+            return self.get_response(request)
+        return self.perfilar(request, user, modo)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def perfilar(self, request, user, modo):
+        log_sql = LogSQL()
+        wrappers = [conexao.execute_wrapper(log_sql) for conexao in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        inicio = time.perf_counter()
+        try:
+            if modo == 'cprofile':
+                profiler = cProfile.Profile()
+                response = profiler.runcall(self.get_response, request)
+            else:
+                with Amostrador(threading.get_ident()) as profiler:
+                    response = self.get_response(request)
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+
+        profile_id = str(uuid.uuid4())
+        os.makedirs(diretorio_profiles(), exist_ok=True)
+        if modo == 'cprofile':
+            profiler.dump_stats(caminho_profile(profile_id, 'prof'))
+            resumo = _resumo_cprofile(profiler)
+        else:
+            with open(caminho_profile(profile_id, 'txt'), 'w', encoding='utf-8') as arquivo:
+                arquivo.write(profiler.colapsadas())
+            resumo = profiler.resumo()
+        dados = {
+            'id': profile_id,
+            'modo': modo,
+            'criado_em': timezone.now().isoformat(),
+            'usuario': user.get_username(),
+            'metodo': request.method,
+            'caminho': request.get_full_path(),
+            'status': response.status_code,
+            'duracao_ms': round(duracao_ms, 3),
+            'consultas': len(log_sql.consultas),
+            'sql_ms': round(sum(consulta['ms'] for consulta in log_sql.consultas), 3),
+            'sql': log_sql.consultas,
+            'resumo': resumo,
+        }
+        with open(caminho_profile(profile_id, 'json'), 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo, ensure_ascii=False)
+        _limpar_antigos()
+        response['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,113 @@
+# api/scopes.py
+
+"""
+Filtros de visibilidade por papel (professor, aluno, responsável).
+
+Cada função devolve um queryset *lazy* que o Django embute como subquery
+(`IN (SELECT ...)` / `EXISTS (...)`) na consulta final, em vez de materializar
+listas de IDs em Python. Assim cada request gera uma única instrução SQL cujo
+tamanho não depende da quantidade de alunos, turmas ou matérias.
+"""
+
+from django.db.models import Exists, OuterRef, Q
+
+from .models import (
+    Alunos,
+    Materias,
+    Classes,
+    Avaliacoes,
+    Notas
+)
+
+# Tabelas intermediárias dos ManyToMany de Classes / Alunos
+ClassesAlunos = Classes.alunos.through
+ClassesProfessores = Classes.professores.through
+ClassesMaterias = Classes.materias.through
+AlunosResponsaveis = Alunos.responsaveis.through
+
+
+# --- Blocos básicos (subqueries de IDs) ---
+
+def ids_classes_do_professor(professor):
+    """IDs das turmas em que o professor leciona."""
+    return ClassesProfessores.objects.filter(professores_id=professor.pk).values('classes_id')
+
+
+def ids_alunos_do_professor(professor):
+    """IDs dos alunos matriculados em alguma turma do professor."""
+    return ClassesAlunos.objects.filter(
+        classes_id__in=ids_classes_do_professor(professor)
+    ).values('alunos_id')
+
+
+def ids_alunos_do_responsavel(responsavel):
+    """IDs dos alunos sob responsabilidade do responsável."""
+    return AlunosResponsaveis.objects.filter(responsaveis_id=responsavel.pk).values('alunos_id')
+
+
+def ids_classes_dos_alunos(ids_alunos):
+    """IDs das turmas dos alunos informados (subquery ou iterável de IDs)."""
+    return ClassesAlunos.objects.filter(alunos_id__in=ids_alunos).values('classes_id')
+
+
+def ids_materias_das_classes(ids_classes):
+    """IDs das matérias estudadas nas turmas informadas."""
+    return ClassesMaterias.objects.filter(classes_id__in=ids_classes).values('materias_id')
+
+
+def ids_alunos_do_usuario(user):
+    """IDs dos alunos visíveis para um aluno (ele mesmo) ou responsável (seus dependentes)."""
+    if hasattr(user, 'aluno_profile'):
+        return [user.aluno_profile.pk]
+    if hasattr(user, 'responsavel_profile'):
+        return ids_alunos_do_responsavel(user.responsavel_profile)
+    return Alunos.objects.none().values('id')
+
+
+# --- Querysets por modelo ---
+
+def alunos_do_professor(professor):
+    return Alunos.objects.filter(
+        Exists(ClassesAlunos.objects.filter(
+            alunos_id=OuterRef('pk'),
+            classes_id__in=ids_classes_do_professor(professor),
+        ))
+    )
+
+
+def classes_dos_alunos(ids_alunos):
+    return Classes.objects.filter(id__in=ids_classes_dos_alunos(ids_alunos))
+
+
+def materias_dos_alunos(ids_alunos):
+    return Materias.objects.filter(
+        id__in=ids_materias_das_classes(ids_classes_dos_alunos(ids_alunos))
+    )
+
+
+def avaliacoes_dos_alunos(ids_alunos):
+    """
+    Avaliações das turmas dos alunos (índice classe/materia) e, para avaliações
+    sem turma definida, as das matérias que essas turmas estudam.
+    """
+    ids_classes = ids_classes_dos_alunos(ids_alunos)
+    return Avaliacoes.objects.filter(
+        Q(classe_id__in=ids_classes)
+        | Q(classe__isnull=True, materia_id__in=ids_materias_das_classes(ids_classes))
+    )
+
+
+def notas_do_professor(professor, model=Notas):
+    """Notas atribuídas pelo professor ou de alunos das suas turmas, sem OR + DISTINCT entre querysets."""
+    return model.objects.filter(
+        Exists(ClassesAlunos.objects.filter(
+            alunos_id=OuterRef('aluno_id'),
+            classes_id__in=ids_classes_do_professor(professor),
+        ))
+        | Q(atribuida_por=professor)
+    )
+
+
+def notas_dos_alunos(ids_alunos, model=Notas):
+    # model=NotasArquivadas para o histórico (mesmos campos)
+    return model.objects.filter(aluno_id__in=ids_alunos)
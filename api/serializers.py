@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework.validators import UniqueValidator
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from .models import (
     Administracao,
     Professores,
@@ -9,8 +11,12 @@ from .models import (
     Materias,
     Classes,
     Avaliacoes,
-    Notas
+    Notas,
+    NotasArquivadas,
+    AuditoriaNotas,
+    Tarefa
 )
+from .jobs import HANDLERS, FalhaDefinitiva, conferir_parametros
 
 # --- New: Serializer for Django's User model ---
 class UserSerializer(serializers.ModelSerializer):
@@ -21,19 +27,19 @@ class UserSerializer(serializers.ModelSerializer):
 class AdministracaoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Administracao
-        fields = '__all__' # Todos os campos
+        exclude = ['termos_busca'] # Todos os campos, exceto o interno da busca (api/search.py)
         # alternativa: fields = ['id', 'nome', 'cpf', 'email', 'celular']
 
 class ProfessoresSerializer(serializers.ModelSerializer):
     class Meta:
         model = Professores
-        fields = '__all__'
+        exclude = ['termos_busca'] # Campo interno da busca (api/search.py)
         # fields = ['id', 'nome', 'cpf', 'email', 'celular']
 
 class ResponsaveisSerializer(serializers.ModelSerializer):
     class Meta:
         model = Responsaveis
-        fields = '__all__'
+        exclude = ['termos_busca'] # Campo interno da busca (api/search.py)
         # fields = ['id', 'nome', 'cpf', 'email', 'celular']
 
 class AlunosSerializer(serializers.ModelSerializer):
@@ -41,7 +47,7 @@ class AlunosSerializer(serializers.ModelSerializer):
     responsaveis = serializers.StringRelatedField(many=True, read_only=True)
     class Meta:
         model = Alunos
-        fields = '__all__'
+        exclude = ['termos_busca'] # Campo interno da busca (api/search.py)
         # fields = ['id', 'nome', 'rg', 'data_de_nascimento', 'email', 'celular', 'ra', 'responsaveis']
 
 class MateriasSerializer(serializers.ModelSerializer):
@@ -60,6 +66,17 @@ class ClassesSerializer(serializers.ModelSerializer):
         fields = '__all__'
         # fields = ['id', 'nome', 'ano_letivo', 'alunos', 'professores', 'materias']
 
+class MembrosTurmaSerializer(serializers.Serializer):
+    """Lista de IDs para matrícula em lote (alunos, professores ou matérias de uma turma)."""
+    # Bem acima de uma turma real; limita o IN (...) de validação e o tamanho da transação
+    MAX_IDS = 1000
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=True, max_length=MAX_IDS,
+        error_messages={'max_length': "No máximo {max_length} IDs por requisição."},
+    )
+
+
 
 class AvaliacoesSerializer(serializers.ModelSerializer):
     # responsavel_por = serializers.StringRelatedField(read_only=True) # Exemplo para mostrar o nome do professor
@@ -81,6 +98,50 @@ class NotasSerializer(serializers.ModelSerializer):
         # fields = ['id', 'nota', 'aluno', 'avaliacao', 'atribuida_por', 'data_registro']
 
 
+class NotasArquivadasSerializer(NotasSerializer):
+    class Meta:
+        model = NotasArquivadas
+        fields = '__all__'
+
+
+class AuditoriaNotasSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditoriaNotas
+        fields = '__all__'
+
+
+class TarefaSerializer(serializers.ModelSerializer):
+    criada_por = serializers.StringRelatedField(read_only=True)
+    # Só na criação: pode conter dados sensíveis (ex: CSV com senhas do cadastro em lote)
+    parametros = serializers.JSONField(write_only=True, required=False)
+
+    class Meta:
+        model = Tarefa
+        fields = '__all__'
+        read_only_fields = [
+            'status', 'tentativas', 'progresso_feito', 'progresso_total', 'resultado', 'erro',
+            'worker', 'criada_em', 'executar_apos', 'iniciada_em', 'atualizada_em', 'concluida_em',
+        ]
+
+    def validate_tipo(self, value):
+        if value not in HANDLERS:
+            raise serializers.ValidationError(f"Tipo desconhecido. Disponíveis: {', '.join(sorted(HANDLERS))}.")
+        return value
+
+    def validate_parametros(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Deve ser um objeto JSON.")
+        return value
+
+    def validate(self, attrs):
+        # Parâmetros que não servem para o handler falhariam no worker sem nova tentativa
+        try:
+            conferir_parametros(attrs['tipo'], attrs.get('parametros', {}))
+        except FalhaDefinitiva as exc:
+            raise serializers.ValidationError({'parametros': [str(exc)]})
+        return attrs
+
+
 # Registro de Usuários
 
 class RegistroUsuarioSerializer(serializers.ModelSerializer):
@@ -98,7 +159,11 @@ class RegistroUsuarioSerializer(serializers.ModelSerializer):
         model = User
         fields = ('username', 'password', 'email', 'first_name', 'last_name')
         extra_kwargs = {
-            'username': {'required': True},
+            # UniqueValidator já faz a checagem de unicidade (uma consulta só)
+            'username': {'required': True, 'validators': [
+                UnicodeUsernameValidator(),
+                UniqueValidator(queryset=User.objects.all(), message="Username já existe."),
+            ]},
             'password': {'write_only': True},
             'first_name': {'required': False},
             'last_name': {'required': False},
@@ -115,12 +180,6 @@ class RegistroUsuarioSerializer(serializers.ModelSerializer):
         )
         return user
 
-    def validate_username(self, value):
-        # Username único
-        if User.objects.filter(username=value).exists():
-            raise serializers.ValidationError("Username já existe.")
-        return value
-    
 
 # --- Custom JWT Serializer ---
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -0,0 +1,7 @@
+# api/signals.py
+
+from django.dispatch import Signal
+
+# Enviado uma única vez, após o commit, por operação em lote sobre os membros de uma turma.
+# Argumentos: classe, relacao ('alunos' | 'professores' | 'materias'), adicionados, removidos (sets de IDs)
+membros_turma_alterados = Signal()
@@ -0,0 +1,318 @@
+# api/sync.py
+
+"""
+Sync incremental para clientes offline (`/api/sync/?since=<cursor>`).
+
+Inserções e atualizações vêm de `atualizado_em` (indexado em todos os modelos);
+remoções vêm do log de tombstones `RegistroRemocao`, gravado no pre_delete junto
+com quem podia ver o registro (`EscopoRemocao`: responsáveis e turmas do aluno,
+professor que atribuiu a nota). O escopo é capturado antes do cascade: depois
+dele as matrículas e vínculos do aluno removido já não existem.
+
+Alterações em ManyToMany (matrículas, responsáveis) atualizam `atualizado_em`
+do registro dono da relação. As inclusões também gravam `EntradaEscopo` (ex:
+turma X aluno), e cada sync entrega a quem foi afetado o que passou a ver sem
+ter sido alterado: ao professor da turma, o aluno matriculado e suas notas; ao
+professor incluído, os alunos da turma e suas notas; ao aluno e aos
+responsáveis, a turma, suas matérias e avaliações; ao novo responsável, o aluno
+com notas, turmas, matérias e avaliações. As linhas em si não são tocadas, então
+os outros clientes não baixam nada de novo.
+
+O cursor (opaco, assinado) guarda a posição de cada fluxo: normalmente o
+instante do servidor no início da resposta. Cada consulta volta `SOBREPOSICAO`
+antes dele para não perder linhas de transações que commitaram depois; como o
+cliente faz upsert por id, repetir linhas é inofensivo.
+
+Limitação: um registro que sai do escopo do usuário sem ser removido (ex:
+aluno transferido de turma) não gera tombstone para quem deixou de vê-lo.
+"""
+
+import datetime
+import threading
+
+from django.core import signing
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import scopes
+from .models import (
+    Administracao,
+    Professores,
+    Responsaveis,
+    Alunos,
+    Materias,
+    Classes,
+    Avaliacoes,
+    Notas,
+    RegistroRemocao,
+    EscopoRemocao,
+    EntradaEscopo
+)
+from .signals import membros_turma_alterados
+
+SOBREPOSICAO = datetime.timedelta(seconds=5)
+
+SALT_CURSOR = 'api.sync.cursor'
+
+# Máximo de registros por modelo numa resposta; acima disso a resposta traz tem_mais=True
+LIMITE_POR_MODELO = 5000
+
+# Nome do recurso na API -> modelo
+RECURSOS = {
+    'administracao': Administracao,
+    'professores': Professores,
+    'responsaveis': Responsaveis,
+    'alunos': Alunos,
+    'materias': Materias,
+    'classes': Classes,
+    'avaliacoes': Avaliacoes,
+    'notas': Notas,
+}
+RECURSO_DO_MODELO = {model: recurso for recurso, model in RECURSOS.items()}
+
+
+# --- Tombstones e M2M ---
+
+# Escopo do último aluno consultado na remoção em andamento: apagar um aluno
+# remove também as notas dele, todas com o mesmo escopo
+_ultimo_escopo = threading.local()
+
+
+def _escopo_do_aluno(aluno_id, origem=None):
+    """[(tipo, id)] dos responsáveis e turmas do aluno neste momento."""
+    if (origem is not None and getattr(_ultimo_escopo, 'origem', None) is origem
+            and _ultimo_escopo.aluno_id == aluno_id):
+        return list(_ultimo_escopo.valor)
+    responsaveis = scopes.AlunosResponsaveis.objects.filter(alunos_id=aluno_id).values_list('responsaveis_id', flat=True)
+    classes = scopes.ClassesAlunos.objects.filter(alunos_id=aluno_id).values_list('classes_id', flat=True)
+    valor = ([(EscopoRemocao.RESPONSAVEL, pk) for pk in responsaveis]
+             + [(EscopoRemocao.CLASSE, pk) for pk in classes])
+    _ultimo_escopo.origem, _ultimo_escopo.aluno_id, _ultimo_escopo.valor = origem, aluno_id, valor
+    return list(valor)
+
+
+def registrar_remocao(sender, instance, origin=None, **kwargs):
+    recurso = RECURSO_DO_MODELO[sender]
+    if sender is Alunos:
+        aluno_id = instance.pk
+    else:
+        aluno_id = getattr(instance, 'aluno_id', None)
+    registro = RegistroRemocao.objects.create(modelo=recurso, objeto_id=instance.pk, aluno_id=aluno_id)
+    escopo = _escopo_do_aluno(aluno_id, origin) if aluno_id is not None else []
+    if getattr(instance, 'atribuida_por_id', None) is not None:
+        escopo.append((EscopoRemocao.PROFESSOR, instance.atribuida_por_id))
+    EscopoRemocao.objects.bulk_create(
+        [EscopoRemocao(remocao=registro, tipo=tipo, ref_id=ref_id) for tipo, ref_id in escopo]
+    )
+
+
+# Conectado por modelo: um receiver sem sender desativaria o fast-delete do ORM em todos os modelos
+for _recurso, _model in RECURSOS.items():
+    pre_delete.connect(registrar_remocao, sender=_model, dispatch_uid=f'api_sync_tombstone_{_recurso}')
+
+
+def _tocar(model, ids):
+    model.objects.filter(pk__in=ids).update(atualizado_em=timezone.now())
+
+
+# Campo de EntradaEscopo de cada lado das relações
+CAMPO_DO_MEMBRO = {
+    Classes.alunos.through: 'aluno_id',
+    Classes.professores.through: 'professor_id',
+    Classes.materias.through: 'materia_id',
+}
+CAMPO_DA_RELACAO = {'alunos': 'aluno_id', 'professores': 'professor_id', 'materias': 'materia_id'}
+
+
+def registrar_entradas(campo_dono, dono_id, campo_membro, ids_membros):
+    EntradaEscopo.objects.bulk_create(
+        [EntradaEscopo(**{campo_dono: dono_id, campo_membro: membro_id}) for membro_id in ids_membros]
+    )
+
+
+@receiver(m2m_changed, sender=Classes.alunos.through, dispatch_uid='api_sync_classes_alunos')
+@receiver(m2m_changed, sender=Classes.professores.through, dispatch_uid='api_sync_classes_professores')
+@receiver(m2m_changed, sender=Classes.materias.through, dispatch_uid='api_sync_classes_materias')
+@receiver(m2m_changed, sender=Alunos.responsaveis.through, dispatch_uid='api_sync_alunos_responsaveis')
+def tocar_dono_da_relacao(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _tocar(type(instance), [instance.pk])
+    elif pk_set:
+        # Ex: aluno.classes.add(turma) altera a turma
+        _tocar(model, pk_set)
+    if action != 'post_add' or not pk_set:
+        return
+    if sender is Alunos.responsaveis.through:
+        dono, membro = 'aluno_id', 'responsavel_id'
+    else:
+        dono, membro = 'classe_id', CAMPO_DO_MEMBRO[sender]
+    if reverse:
+        dono, membro = membro, dono
+    registrar_entradas(dono, instance.pk, membro, pk_set)
+
+
+@receiver(membros_turma_alterados, dispatch_uid='api_sync_membros_turma')
+def tocar_turma(sender, classe, relacao, adicionados, **kwargs):
+    _tocar(Classes, [classe.pk])
+    if adicionados:
+        registrar_entradas('classe_id', classe.pk, CAMPO_DA_RELACAO[relacao], adicionados)
+
+
+# --- Cursor e consulta ---
+
+def gerar_cursor(posicoes):
+    return signing.dumps(posicoes, salt=SALT_CURSOR, compress=True)
+
+
+def ler_cursor(valor):
+    """
+    Posições por fluxo ({'notas': [iso, id], 'removidos:notas': [iso, None], ...})
+    a partir do cursor. Aceita também um timestamp ISO puro, aplicado a todos os
+    fluxos. Sem valor = sync completo. Levanta ValueError se inválido.
+    """
+    if not valor:
+        return {}
+    try:
+        return signing.loads(valor, salt=SALT_CURSOR)
+    except signing.BadSignature:
+        pass
+    instante = parse_datetime(valor)
+    if instante is None:
+        raise ValueError(valor)
+    if timezone.is_naive(instante):
+        instante = timezone.make_aware(instante, datetime.timezone.utc)
+    return {'*': [instante.isoformat(), None]}
+
+
+def posicao_do_fluxo(posicoes, fluxo):
+    return posicoes.get(fluxo) or posicoes.get('*')
+
+
+def _no_escopo(tipo, **filtro):
+    return Exists(EscopoRemocao.objects.filter(remocao=OuterRef('pk'), tipo=tipo, **filtro))
+
+
+def filtro_remocoes_visiveis(user):
+    """Q sobre RegistroRemocao com as remoções que o usuário pode ver."""
+    if user.is_staff:
+        return Q()
+    # Sem aluno associado (matérias, turmas...) só o id é exposto
+    visiveis = Q(aluno_id__isnull=True)
+    if hasattr(user, 'professor_profile'):
+        professor = user.professor_profile
+        visiveis |= (_no_escopo(EscopoRemocao.CLASSE, ref_id__in=scopes.ids_classes_do_professor(professor))
+                     | _no_escopo(EscopoRemocao.PROFESSOR, ref_id=professor.pk))
+        alunos = scopes.ids_alunos_do_professor(professor)
+    else:
+        if hasattr(user, 'responsavel_profile'):
+            visiveis |= _no_escopo(EscopoRemocao.RESPONSAVEL, ref_id=user.responsavel_profile.pk)
+        alunos = scopes.ids_alunos_do_usuario(user)
+    # Escopo atual, para os tombstones gravados antes de EscopoRemocao existir
+    return visiveis | Q(aluno_id__in=alunos)
+
+
+def _ids(queryset, campo):
+    return set(queryset.filter(**{f'{campo}__isnull': False}).values_list(campo, flat=True))
+
+
+def filtros_de_entrada(user, desde):
+    """
+    {recurso: Q} com os registros que entraram no escopo do usuário depois de
+    `desde` por causa de vínculos novos (ver EntradaEscopo). Recursos sem
+    entradas ficam de fora.
+    """
+    entradas = EntradaEscopo.objects.filter(criada_em__gt=desde)
+    alunos, classes, materias = set(), set(), set()
+    if user.is_staff:
+        return {}
+    if hasattr(user, 'professor_profile'):
+        # Turmas, matérias e avaliações o professor já vê todas
+        professor = user.professor_profile
+        alunos = _ids(entradas.filter(classe_id__in=scopes.ids_classes_do_professor(professor)), 'aluno_id')
+        turmas_novas = _ids(entradas.filter(professor_id=professor.pk), 'classe_id')
+        if turmas_novas:
+            alunos |= set(scopes.ClassesAlunos.objects.filter(classes_id__in=turmas_novas)
+                          .values_list('alunos_id', flat=True))
+    else:
+        if hasattr(user, 'responsavel_profile'):
+            alunos = _ids(entradas.filter(responsavel_id=user.responsavel_profile.pk), 'aluno_id')
+        meus_alunos = scopes.ids_alunos_do_usuario(user)
+        classes = _ids(entradas.filter(aluno_id__in=meus_alunos), 'classe_id')
+        if alunos:
+            classes |= set(scopes.ids_classes_dos_alunos(alunos).values_list('classes_id', flat=True))
+        materias = _ids(entradas.filter(classe_id__in=scopes.ids_classes_dos_alunos(meus_alunos)), 'materia_id')
+        if classes:
+            materias |= set(scopes.ids_materias_das_classes(classes).values_list('materias_id', flat=True))
+    filtros = {}
+    if alunos:
+        filtros['alunos'] = Q(id__in=alunos)
+        filtros['notas'] = Q(aluno_id__in=alunos)
+    if classes:
+        filtros['classes'] = Q(id__in=classes)
+    if materias:
+        filtros['materias'] = Q(id__in=materias)
+    if classes or materias:
+        filtros['avaliacoes'] = Q(classe_id__in=classes) | Q(classe__isnull=True, materia_id__in=materias)
+    return filtros
+
+
+class EntradasNoEscopo:
+    """
+    Registros que entraram no escopo do usuário depois da posição do fluxo
+    `entradas:<recurso>`; os filtros são calculados uma vez por instante.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._filtros = {}
+
+    def buscar(self, queryset, recurso, posicao, agora):
+        """(registros do queryset que entraram no escopo, próxima posição). Nenhum no sync completo."""
+        if not posicao:
+            return [], [agora.isoformat(), None]
+        desde = parse_datetime(posicao[0]) - SOBREPOSICAO
+        if desde not in self._filtros:
+            self._filtros[desde] = filtros_de_entrada(self.user, desde)
+        filtro = self._filtros[desde].get(recurso)
+        registros = list(queryset.filter(filtro).order_by('id')) if filtro is not None else []
+        return registros, [agora.isoformat(), None]
+
+
+def pagina(queryset, posicao, agora, campo='atualizado_em', limite=None):
+    """
+    Registros do queryset alterados depois da posição, em ordem (campo, id).
+    Retorna (registros, próxima posição, tem_mais).
+
+    Posição [instante, None] é um cursor de tempo: volta `SOBREPOSICAO`.
+    Posição [instante, id] continua uma página truncada por keyset, sem
+    sobreposição, para não ficar preso quando há mais de `limite` linhas com o
+    mesmo instante (ex: bulk_create).
+    """
+    limite = limite or LIMITE_POR_MODELO
+    if posicao:
+        instante, ultimo_id = parse_datetime(posicao[0]), posicao[1]
+        if ultimo_id is None:
+            queryset = queryset.filter(**{f'{campo}__gt': instante - SOBREPOSICAO})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{campo}__gt': instante}) | Q(**{campo: instante, 'id__gt': ultimo_id})
+            )
+    registros = list(queryset.order_by(campo, 'id')[:limite + 1])
+    if len(registros) > limite:
+        ultimo = registros[limite - 1]
+        return registros[:limite], [getattr(ultimo, campo).isoformat(), ultimo.pk], True
+    return registros, [agora.isoformat(), None], False
+
+
+def remocoes(recurso, user, posicao, agora, limite=None):
+    """IDs removidos depois da posição (nenhum no sync completo). Retorna (ids, próxima posição, tem_mais)."""
+    if not posicao:
+        return [], [agora.isoformat(), None], False
+    queryset = RegistroRemocao.objects.filter(filtro_remocoes_visiveis(user), modelo=recurso)
+    registros, proxima, tem_mais = pagina(queryset, posicao, agora, campo='removido_em', limite=limite)
+    return [registro.objeto_id for registro in registros], proxima, tem_mais
@@ -1,3 +1,1145 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import os
+import pstats
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import (
+    Professores,
+    Responsaveis,
+    Alunos,
+    Materias,
+    Classes,
+    Avaliacoes,
+    Notas,
+    NotasArquivadas,
+    AuditoriaNotas,
+    RegistroRemocao,
+    EntradaEscopo,
+    Tarefa
+)
+from . import arquivo, auditoria, eventos, jobs, limites
+from .admin import PaginadorEstimado
+from .eventos import EscopoEventos
+from .inicializacao import MiddlewaresDoAdmin
+from .boletins import caminho_boletim, gerar_boletins
+from .onboarding import gerar_hashes
+from .serializers import MembrosTurmaSerializer
+from .signals import membros_turma_alterados
+from .views import (
+    AlunosViewSet,
+    MateriasViewSet,
+    ClassesViewSet,
+    AvaliacoesViewSet,
+    NotasViewSet,
+    notas_eventos
+)
+
+
+def criar_aluno(indice, **extra):
+    dados = {
+        'nome': f'Aluno {indice}',
+        'rg': f'RG{indice}',
+        'ra': f'RA{indice}',
+        'data_de_nascimento': datetime.date(2010, 1, 1),
+    }
+    dados.update(extra)
+    return Alunos.objects.create(**dados)
+
+
+def criar_responsavel_com_filho():
+    """(user, responsável, filho, outro aluno sem vínculo com o responsável)."""
+    user = User.objects.create_user('responsavel', password='senha')
+    responsavel = Responsaveis.objects.create(
+        nome='Responsável', cpf='111', email='resp@escola.com', celular='1', user=user
+    )
+    filho = criar_aluno(1)
+    filho.responsaveis.add(responsavel)
+    return user, responsavel, filho, criar_aluno(2)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class EscopoPorPapelTests(TestCase):
+    """As consultas de visibilidade não devem crescer com o volume de dados."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_professor = User.objects.create_user('professor', password='senha')
+        cls.professor = Professores.objects.create(
+            nome='Professor', cpf='000.000.000-00', email='prof@escola.com', celular='1', user=cls.user_professor
+        )
+        cls.user_responsavel = User.objects.create_user('responsavel', password='senha')
+        cls.responsavel = Responsaveis.objects.create(
+            nome='Responsável', cpf='111.111.111-11', email='resp@escola.com', celular='1', user=cls.user_responsavel
+        )
+        cls.materia = Materias.objects.create(nome='Matemática')
+        cls.avaliacao = Avaliacoes.objects.create(nome='Prova 1', professor_responsavel=cls.professor)
+        cls.proximo_indice = 0
+
+    def adicionar_turma_com_alunos(self, quantidade):
+        turma = Classes.objects.create(nome=f'Turma {Classes.objects.count()}', ano_letivo=2025)
+        turma.professores.add(self.professor)
+        turma.materias.add(self.materia)
+        for _ in range(quantidade):
+            self.proximo_indice += 1
+            aluno = criar_aluno(self.proximo_indice)
+            aluno.responsaveis.add(self.responsavel)
+            turma.alunos.add(aluno)
+            Notas.objects.create(nota=7, aluno=aluno, avaliacao=self.avaliacao, atribuida_por=self.professor)
+
+    def contar_queries(self, user, url):
+        client = APIClient()
+        # Usuário recarregado a cada request para não reaproveitar perfis em cache
+        client.force_authenticate(User.objects.get(pk=user.pk))
+        with CaptureQueriesContext(connection) as contexto:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(contexto.captured_queries)
+
+    def sql_do_escopo(self, user, viewset_class):
+        viewset = viewset_class(action='list')
+        viewset.request = SimpleNamespace(user=User.objects.get(pk=user.pk), query_params={})
+        return str(viewset.get_queryset().query)
+
+    def test_sql_do_escopo_tem_tamanho_constante(self):
+        casos = [
+            (self.user_professor, AlunosViewSet),
+            (self.user_professor, NotasViewSet),
+            (self.user_responsavel, MateriasViewSet),
+            (self.user_responsavel, ClassesViewSet),
+            (self.user_responsavel, AvaliacoesViewSet),
+            (self.user_responsavel, NotasViewSet),
+        ]
+        self.adicionar_turma_com_alunos(2)
+        antes = [len(self.sql_do_escopo(*caso)) for caso in casos]
+
+        for _ in range(3):
+            self.adicionar_turma_com_alunos(20)
+        depois = [len(self.sql_do_escopo(*caso)) for caso in casos]
+
+        self.assertEqual(antes, depois)
+
+    def test_numero_de_queries_nao_cresce_com_os_dados(self):
+        casos = [
+            (self.user_professor, '/api/alunos/'),
+            (self.user_professor, '/api/notas/'),
+            (self.user_responsavel, '/api/materias/'),
+            (self.user_responsavel, '/api/classes/'),
+            (self.user_responsavel, '/api/avaliacoes/'),
+            (self.user_responsavel, '/api/notas/'),
+        ]
+        self.adicionar_turma_com_alunos(2)
+        antes = [self.contar_queries(*caso) for caso in casos]
+
+        for _ in range(3):
+            self.adicionar_turma_com_alunos(20)
+        depois = [self.contar_queries(*caso) for caso in casos]
+
+        self.assertEqual(antes, depois)
+
+    def test_professor_ve_notas_atribuidas_e_de_seus_alunos_sem_duplicatas(self):
+        self.adicionar_turma_com_alunos(3)
+        client = APIClient()
+        client.force_authenticate(self.user_professor)
+        response = client.get('/api/notas/')
+        self.assertEqual(len(response.json()), Notas.objects.count())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class OverviewProfessorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_professor = User.objects.create_user('professor', password='senha')
+        cls.professor = Professores.objects.create(
+            nome='Professor', cpf='000', email='prof@escola.com', celular='1', user=cls.user_professor
+        )
+        cls.user_responsavel = User.objects.create_user('responsavel', password='senha')
+        Responsaveis.objects.create(
+            nome='Responsável', cpf='111', email='resp@escola.com', celular='1', user=cls.user_responsavel
+        )
+        alunos = [criar_aluno(indice) for indice in range(4)]
+        cls.turma_a = Classes.objects.create(nome='1A', ano_letivo=2025)
+        cls.turma_a.alunos.add(*alunos[:3])
+        cls.turma_b = Classes.objects.create(nome='1B', ano_letivo=2025)
+        cls.turma_b.alunos.add(*alunos[2:])
+        for turma in (cls.turma_a, cls.turma_b):
+            turma.professores.add(cls.professor)
+        Classes.objects.create(nome='Outra', ano_letivo=2025).alunos.add(*alunos)
+
+        cls.prova = Avaliacoes.objects.create(nome='Prova', professor_responsavel=cls.professor)
+        cls.pendente = Avaliacoes.objects.create(nome='Trabalho', professor_responsavel=cls.professor)
+        for aluno, nota in zip(alunos, ['3', '6', '8', '9.5']):
+            Notas.objects.create(nota=nota, aluno=aluno, avaliacao=cls.prova)
+
+    def test_resumo_por_turma_e_faixas_de_nota_em_consultas_fixas(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.user_professor.pk))
+        # Perfil de professor do usuário (1) + turmas, pendentes e distribuição (3)
+        with self.assertNumQueries(4):
+            response = client.get('/api/professores/me/overview/')
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+
+        self.assertEqual(
+            [(turma['nome'], turma['total_alunos']) for turma in dados['classes']], [('1A', 3), ('1B', 2)]
+        )
+        self.assertEqual(dados['avaliacoes_pendentes'], [{'id': self.pendente.id, 'nome': 'Trabalho'}])
+        [distribuicao] = dados['distribuicao_notas']
+        self.assertEqual(distribuicao['avaliacao']['id'], self.prova.id)
+        self.assertEqual(distribuicao['total'], 4)
+        self.assertEqual(distribuicao['faixas'], {'0-5': 1, '5-7': 1, '7-10': 2})
+
+    def test_quem_nao_e_professor_recebe_403(self):
+        client = APIClient()
+        client.force_authenticate(self.user_responsavel)
+        self.assertEqual(client.get('/api/professores/me/overview/').status_code, 403)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AvaliacoesVisiveisTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.matematica = Materias.objects.create(nome='Matemática')
+        cls.historia = Materias.objects.create(nome='História')
+        cls.turma = Classes.objects.create(nome='1A', ano_letivo=2025)
+        cls.turma.materias.add(cls.matematica)
+        cls.outra_turma = Classes.objects.create(nome='1B', ano_letivo=2025)
+
+        cls.user_aluno = User.objects.create_user('aluno', password='senha')
+        cls.aluno = criar_aluno(1, user=cls.user_aluno)
+        cls.turma.alunos.add(cls.aluno)
+
+        cls.da_turma = Avaliacoes.objects.create(nome='Prova 1A', classe=cls.turma, materia=cls.matematica)
+        cls.da_materia = Avaliacoes.objects.create(nome='Simulado', materia=cls.matematica)
+        Avaliacoes.objects.create(nome='Prova 1B', classe=cls.outra_turma, materia=cls.matematica)
+        Avaliacoes.objects.create(nome='Simulado História', materia=cls.historia)
+
+    def test_aluno_ve_avaliacoes_da_turma_e_das_materias(self):
+        client = APIClient()
+        client.force_authenticate(self.user_aluno)
+        response = client.get('/api/avaliacoes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({item['id'] for item in response.json()}, {self.da_turma.id, self.da_materia.id})
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class BuscaPessoasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('secretaria', password='senha', is_staff=True)
+        cls.joao = criar_aluno(1, nome='João Conceição')
+        cls.joana = criar_aluno(2, nome='Joana Silva')
+        criar_aluno(3, nome='Maria Souza')
+        Responsaveis.objects.create(nome='José Araújo', cpf='123.456.789-00', email='jose@escola.com', celular='1')
+
+    def buscar(self, url):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_busca_por_prefixo_sem_acentos_e_paginada(self):
+        dados = self.buscar('/api/alunos/?search=joa')
+        self.assertEqual(dados['count'], 2)
+        self.assertEqual({item['id'] for item in dados['results']}, {self.joao.id, self.joana.id})
+
+        dados = self.buscar('/api/alunos/?search=conceicao')
+        self.assertEqual([item['id'] for item in dados['results']], [self.joao.id])
+
+    def test_termo_de_uma_letra_nao_vira_prefixo(self):
+        self.assertEqual(self.buscar('/api/alunos/?search=j')['count'], 0)
+        self.assertEqual(self.buscar('/api/alunos/?search=jo')['count'], 2)
+        ana = criar_aluno(4, nome='Ana B Souza')
+        dados = self.buscar('/api/alunos/?search=souza b')
+        self.assertEqual([item['id'] for item in dados['results']], [ana.id])
+
+    def test_busca_por_documento_com_ou_sem_pontuacao(self):
+        self.assertEqual(self.buscar('/api/responsaveis/?search=12345678900')['count'], 1)
+        self.assertEqual(self.buscar('/api/responsaveis/?search=123.456')['count'], 1)
+        self.assertEqual(self.buscar('/api/alunos/?search=RA3')['count'], 1)
+
+    def test_atualizacao_reflete_no_indice(self):
+        self.joana.nome = 'Ana Lúcia'
+        self.joana.save()
+        self.assertEqual(self.buscar('/api/alunos/?search=lucia')['count'], 1)
+        self.assertEqual(self.buscar('/api/alunos/?search=joana')['count'], 0)
+
+    def test_listagem_sem_busca_continua_sem_paginacao(self):
+        self.assertEqual(len(self.buscar('/api/alunos/')), 3)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], ANO_LETIVO_ATUAL=2025)
+class NotasFiltrosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('secretaria', password='senha', is_staff=True)
+        cls.turma = Classes.objects.create(nome='1A', ano_letivo=2025)
+        cls.prova = Avaliacoes.objects.create(nome='Prova', classe=cls.turma)
+        cls.trabalho = Avaliacoes.objects.create(nome='Trabalho')
+        cls.aluno = criar_aluno(1)
+        cls.outro_aluno = criar_aluno(2)
+        cls.nota_prova = Notas.objects.create(nota=9, aluno=cls.aluno, avaliacao=cls.prova)
+        Notas.objects.create(nota=4, aluno=cls.outro_aluno, avaliacao=cls.prova)
+        Notas.objects.create(nota=6, aluno=cls.aluno, avaliacao=cls.trabalho)
+
+    def listar(self, query):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        return client.get('/api/notas/' + query)
+
+    def test_filtros_se_combinam(self):
+        response = self.listar(f'?classe={self.turma.id}&nota_min=7&data_registro_de=2000-01-01')
+        self.assertEqual([item['id'] for item in response.json()], [self.nota_prova.id])
+
+    def test_ordenacao_apenas_por_colunas_indexadas(self):
+        notas = [item['nota'] for item in self.listar('?ordering=-nota').json()]
+        self.assertEqual(notas, sorted(notas, key=float, reverse=True))
+        # Campo fora de ordering_fields é ignorado pelo OrderingFilter
+        self.assertEqual(self.listar('?ordering=atribuida_por').status_code, 200)
+
+    def test_valor_invalido_retorna_400(self):
+        response = self.listar('?nota_min=abc&data_registro_ate=ontem')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'nota_min', 'data_registro_ate'})
+
+    def test_valores_nao_finitos_ou_fora_do_intervalo_retornam_400(self):
+        for query in ('?nota_min=NaN', '?nota_max=Infinity', '?aluno=99999999999999999999999', '?avaliacao=-1'):
+            with self.subTest(query=query):
+                self.assertEqual(self.listar(query).status_code, 400)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class MatriculaEmLoteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('secretaria', password='senha', is_staff=True)
+        cls.turma = Classes.objects.create(nome='1A', ano_letivo=2025)
+        cls.alunos = [criar_aluno(indice) for indice in range(5)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.url = f'/api/classes/{self.turma.id}/alunos/'
+
+    def ids(self, *indices):
+        return {'ids': [self.alunos[indice].id for indice in indices]}
+
+    def matriculados(self):
+        return set(self.turma.alunos.values_list('id', flat=True))
+
+    def test_adicionar_remover_e_substituir(self):
+        eventos = []
+        receptor = lambda **kwargs: eventos.append(kwargs)
+        membros_turma_alterados.connect(receptor)
+        self.addCleanup(membros_turma_alterados.disconnect, receptor)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, self.ids(0, 1, 2), format='json')
+        self.assertEqual(response.json(), {'adicionados': 3, 'removidos': 0, 'total': 3})
+        self.assertEqual(len(eventos), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, self.ids(2, 3), format='json')
+        self.assertEqual(response.json()['adicionados'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.url, self.ids(0), format='json')
+        self.assertEqual(self.matriculados(), {self.alunos[i].id for i in (1, 2, 3)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(self.url, self.ids(3, 4), format='json')
+        self.assertEqual(response.json(), {'adicionados': 1, 'removidos': 2, 'total': 2})
+        self.assertEqual(self.matriculados(), {self.alunos[3].id, self.alunos[4].id})
+        self.assertEqual(len(eventos), 4)
+        self.assertEqual(eventos[-1]['removidos'], {self.alunos[1].id, self.alunos[2].id})
+
+    def test_ids_inexistentes_sao_rejeitados(self):
+        response = self.client.post(self.url, {'ids': [self.alunos[0].id, 999999]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'ids': ["IDs inexistentes: [999999]"]})
+        self.assertEqual(self.matriculados(), set())
+
+    def test_lote_acima_do_maximo_e_rejeitado(self):
+        ids = list(range(1, MembrosTurmaSerializer.MAX_IDS + 2))
+        response = self.client.put(self.url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ids', response.json())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class OnboardingTests(TestCase):
+    CSV = (
+        "tipo,username,password,email,nome,cpf,rg,ra,data_de_nascimento,celular,responsaveis_cpf\n"
+        "responsavel,resp1,Tq8-vale-azul,resp1@escola.com,Responsável Um,111,,,,119,\n"
+        "aluno,aluno1,Tq8-vale-azul,,Aluno Um,,RG1,RA1,2012-03-04,,111\n"
+        "professor,prof1,Tq8-vale-azul,prof1@escola.com,Professor Um,222,,,,119,\n"
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('secretaria', password='senha', is_staff=True))
+
+    def enviar(self, conteudo):
+        arquivo = SimpleUploadedFile('pessoas.csv', conteudo.encode(), content_type='text/csv')
+        return self.client.post('/api/onboarding/', {'arquivo': arquivo}, format='multipart')
+
+    def test_cria_usuarios_perfis_e_vinculos(self):
+        response = self.enviar(self.CSV)
+        self.assertEqual(response.status_code, 201, response.content)
+        aluno = Alunos.objects.get(ra='RA1')
+        self.assertTrue(aluno.user.check_password('Tq8-vale-azul'))
+        self.assertEqual(list(aluno.responsaveis.values_list('cpf', flat=True)), ['111'])
+        self.assertTrue(Professores.objects.filter(user__username='prof1').exists())
+
+    def test_duplicados_no_arquivo_e_no_banco_sao_rejeitados_sem_gravar_nada(self):
+        criar_aluno(9, ra='RA1')
+        conteudo = self.CSV + "aluno,aluno1,Tq8-vale-azul,,Outro,,RG2,RA2,2012-03-04,,999\n"
+        response = self.enviar(conteudo)
+        self.assertEqual(response.status_code, 400)
+        erros = response.json()['erros']
+        self.assertIn("ra 'RA1' já cadastrado.", erros['2'])
+        self.assertIn("username 'aluno1' repetido (linha 2).", erros['4'])
+        self.assertIn("responsável com CPF '999' não encontrado.", erros['4'])
+        self.assertFalse(User.objects.filter(username='resp1').exists())
+
+    def test_arquivo_ilegivel_retorna_400(self):
+        latin1 = SimpleUploadedFile('pessoas.csv', 'tipo,nome\nresponsavel,Conceição\n'.encode('latin-1'))
+        response = self.client.post('/api/onboarding/', {'arquivo': latin1}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('0', response.json()['erros'])
+        self.assertEqual(self.enviar('tipo,username\n"aluno,aluno1\n').status_code, 400)
+
+    def test_valida_como_o_cadastro_individual_e_nao_concede_staff(self):
+        conteudo = self.CSV + (
+            f"administracao,{'x' * 151},1234,adm@escola.com,Adm,{'3' * 20},,,,119,\n"
+            "administracao,adm1,Tq8-vale-azul,adm1@escola.com,Adm,333,,,,119,\n"
+        )
+        erros = self.enviar(conteudo).json()['erros']
+        self.assertEqual(
+            sorted(mensagem.split(':')[0] for mensagem in erros['4']), ['cpf', 'password', 'username']
+        )
+
+        response = self.enviar(self.CSV + "administracao,adm1,Tq8-vale-azul,adm1@escola.com,Adm,333,,,,119,\n")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertFalse(User.objects.get(username='adm1').is_staff)
+
+    def test_arquivo_grande_exige_importacao_assincrona(self):
+        with mock.patch('api.views.MAX_LINHAS_SINCRONO', 2):
+            response = self.enviar(self.CSV)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('assincrono=1', response.json()['arquivo'][0])
+            self.assertFalse(User.objects.filter(username='aluno1').exists())
+
+            arquivo = SimpleUploadedFile('pessoas.csv', self.CSV.encode(), content_type='text/csv')
+            response = self.client.post('/api/onboarding/?assincrono=1', {'arquivo': arquivo}, format='multipart')
+            self.assertEqual(response.status_code, 202, response.content)
+
+    def test_hashes_em_pool_de_processos(self):
+        hashes = gerar_hashes([f'senha{indice}' for indice in range(60)], workers=2)
+        self.assertEqual(len(hashes), 60)
+        self.assertTrue(check_password('senha59', hashes[59]))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class BoletinsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.turma = Classes.objects.create(nome='1A', ano_letivo=2025)
+        cls.materia = Materias.objects.create(nome='Matemática')
+        cls.prova = Avaliacoes.objects.create(nome='Prova', classe=cls.turma, materia=cls.materia)
+        cls.primeiro = criar_aluno(1, nome='Primeira')
+        cls.segundo = criar_aluno(2, nome='Segundo')
+        cls.turma.alunos.add(cls.primeiro, cls.segundo)
+        Notas.objects.create(nota=9, aluno=cls.primeiro, avaliacao=cls.prova)
+        Notas.objects.create(nota=5, aluno=cls.segundo, avaliacao=cls.prova)
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=diretorio.name))
+
+    def test_gera_boletins_com_classificacao_e_retoma(self):
+        resumo = gerar_boletins(2025, workers=1)
+        self.assertEqual(resumo, {'total': 2, 'gerados': 2, 'pulados': 0})
+        with open(caminho_boletim(2025, self.primeiro.id), encoding='utf-8') as arquivo:
+            conteudo = arquivo.read()
+        self.assertIn('Turma 1A: 1º de 2', conteudo)
+        self.assertIn('Matemática', conteudo)
+
+        os.remove(caminho_boletim(2025, self.segundo.id))
+        self.assertEqual(gerar_boletins(2025, workers=1), {'total': 2, 'gerados': 1, 'pulados': 1})
+
+    @override_settings(ANO_LETIVO_ATUAL=2026)
+    def test_ano_arquivado_sai_do_arquivo(self):
+        arquivo.arquivar_ano(2025)
+        self.assertEqual(gerar_boletins(2025, workers=1), {'total': 2, 'gerados': 2, 'pulados': 0})
+        with open(caminho_boletim(2025, self.segundo.id), encoding='utf-8') as arquivo_html:
+            conteudo = arquivo_html.read()
+        self.assertIn('Turma 1A: 2º de 2', conteudo)
+        self.assertIn('<td>5.00</td>', conteudo)
+
+    def test_endpoint_restrito_a_staff(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('aluno', password='senha'))
+        self.assertEqual(client.get('/api/boletins/2025/').status_code, 403)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class FilaDeTarefasTests(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user('secretaria', password='senha', is_staff=True)
+        jobs.HANDLERS['teste'] = self.handler
+        self.addCleanup(jobs.HANDLERS.pop, 'teste')
+        self.falhas = 0
+
+    def handler(self, tarefa, falhar_vezes=0):
+        jobs.atualizar_progresso(tarefa, 1, 1)
+        if self.falhas < falhar_vezes:
+            self.falhas += 1
+            raise RuntimeError('falha temporária')
+        return {'ok': True}
+
+    def test_enfileirar_pela_api_e_executar(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        response = client.post('/api/tarefas/', {'tipo': 'teste', 'parametros': {}}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(client.post('/api/tarefas/', {'tipo': 'inexistente'}, format='json').status_code, 400)
+
+        [tarefa] = jobs.reservar_proximas(5, worker='w1')
+        self.assertEqual(jobs.reservar_proximas(5, worker='w2'), [])
+        jobs.executar(tarefa)
+
+        dados = client.get(f"/api/tarefas/{response.json()['id']}/").json()
+        self.assertEqual((dados['status'], dados['resultado'], dados['progresso_feito']), ('concluida', {'ok': True}, 1))
+
+    def test_nova_tentativa_com_backoff_e_falha_definitiva(self):
+        tarefa = jobs.enfileirar('teste', max_tentativas=2, falhar_vezes=5)
+        jobs.executar(jobs.reservar_proximas(1)[0])
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.PENDENTE, 1))
+        self.assertGreater(tarefa.executar_apos, timezone.now())
+        self.assertEqual(jobs.reservar_proximas(1), [])
+
+        Tarefa.objects.filter(pk=tarefa.pk).update(executar_apos=None)
+        jobs.executar(jobs.reservar_proximas(1)[0])
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.FALHOU)
+        self.assertIn('falha temporária', tarefa.erro)
+
+    def test_tipo_ou_parametros_invalidos_falham_sem_nova_tentativa(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        response = client.post('/api/tarefas/', {'tipo': 'teste', 'parametros': {'vezes': 1}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parametros', response.json())
+
+        # Gravadas antes de uma mudança no handler (ou com o handler removido)
+        com_parametro_antigo = jobs.enfileirar('teste', vezes=1)
+        sem_handler = Tarefa.objects.create(tipo='removido', parametros={})
+        for tarefa in (com_parametro_antigo, sem_handler):
+            jobs.executar(jobs.reservar_proximas(1)[0])
+            tarefa.refresh_from_db()
+            self.assertEqual((tarefa.status, tarefa.tentativas, tarefa.executar_apos), (Tarefa.FALHOU, 1, None))
+            self.assertIn('FalhaDefinitiva', tarefa.erro)
+
+    def test_validation_error_do_handler_nao_e_repetido(self):
+        jobs.HANDLERS['teste'] = mock.Mock(side_effect=ValidationError('ano inválido'))
+        tarefa = jobs.enfileirar('teste')
+        jobs.executar(jobs.reservar_proximas(1)[0])
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.FALHOU, 1))
+        self.assertIn('ano inválido', tarefa.erro)
+
+    def test_tarefa_travada_conta_tentativa_e_falha_ao_esgotar(self):
+        tarefa = jobs.enfileirar('teste', max_tentativas=2)
+        for status_esperado, tentativas in ((Tarefa.PENDENTE, 1), (Tarefa.FALHOU, 2)):
+            jobs.reservar_proximas(1, worker='morto')
+            # Worker morreu: sem heartbeat desde então
+            Tarefa.objects.filter(pk=tarefa.pk).update(atualizada_em=timezone.now() - datetime.timedelta(hours=1))
+            jobs.liberar_travadas(60)
+            tarefa.refresh_from_db()
+            self.assertEqual((tarefa.status, tarefa.tentativas), (status_esperado, tentativas))
+        self.assertEqual(jobs.reservar_proximas(1), [])
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_csv_do_cadastro_em_lote_nao_e_exposto_nem_guardado(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        arquivo = SimpleUploadedFile('pessoas.csv', OnboardingTests.CSV.encode(), content_type='text/csv')
+        response = client.post('/api/onboarding/?assincrono=1', {'arquivo': arquivo}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.assertNotIn('parametros', response.json())
+        self.assertNotIn('parametros', client.get(f"/api/tarefas/{response.json()['id']}/").json())
+
+        tarefa = jobs.executar(jobs.reservar_proximas(1)[0])
+        self.assertEqual(tarefa.status, Tarefa.CONCLUIDA, tarefa.erro)
+        tarefa.refresh_from_db()
+        self.assertNotIn('conteudo', tarefa.parametros)
+        self.assertEqual(tarefa.progresso_feito, 3)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class EventosNotasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_responsavel, cls.responsavel, cls.filho, cls.outro = criar_responsavel_com_filho()
+        cls.avaliacao = Avaliacoes.objects.create(nome='Prova')
+
+    def test_escopo_do_responsavel_filtra_eventos(self):
+        escopo = EscopoEventos.para_usuario(self.user_responsavel)
+        self.assertTrue(escopo.permite({'aluno': self.filho.id, 'atribuida_por': None}))
+        self.assertFalse(escopo.permite({'aluno': self.outro.id, 'atribuida_por': None}))
+        self.assertIsNone(EscopoEventos.para_usuario(User.objects.create_user('sem_papel')))
+
+    def test_nota_salva_chega_aos_assinantes_apos_commit(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        assinatura = eventos.hub.assinar(loop)
+        self.addCleanup(eventos.hub.cancelar, assinatura)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notas.objects.create(nota=8, aluno=self.filho, avaliacao=self.avaliacao)
+
+        evento = loop.run_until_complete(asyncio.wait_for(assinatura.fila.get(), timeout=1))
+        self.assertEqual((evento['acao'], evento['aluno'], evento['nota']), ('criada', self.filho.id, '8'))
+
+    def test_ticket_do_stream_e_de_uso_unico_e_leva_o_exp_do_token(self):
+        client = APIClient()
+        token = AccessToken.for_user(self.user_responsavel)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        ticket = client.post('/api/notas/eventos/ticket/').json()['ticket']
+
+        self.assertEqual(eventos.usar_ticket(ticket), (self.user_responsavel.pk, token['exp']))
+        self.assertIsNone(eventos.usar_ticket(ticket))
+        self.assertIsNone(eventos.usar_ticket(ticket + 'x'))
+        self.assertEqual(APIClient().post('/api/notas/eventos/ticket/').status_code, 401)
+
+    def test_stream_termina_quando_o_token_expira(self):
+        ticket = eventos.emitir_ticket(self.user_responsavel, time.time() + 0.2)
+        request = AsyncRequestFactory().get('/api/notas/eventos/', {'ticket': ticket})
+
+        async def ler():
+            response = await notas_eventos(request)
+            return [parte async for parte in response.streaming_content]
+
+        partes = async_to_sync(ler)()
+        self.assertEqual(partes[-1], b'event: expirado\ndata: {}\n\n')
+
+    def test_escopo_recarregado_percebe_usuario_desativado(self):
+        escopo = EscopoEventos.para_usuario(self.user_responsavel)
+        escopo.carregado_em -= escopo.validade + 1
+        self.assertTrue(escopo.expirado)
+        User.objects.filter(pk=self.user_responsavel.pk).update(is_active=False)
+        escopo.recarregar()
+        self.assertFalse(escopo.ativo)
+        self.assertFalse(escopo.expirado)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class SyncIncrementalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_responsavel, cls.responsavel, cls.filho, cls.outro = criar_responsavel_com_filho()
+        cls.avaliacao = Avaliacoes.objects.create(nome='Prova')
+        # Vínculos do cenário são anteriores a qualquer cursor dos testes
+        EntradaEscopo.objects.update(criada_em=timezone.now() - datetime.timedelta(hours=1))
+
+    def sincronizar(self, since=None, user=None, **params):
+        client = APIClient()
+        client.force_authenticate(user or self.user_responsavel)
+        if since:
+            params['since'] = since
+        response = client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_retorna_apenas_alteracoes_visiveis_desde_o_cursor(self):
+        nota_filho = Notas.objects.create(nota=5, aluno=self.filho, avaliacao=self.avaliacao)
+        nota_outro = Notas.objects.create(nota=6, aluno=self.outro, avaliacao=self.avaliacao)
+        completo = self.sincronizar()
+        self.assertNotIn('administracao', completo['alteracoes'])
+        self.assertEqual([aluno['id'] for aluno in completo['alteracoes']['alunos']], [self.filho.id])
+        self.assertEqual([nota['id'] for nota in completo['alteracoes']['notas']], [nota_filho.id])
+
+        # Cursor antigo o bastante para o estado anterior ficar fora da janela de sobreposição
+        cursor = (timezone.now() - datetime.timedelta(minutes=1)).isoformat()
+        Notas.objects.update(atualizado_em=timezone.now() - datetime.timedelta(minutes=5))
+        Alunos.objects.update(atualizado_em=timezone.now() - datetime.timedelta(minutes=5))
+        segunda = Avaliacoes.objects.create(nome='Prova 2')
+        nova = Notas.objects.create(nota=9, aluno=self.filho, avaliacao=segunda)
+        Notas.objects.create(nota=3, aluno=self.outro, avaliacao=segunda)
+        removida = nota_filho.id
+        nota_filho.delete()
+        nota_outro.delete()
+
+        delta = self.sincronizar(cursor)
+        self.assertEqual([nota['id'] for nota in delta['alteracoes']['notas']], [nova.id])
+        self.assertEqual(delta['alteracoes']['alunos'], [])
+        self.assertEqual(delta['removidos']['notas'], [removida])
+        self.assertFalse(delta['tem_mais'])
+
+    @override_settings(ANO_LETIVO_ATUAL=2025)
+    def test_sincroniza_notas_de_outros_anos(self):
+        turma = Classes.objects.create(nome='1A', ano_letivo=2024)
+        anterior = Avaliacoes.objects.create(nome='Prova 2024', classe=turma)
+        nota = Notas.objects.create(nota=5, aluno=self.filho, avaliacao=anterior)
+        self.assertEqual([item['id'] for item in self.sincronizar()['alteracoes']['notas']], [nota.id])
+
+        cursor = (timezone.now() - datetime.timedelta(minutes=1)).isoformat()
+        Notas.objects.update(atualizado_em=timezone.now() - datetime.timedelta(minutes=5))
+        nota.nota = 7
+        nota.save()
+        self.assertEqual([item['nota'] for item in self.sincronizar(cursor)['alteracoes']['notas']], ['7.00'])
+
+    def test_paginas_truncadas_continuam_pelo_cursor(self):
+        notas = [
+            Notas.objects.create(nota=i, aluno=self.filho, avaliacao=Avaliacoes.objects.create(nome=f'Prova {i}'))
+            for i in range(5)
+        ]
+        Notas.objects.update(atualizado_em=timezone.now())  # mesmo instante, como num bulk_create
+        vistos = []
+        with mock.patch('api.sync.LIMITE_POR_MODELO', 2):
+            resposta = self.sincronizar(modelos='notas')
+            vistos += [nota['id'] for nota in resposta['alteracoes']['notas']]
+            while resposta['tem_mais']:
+                resposta = self.sincronizar(resposta['cursor'], modelos='notas')
+                vistos += [nota['id'] for nota in resposta['alteracoes']['notas']]
+        self.assertEqual(vistos, [nota.id for nota in notas])
+
+    def test_remocao_do_aluno_chega_a_quem_via_o_aluno(self):
+        user_professor = User.objects.create_user('professor', password='senha')
+        professor = Professores.objects.create(
+            nome='Professor', cpf='000', email='prof@escola.com', celular='1', user=user_professor
+        )
+        turma = Classes.objects.create(nome='1A', ano_letivo=2025)
+        turma.alunos.add(self.filho)
+        turma.professores.add(professor)
+        nota = Notas.objects.create(nota=5, aluno=self.filho, avaliacao=self.avaliacao)
+        cursores = {user: self.sincronizar(user=user)['cursor'] for user in (self.user_responsavel, user_professor)}
+        aluno_id = self.filho.id
+
+        # O cascade apaga matrícula e vínculo com o responsável antes do sync
+        self.filho.delete()
+        self.outro.delete()
+
+        for user, cursor in cursores.items():
+            delta = self.sincronizar(cursor, user=user)
+            self.assertEqual(delta['removidos']['alunos'], [aluno_id])
+            self.assertEqual(delta['removidos']['notas'], [nota.id])
+
+    def test_matricula_atualiza_a_turma(self):
+        turma = Classes.objects.create(nome='1A', ano_letivo=2025)
+        Classes.objects.update(atualizado_em=timezone.now() - datetime.timedelta(minutes=5))
+        turma.alunos.add(self.filho)
+        turma.refresh_from_db()
+        self.assertGreater(turma.atualizado_em, timezone.now() - datetime.timedelta(minutes=1))
+
+    def test_matricula_leva_aluno_e_notas_ao_delta_do_professor(self):
+        user_professor = User.objects.create_user('professor', password='senha')
+        professor = Professores.objects.create(
+            nome='Professor', cpf='000', email='prof@escola.com', celular='1', user=user_professor
+        )
+        turma = Classes.objects.create(nome='1A', ano_letivo=2025)
+        turma.professores.add(professor)
+        nota = Notas.objects.create(nota=5, aluno=self.filho, avaliacao=self.avaliacao)
+        cursor = (timezone.now() - datetime.timedelta(minutes=1)).isoformat()
+        for model in (Alunos, Notas, Classes):
+            model.objects.update(atualizado_em=timezone.now() - datetime.timedelta(minutes=5))
+        EntradaEscopo.objects.update(criada_em=timezone.now() - datetime.timedelta(minutes=5))
+
+        # Matrícula em lote (membros_turma_alterados) e pelo ManyToMany
+        cliente = APIClient()
+        cliente.force_authenticate(User.objects.create_user('admin', is_staff=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = cliente.post(
+                f'/api/classes/{turma.id}/alunos/', {'ids': [self.filho.id]}, format='json'
+            )
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        turma.alunos.add(self.outro)
+
+        delta = self.sincronizar(cursor, user=user_professor)
+        self.assertEqual([aluno['id'] for aluno in delta['alteracoes']['alunos']], [self.filho.id, self.outro.id])
+        self.assertEqual([nota['id'] for nota in delta['alteracoes']['notas']], [nota.id])
+
+        # As linhas não são tocadas: o responsável recebe a turma nova, mas não re-baixa as notas
+        recentes = Notas.objects.filter(atualizado_em__gt=timezone.now() - datetime.timedelta(minutes=1))
+        self.assertFalse(recentes.exists())
+        delta = self.sincronizar(cursor)
+        self.assertEqual([classe['id'] for classe in delta['alteracoes']['classes']], [turma.id])
+        self.assertEqual(delta['alteracoes']['notas'], [])
+
+    def test_novo_responsavel_recebe_o_aluno_e_as_notas(self):
+        nota = Notas.objects.create(nota=6, aluno=self.outro, avaliacao=self.avaliacao)
+        cursor = (timezone.now() - datetime.timedelta(minutes=1)).isoformat()
+        for model in (Alunos, Notas):
+            model.objects.update(atualizado_em=timezone.now() - datetime.timedelta(minutes=5))
+
+        self.responsavel.alunos.add(self.outro)
+
+        delta = self.sincronizar(cursor)
+        self.assertEqual([aluno['id'] for aluno in delta['alteracoes']['alunos']], [self.outro.id])
+        self.assertEqual([item['id'] for item in delta['alteracoes']['notas']], [nota.id])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], ANO_LETIVO_ATUAL=2025)
+class ArquivoNotasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_responsavel, cls.responsavel, cls.filho, cls.outro = criar_responsavel_com_filho()
+        cls.turma_2024 = Classes.objects.create(nome='1A', ano_letivo=2024)
+        cls.turma_2025 = Classes.objects.create(nome='2A', ano_letivo=2025)
+        antiga = Avaliacoes.objects.create(nome='Prova 2024', classe=cls.turma_2024)
+        atual = Avaliacoes.objects.create(nome='Prova 2025', classe=cls.turma_2025)
+        cls.nota_antiga = Notas.objects.create(nota=5, aluno=cls.filho, avaliacao=antiga)
+        Notas.objects.create(nota=6, aluno=cls.outro, avaliacao=antiga)
+        cls.nota_atual = Notas.objects.create(nota=7, aluno=cls.filho, avaliacao=atual)
+
+    def listar(self, url):
+        client = APIClient()
+        client.force_authenticate(self.user_responsavel)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()]
+
+    def test_listagem_padrao_mostra_o_ano_atual(self):
+        self.assertEqual(self.nota_antiga.ano_letivo, 2024)
+        self.assertEqual(self.listar('/api/notas/'), [self.nota_atual.id])
+        self.assertEqual(self.listar('/api/notas/?ano_letivo=2024'), [self.nota_antiga.id])
+
+    def test_arquivar_move_o_ano_para_o_historico(self):
+        self.assertEqual(arquivo.arquivar_ano(2024, tamanho_lote=1), 2)
+        self.assertEqual(self.listar('/api/notas/?ano_letivo=2024'), [])
+        self.assertEqual(self.listar('/api/notas/historico/'), [self.nota_antiga.id])
+        self.assertFalse(RegistroRemocao.objects.exists())  # Arquivar não é remover para o sync
+
+        with self.assertRaises(ValueError):
+            arquivo.arquivar_ano(2025)
+
+        self.assertEqual(arquivo.restaurar_ano(2024), 2)
+        self.assertEqual(self.listar('/api/notas/?ano_letivo=2024'), [self.nota_antiga.id])
+        self.assertFalse(NotasArquivadas.objects.exists())
+
+    def test_restaurar_com_nota_lancada_de_novo_nao_perde_o_arquivo(self):
+        arquivo.arquivar_ano(2024)
+        Notas.objects.create(nota=10, aluno=self.filho, avaliacao=self.nota_antiga.avaliacao)
+
+        with self.assertRaises(arquivo.ConflitoArquivo) as erro:
+            arquivo.restaurar_ano(2024)
+        self.assertEqual(erro.exception.conflitos, [(self.filho.id, self.nota_antiga.avaliacao_id)])
+        self.assertEqual(NotasArquivadas.objects.count(), 2)
+        self.assertEqual(Notas.objects.filter(ano_letivo=2024).count(), 1)
+
+    def test_mudanca_de_turma_atualiza_o_ano_das_notas(self):
+        self.turma_2024.ano_letivo = 2023
+        self.turma_2024.save()
+        self.nota_antiga.refresh_from_db()
+        self.assertEqual(self.nota_antiga.ano_letivo, 2023)
+
+    def test_save_so_recalcula_o_ano_quando_a_avaliacao_muda(self):
+        nota = Notas.objects.get(pk=self.nota_antiga.pk)
+        nota.nota = 6
+        with CaptureQueriesContext(connection) as consultas:
+            nota.save()
+        self.assertFalse([q for q in consultas.captured_queries if 'api_avaliacoes' in q['sql']])
+
+        nota.avaliacao = Avaliacoes.objects.create(nome='Recuperação 2025', classe=self.turma_2025)
+        nota.save()
+        nota.refresh_from_db()
+        self.assertEqual(nota.ano_letivo, 2025)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AuditoriaNotasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('secretaria', password='senha', is_staff=True)
+        cls.user_professor = User.objects.create_user('professor', password='senha')
+        cls.professor = Professores.objects.create(
+            nome='Professor', cpf='000', email='prof@escola.com', celular='1', user=cls.user_professor
+        )
+        cls.aluno = criar_aluno(1)
+        cls.avaliacao = Avaliacoes.objects.create(nome='Prova')
+
+    def setUp(self):
+        # Sem descarga por tempo durante o teste
+        patcher = mock.patch.object(auditoria.buffer, 'intervalo', 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(auditoria.buffer.descarregar)
+
+    def test_edicao_pela_api_registra_autor_e_valores(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            nota = Notas.objects.create(nota=5, aluno=self.aluno, avaliacao=self.avaliacao)
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(f'/api/notas/{nota.id}/', {'nota': '8.50'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # Nada gravado no caminho da escrita: os registros esperam no buffer
+        self.assertFalse(AuditoriaNotas.objects.exists())
+        self.assertEqual(auditoria.buffer.descarregar(), 2)
+
+        response = client.get('/api/notas/auditoria/', {'aluno': self.aluno.id})
+        registros = response.json()['results']
+        self.assertEqual(
+            [(r['acao'], r['valor_anterior'], r['valor_novo'], r['usuario']) for r in registros],
+            [('atualizada', '5.00', '8.50', 'secretaria'), ('criada', None, '5.00', '')],
+        )
+        self.assertEqual(client.get('/api/notas/auditoria/').status_code, 400)
+
+        # Professor sem o aluno nas suas turmas não vê a trilha
+        client.force_authenticate(self.user_professor)
+        self.assertEqual(client.get('/api/notas/auditoria/', {'aluno': self.aluno.id}).json()['results'], [])
+
+        # ...mas vê a das notas que ele mesmo atribuiu, como em /api/notas/
+        nota.atribuida_por = self.professor
+        nota.save()
+        self.assertEqual(len(client.get('/api/notas/auditoria/', {'aluno': self.aluno.id}).json()['results']), 2)
+
+    def test_alteracao_desfeita_nao_e_registrada(self):
+        nota = Notas.objects.create(nota=5, aluno=self.aluno, avaliacao=self.avaliacao)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    nota.nota = 1
+                    nota.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(len(auditoria.buffer), 0)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class LimitesTests(TestCase):
+
+    def setUp(self):
+        limites.get_baldes().limpar()
+        limites.contadores.zerar()
+        # Baldes vazios deixados aqui limitariam os usuários (mesmos pks) das próximas classes
+        self.addCleanup(limites.get_baldes().limpar)
+
+    def test_baldes_em_memoria_descartam_o_usado_ha_mais_tempo(self):
+        baldes = limites.BaldesMemoria()
+        baldes.max_chaves = 2
+        self.assertTrue(baldes.consumir('a', 1, 0.001)[0])
+        baldes.consumir('b', 1, 0.001)
+        self.assertFalse(baldes.consumir('a', 1, 0.001)[0])  # 'a' passa a ser o mais recente
+        baldes.consumir('c', 1, 0.001)  # Descarta 'b'
+        self.assertFalse(baldes.consumir('a', 1, 0.001)[0])
+        self.assertTrue(baldes.consumir('b', 1, 0.001)[0])
+
+    def test_registro_limitado_por_ip_com_retry_after(self):
+        client = APIClient()
+        for _ in range(5):
+            self.assertNotEqual(client.post('/api/register/', {}).status_code, 429)
+        response = client.post('/api/register/', {})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # X-Forwarded-For sem proxy configurado (NUM_PROXIES=0) não troca de balde
+        self.assertEqual(client.post('/api/register/', {}, HTTP_X_FORWARDED_FOR='10.0.0.3').status_code, 429)
+        # Outro IP tem o próprio balde
+        self.assertNotEqual(client.post('/api/register/', {}, REMOTE_ADDR='10.0.0.2').status_code, 429)
+        self.assertEqual(limites.contadores.copia()['limitados.registro'], 2)
+
+    @override_settings(REST_FRAMEWORK={
+        'DEFAULT_THROTTLE_CLASSES': ('api.limites.LimitePorPapel',),
+        'DEFAULT_THROTTLE_RATES': {'staff': '3/min', 'aluno': '1/min'},
+    })
+    def test_taxa_depende_do_papel(self):
+        staff = User.objects.create_user('secretaria', is_staff=True)
+        user_aluno = User.objects.create_user('aluno')
+        criar_aluno(1, user=user_aluno)
+        client = APIClient()
+        client.force_authenticate(user_aluno)
+        self.assertEqual([client.get('/api/materias/').status_code for _ in range(2)], [200, 429])
+        client.force_authenticate(staff)
+        self.assertEqual([client.get('/api/materias/').status_code for _ in range(4)], [200, 200, 200, 429])
+
+    def test_admissao_recusa_quando_saturado_ou_velho_na_fila(self):
+        requisicao = SimpleNamespace(path='/api/materias/', META={})
+        with self.settings(ADMISSAO_MAX_CONCORRENCIA=1, ADMISSAO_MAX_ESPERA_FILA_MS=1000):
+            middleware = limites.ControleAdmissao(lambda request: middleware(requisicao_interna))
+            requisicao_interna = SimpleNamespace(path='/api/materias/', META={})
+            # A requisição interna chega com a única vaga ocupada pela externa
+            self.assertEqual(middleware(requisicao).status_code, 503)
+            self.assertEqual(middleware.em_andamento, 0)
+
+            antiga = SimpleNamespace(path='/api/materias/', META={
+                'HTTP_X_REQUEST_START': f't={time.time() - 5:.3f}',
+            })
+            self.assertEqual(limites.ControleAdmissao(lambda request: None)(antiga).status_code, 503)
+        contadores = limites.contadores.copia()
+        self.assertEqual((contadores['recusados.concorrencia'], contadores['recusados.fila']), (1, 1))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ProfilingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('secretaria', password='senha', is_staff=True)
+        cls.professor = User.objects.create_user('professor', password='senha')
+        Materias.objects.create(nome='Matemática')
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.enterContext(override_settings(PROFILING_DIR=diretorio.name))
+
+    def test_staff_perfila_request_e_baixa_o_resultado(self):
+        client = APIClient()
+        client.force_login(self.staff)
+        response = client.get('/api/materias/', HTTP_X_PROFILE='cprofile')
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+
+        self.assertEqual([item['id'] for item in client.get('/api/profiles/').json()], [profile_id])
+        dados = client.get(f'/api/profiles/{profile_id}/').json()
+        self.assertEqual((dados['caminho'], dados['status'], dados['usuario']), ('/api/materias/', 200, 'secretaria'))
+        self.assertTrue(any('api_materias' in consulta['sql'] for consulta in dados['sql']))
+        self.assertIn('cumulative', dados['resumo'])
+
+        download = client.get(f'/api/profiles/{profile_id}/download/')
+        self.assertEqual(download.status_code, 200)
+        with tempfile.NamedTemporaryFile() as arquivo:
+            arquivo.write(b''.join(download.streaming_content))
+            arquivo.flush()
+            self.assertTrue(pstats.Stats(arquivo.name).total_calls)
+
+        amostragem = client.get('/api/materias/?_profile=amostragem')
+        self.assertEqual(client.get(f"/api/profiles/{amostragem['X-Profile-Id']}/").json()['modo'], 'amostragem')
+
+    def test_pedido_de_quem_nao_e_staff_e_ignorado(self):
+        client = APIClient()
+        client.force_login(self.professor)
+        response = client.get('/api/materias/', HTTP_X_PROFILE='cprofile')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(client.get('/api/profiles/').status_code, 403)
+
+
+MIDDLEWARE_PERFIL_API = [
+    'django.middleware.security.SecurityMiddleware',
+    'api.limites.ControleAdmissao',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'api.inicializacao.MiddlewaresDoAdmin',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilingMiddleware',
+]
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], MIDDLEWARE=MIDDLEWARE_PERFIL_API)
+class InicializacaoEnxutaTests(TestCase):
+    """Perfil 'api': sessão e admin só em /admin/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('secretaria', password='senha', is_staff=True, is_superuser=True)
+        Materias.objects.create(nome='Matemática')
+
+    def test_middlewares_de_sessao_so_rodam_no_admin(self):
+        vistos = []
+        middleware = MiddlewaresDoAdmin(lambda request: vistos.append(request) or HttpResponse())
+        fabrica = RequestFactory()
+
+        middleware(fabrica.get('/api/materias/'))
+        self.assertIsNone(middleware._cadeia)
+        self.assertFalse(hasattr(vistos[-1], 'session'))
+
+        middleware(fabrica.get('/admin/'))
+        self.assertTrue(hasattr(vistos[-1], 'session'))
+        self.assertFalse(vistos[-1].user.is_authenticated)
+
+    def test_admin_funciona_e_sessao_nao_autentica_a_api(self):
+        client = APIClient()
+        client.login(username='secretaria', password='senha')
+        self.assertEqual(client.get('/admin/api/materias/').status_code, 200)
+        self.assertEqual(client.get('/api/materias/').status_code, 401)
+
+        client.force_authenticate(self.staff)
+        self.assertEqual(client.get('/api/materias/').status_code, 200)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], ANO_LETIVO_ATUAL=2025)
+class AdminTabelasGrandesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser('admin', password='senha')
+        cls.turma = Classes.objects.create(nome='1A', ano_letivo=2025)
+        cls.alunos = [criar_aluno(indice, nome=f'Aluno {nome}') for indice, nome in enumerate(['Ana', 'Bruno', 'Carla'])]
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def criar_notas(self, quantidade):
+        for _ in range(quantidade):
+            avaliacao = Avaliacoes.objects.create(nome=f'Prova {Avaliacoes.objects.count()}', classe=self.turma)
+            for aluno in self.alunos:
+                Notas.objects.create(nota=7, aluno=aluno, avaliacao=avaliacao)
+
+    def consultas_da_listagem(self, url='/admin/api/notas/'):
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [consulta['sql'] for consulta in contexto.captured_queries]
+
+    def test_listagem_de_notas_nao_cresce_com_as_linhas(self):
+        self.criar_notas(1)
+        poucas = self.consultas_da_listagem()
+        self.criar_notas(10)
+        self.assertEqual(len(self.consultas_da_listagem()), len(poucas))
+
+    def test_listagem_sem_filtro_usa_estimativa_no_lugar_do_count(self):
+        self.criar_notas(5)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with mock.patch.object(PaginadorEstimado, 'limite_exato', 0):
+            consultas = self.consultas_da_listagem()
+            self.assertFalse([sql for sql in consultas if 'COUNT(' in sql and 'api_notas' in sql])
+            # Com filtro a contagem é exata
+            filtradas = self.consultas_da_listagem('/admin/api/notas/?ano_letivo=2025')
+            self.assertTrue([sql for sql in filtradas if 'COUNT(' in sql and 'api_notas' in sql])
+
+    def test_busca_de_notas_pelo_aluno(self):
+        self.criar_notas(2)
+        response = self.client.get('/admin/api/notas/?q=carla')
+        self.assertEqual(
+            {nota.aluno_id for nota in response.context['cl'].result_list}, {self.alunos[2].id}
+        )
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_autocomplete_dos_alunos_da_turma(self):
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'api', 'model_name': 'classes', 'field_name': 'alunos', 'term': 'bru',
+        })
+        self.assertEqual([item['text'] for item in response.json()['results']], [str(self.alunos[1])])
@@ -3,11 +3,7 @@ from . import views
 from rest_framework.routers import DefaultRouter
 # Custom Jwt
 from .views import MyTokenObtainPairView
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-    TokenVerifyView,
-)
+from rest_framework_simplejwt.views import TokenObtainPairView
 
 # Router e registro Viewset
 router = DefaultRouter()
@@ -19,14 +15,31 @@ router.register(r'materias', views.MateriasViewSet)
 router.register(r'classes', views.ClassesViewSet)
 router.register(r'avaliacoes', views.AvaliacoesViewSet)
 router.register(r'notas', views.NotasViewSet)
+router.register(r'tarefas', views.TarefasViewSet)
 
 # API URLs automáticas pelo Router.
 urlpatterns = [
+    # Antes do router, senão 'eventos' seria tratado como pk de /notas/<pk>/
+    path('notas/eventos/', views.notas_eventos, name='notas_eventos'),
+    path('notas/eventos/ticket/', views.NotasEventosTicketView.as_view(), name='notas_eventos_ticket'),
+    path('notas/auditoria/', views.AuditoriaNotasView.as_view(), name='notas_auditoria'),
     path('', include(router.urls)),
     # JWT Authentication URLs
     path('token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    path('token/refresh/', views.MyTokenRefreshView.as_view(), name='token_refresh'),
+    path('token/verify/', views.MyTokenVerifyView.as_view(), name='token_verify'),
     # --- Registro Endpoint ---
     path('register/', views.RegistroUsuarioView.as_view(), name='register_user'),
+    # --- Cadastro em lote (staff) ---
+    path('onboarding/', views.OnboardingView.as_view(), name='onboarding'),
+    # --- Boletins (staff) ---
+    path('boletins/<int:ano_letivo>/', views.BoletinsView.as_view(), name='boletins'),
+    # --- Sync incremental (clientes offline) ---
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    # --- Contadores de limites/admissão (staff) ---
+    path('limites/', views.LimitesView.as_view(), name='limites'),
+    # --- Profiles de requests (staff) ---
+    path('profiles/', views.ProfilesView.as_view(), name='profiles'),
+    path('profiles/<uuid:profile_id>/', views.ProfileView.as_view(), name='profile'),
+    path('profiles/<uuid:profile_id>/download/', views.ProfileDownloadView.as_view(), name='profile_download'),
 ]
\ No newline at end of file
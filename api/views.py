@@ -1,13 +1,33 @@
 # api/views.py
 
+import asyncio
+import json
+import os
+import time
+
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, BasePermission
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q
+from django.db.models import Q, Count, Avg, Min, Max, Exists, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
-from rest_framework.generics import CreateAPIView
-from rest_framework_simplejwt.views import TokenObtainPairView # Keep this import for inheritance
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from django.db import transaction
+from django.utils import timezone
+from django.shortcuts import get_object_or_404
+from rest_framework.filters import OrderingFilter
+from rest_framework.generics import CreateAPIView, ListAPIView
+from rest_framework.parsers import MultiPartParser, FileUploadParser
+from rest_framework.views import APIView
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView # Keep this import for inheritance
 
 # Import the serializers
 from .serializers import (
@@ -19,6 +39,10 @@ from .serializers import (
     ClassesSerializer,
     AvaliacoesSerializer,
     NotasSerializer,
+    NotasArquivadasSerializer,
+    AuditoriaNotasSerializer,
+    MembrosTurmaSerializer,
+    TarefaSerializer,
     RegistroUsuarioSerializer,
     MyTokenObtainPairSerializer # Import your custom JWT serializer
 )
@@ -31,9 +55,36 @@ from .models import (
     Materias,
     Classes,
     Avaliacoes,
-    Notas
+    Notas,
+    NotasArquivadas,
+    AuditoriaNotas,
+    Tarefa
+)
+from . import arquivo, auditoria, limites, profiling, scopes
+from . import sync
+from .jobs import enfileirar
+from .eventos import TICKET_VALIDADE, EscopoEventos, emitir_ticket, get_backend, hub, usar_ticket
+from .boletins import status_boletins
+from .onboarding import MAX_LINHAS_SINCRONO, ErroImportacao, decodificar, importar, ler_csv
+from .signals import membros_turma_alterados
+from .search import BuscaPessoasFilter, BuscaPagination
+from .filters import FiltroPorParametros, data_iso, decimal, inteiro
+
+# Faixas usadas na distribuição de notas: (nome, mínimo inclusivo, máximo exclusivo ou None)
+FAIXAS_DE_NOTA = (
+    ('0-5', 0, 5),
+    ('5-7', 5, 7),
+    ('7-10', 7, None),
 )
 
+
+def _faixa_q(minimo, maximo):
+    """Builds the Q filter for one grade band of FAIXAS_DE_NOTA."""
+    q = Q(nota__gte=minimo)
+    if maximo is not None:
+        q &= Q(nota__lt=maximo)
+    return q
+
 # --- Custom Permissions (No changes needed here) ---
 class IsStaffUser(BasePermission):
     """Allows access only to staff users."""
@@ -82,6 +133,15 @@ class MyTokenObtainPairView(TokenObtainPairView):
     Custom view for obtaining JWT tokens, using MyTokenObtainPairSerializer.
     """
     serializer_class = MyTokenObtainPairSerializer
+    throttle_scope = 'token' # Limite por IP além do de anônimos (ver api/limites.py)
+
+
+class MyTokenRefreshView(TokenRefreshView):
+    throttle_scope = 'token'
+
+
+class MyTokenVerifyView(TokenVerifyView):
+    throttle_scope = 'token'
 
 
 # --- ViewSets with Role-Based Access and Data Filtering ---
@@ -90,6 +150,8 @@ class AdministracaoViewSet(viewsets.ModelViewSet):
     """ViewSet for the Administracao model - Full CRUD for Staff."""
     queryset = Administracao.objects.all()
     serializer_class = AdministracaoSerializer
+    filter_backends = [BuscaPessoasFilter]
+    pagination_class = BuscaPagination
     permission_classes = [IsStaffUser]
 
 
@@ -97,6 +159,8 @@ class ProfessoresViewSet(viewsets.ModelViewSet):
     """ViewSet for the Professores model - Full CRUD for Staff, Read-only for Teachers (their own record)."""
     queryset = Professores.objects.all()
     serializer_class = ProfessoresSerializer
+    filter_backends = [BuscaPessoasFilter]
+    pagination_class = BuscaPagination
     permission_classes = [IsAuthenticated, CanViewData]
 
     def get_queryset(self):
@@ -109,15 +173,87 @@ class ProfessoresViewSet(viewsets.ModelViewSet):
         return Professores.objects.none()
 
     def get_permissions(self):
+        if self.action == 'overview':
+            return [IsAuthenticated(), IsTeacherUser()]
         if self.request.method in ['GET', 'HEAD', 'OPTIONS']:
              return [IsAuthenticated(), IsStaffOrTeacher()]
         return [IsStaffUser()]
 
+    @action(detail=False, methods=['get'], url_path='me/overview')
+    def overview(self, request):
+        """
+        Workload summary for the requesting teacher: classes with roster sizes,
+        evaluations still without grades and the grade distribution per evaluation.
+        Every section is a single set-based query; no ID lists are built in Python.
+        """
+        professor = request.user.professor_profile
+
+        # Tamanho da turma via subquery na tabela intermediária (evita JOIN + DISTINCT)
+        roster_size = (
+            Classes.alunos.through.objects
+            .filter(classes_id=OuterRef('pk'))
+            .values('classes_id')
+            .annotate(total=Count('alunos_id'))
+            .values('total')
+        )
+        classes = (
+            Classes.objects
+            .filter(professores=professor)
+            .annotate(total_alunos=Coalesce(Subquery(roster_size, output_field=IntegerField()), 0))
+            .order_by('ano_letivo', 'nome')
+            .values('id', 'nome', 'ano_letivo', 'total_alunos')
+        )
+
+        avaliacoes_pendentes = (
+            Avaliacoes.objects
+            .filter(professor_responsavel=professor)
+            .filter(~Exists(Notas.objects.filter(avaliacao=OuterRef('pk'))))
+            .order_by('nome')
+            .values('id', 'nome')
+        )
+
+        faixas = {
+            nome: Count('id', filter=_faixa_q(minimo, maximo))
+            for nome, minimo, maximo in FAIXAS_DE_NOTA
+        }
+        distribuicao = (
+            Notas.objects
+            .filter(avaliacao__professor_responsavel=professor)
+            .values('avaliacao_id', 'avaliacao__nome')
+            .annotate(
+                total=Count('id'),
+                media=Avg('nota'),
+                minima=Min('nota'),
+                maxima=Max('nota'),
+                **faixas,
+            )
+            .order_by('avaliacao_id')
+        )
+
+        return Response({
+            'professor': {'id': professor.id, 'nome': professor.nome},
+            'classes': list(classes),
+            'avaliacoes_pendentes': list(avaliacoes_pendentes),
+            'distribuicao_notas': [
+                {
+                    'avaliacao': {'id': linha['avaliacao_id'], 'nome': linha['avaliacao__nome']},
+                    'total': linha['total'],
+                    'media': linha['media'],
+                    'minima': linha['minima'],
+                    'maxima': linha['maxima'],
+                    'faixas': {nome: linha[nome] for nome, _, _ in FAIXAS_DE_NOTA},
+                }
+                for linha in distribuicao
+            ],
+        })
+
 
 class ResponsaveisViewSet(viewsets.ModelViewSet):
     """ViewSet for the Responsaveis model - Full CRUD for Staff, Read-only for Guardians (their own record)."""
     queryset = Responsaveis.objects.all()
     serializer_class = ResponsaveisSerializer
+    filter_backends = [BuscaPessoasFilter]
+    pagination_class = BuscaPagination
     permission_classes = [IsAuthenticated, CanViewData]
 
     def get_queryset(self):
@@ -138,18 +274,20 @@ class AlunosViewSet(viewsets.ModelViewSet):
     """ViewSet for the Alunos model - Full CRUD for Staff, Read-only for Teachers/Students/Guardians."""
     queryset = Alunos.objects.all()
     serializer_class = AlunosSerializer
+    filter_backends = [BuscaPessoasFilter]
+    pagination_class = BuscaPagination
     permission_classes = [IsAuthenticated, CanViewData]
 
     def get_queryset(self):
+        # Carrega as relações exibidas pelo serializer junto com o escopo (evita N+1)
+        return self.get_scoped_queryset().prefetch_related('responsaveis')
+
+    def get_scoped_queryset(self):
         user = self.request.user
         if user.is_staff:
             return Alunos.objects.all()
         if hasattr(user, 'professor_profile'):
-             teacher_classes = user.professor_profile.classes.all()
-             student_ids = set()
-             for class_obj in teacher_classes:
-                 student_ids.update(class_obj.alunos.values_list('id', flat=True))
-             return Alunos.objects.filter(id__in=list(student_ids))
+             return scopes.alunos_do_professor(user.professor_profile)
         # If the user is a Student, they can only view their own profile linked to their user account
         if hasattr(user, 'aluno_profile'):
              return Alunos.objects.filter(user=user) # Filter by the linked User object directly
@@ -173,19 +311,8 @@ class MateriasViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_staff or hasattr(user, 'professor_profile'):
             return Materias.objects.all()
-        if hasattr(user, 'aluno_profile'):
-            student_classes = user.aluno_profile.classes.all()
-            subject_ids = set()
-            for class_obj in student_classes:
-                subject_ids.update(class_obj.materias.values_list('id', flat=True))
-            return Materias.objects.filter(id__in=list(subject_ids))
-        if hasattr(user, 'responsavel_profile'):
-            student_ids = user.responsavel_profile.alunos.values_list('id', flat=True)
-            student_classes = Classes.objects.filter(alunos__id__in=list(student_ids))
-            subject_ids = set()
-            for class_obj in student_classes:
-                 subject_ids.update(class_obj.materias.values_list('id', flat=True))
-            return Materias.objects.filter(id__in=list(subject_ids))
+        if hasattr(user, 'aluno_profile') or hasattr(user, 'responsavel_profile'):
+            return scopes.materias_dos_alunos(scopes.ids_alunos_do_usuario(user))
         return Materias.objects.none()
 
     def get_permissions(self):
@@ -201,14 +328,17 @@ class ClassesViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, CanViewData]
 
     def get_queryset(self):
+        # Carrega as relações exibidas pelo serializer junto com o escopo (evita N+1)
+        return self.get_scoped_queryset().prefetch_related('alunos', 'professores', 'materias')
+
+    def get_scoped_queryset(self):
         user = self.request.user
         if user.is_staff or hasattr(user, 'professor_profile'):
             return Classes.objects.all()
         if hasattr(user, 'aluno_profile'):
             return user.aluno_profile.classes.all()
         if hasattr(user, 'responsavel_profile'):
-            student_ids = user.responsavel_profile.alunos.values_list('id', flat=True)
-            return Classes.objects.filter(alunos__id__in=list(student_ids)).distinct()
+            return scopes.classes_dos_alunos(scopes.ids_alunos_do_usuario(user))
         return Classes.objects.none()
 
 
@@ -217,6 +347,69 @@ class ClassesViewSet(viewsets.ModelViewSet):
              return [IsAuthenticated(), CanViewData()]
         return [IsStaffUser()]
 
+    # Tamanho dos lotes de DELETE ... IN (...) para não estourar o limite de parâmetros do SQLite
+    TAMANHO_LOTE_MEMBROS = 500
+
+    @action(detail=True, methods=['post', 'put', 'delete'], url_path='(?P<relacao>alunos|professores|materias)')
+    def membros(self, request, pk=None, relacao=None):
+        """
+        Bulk enrollment for one of the class M2M relations, body {"ids": [...]}:
+        POST adds, DELETE removes and PUT replaces the members with the given IDs.
+        Runs in a single transaction and sends one membros_turma_alterados signal.
+        At most MembrosTurmaSerializer.MAX_IDS IDs per request; every ID must exist
+        (checked with one query) except on DELETE.
+        """
+        classe = get_object_or_404(Classes, pk=pk)
+        serializer = MembrosTurmaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data['ids'])
+
+        campo = Classes._meta.get_field(relacao)
+        through = campo.remote_field.through
+        coluna = campo.m2m_reverse_field_name() + '_id'  # ex: alunos_id
+        model = campo.related_model
+
+        if request.method != 'DELETE':
+            # Uma consulta para o lote inteiro, comparada com os IDs enviados
+            existentes = set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            inexistentes = ids - existentes
+            if inexistentes:
+                return Response(
+                    {'ids': [f"IDs inexistentes: {sorted(inexistentes)}"]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        with transaction.atomic():
+            membros = through.objects.filter(classes_id=classe.pk)
+            atuais = set(membros.values_list(coluna, flat=True))
+            if request.method == 'POST':
+                adicionar, remover = ids - atuais, set()
+            elif request.method == 'PUT':
+                adicionar, remover = ids - atuais, atuais - ids
+            else:
+                adicionar, remover = set(), ids & atuais
+
+            pendentes = sorted(remover)
+            for inicio in range(0, len(pendentes), self.TAMANHO_LOTE_MEMBROS):
+                lote = pendentes[inicio:inicio + self.TAMANHO_LOTE_MEMBROS]
+                membros.filter(**{f'{coluna}__in': lote}).delete()
+            through.objects.bulk_create(
+                [through(classes_id=classe.pk, **{coluna: membro_id}) for membro_id in adicionar],
+                batch_size=self.TAMANHO_LOTE_MEMBROS,
+                ignore_conflicts=True,  # Matrículas concorrentes já existentes não são erro
+            )
+            if adicionar or remover:
+                transaction.on_commit(lambda: membros_turma_alterados.send(
+                    sender=Classes, classe=classe, relacao=relacao,
+                    adicionados=adicionar, removidos=remover,
+                ))
+
+        return Response({
+            'adicionados': len(adicionar),
+            'removidos': len(remover),
+            'total': len(atuais) + len(adicionar) - len(remover),
+        })
+
 
 class AvaliacoesViewSet(viewsets.ModelViewSet):
     """ViewSet for the Avaliacoes model - CRUD for Staff/Teachers, Read-only for Students/Guardians."""
@@ -228,20 +421,8 @@ class AvaliacoesViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_staff or hasattr(user, 'professor_profile'):
             return Avaliacoes.objects.all()
-        if hasattr(user, 'aluno_profile'):
-            student_classes = user.aluno_profile.classes.all()
-            subject_ids = set()
-            for class_obj in student_classes:
-                subject_ids.update(class_obj.materias.values_list('id', flat=True))
-            return Avaliacoes.objects.filter(Q(responsavel_por__classes__in=student_classes) | Q(materias__id__in=list(subject_ids))).distinct()
-
-        if hasattr(user, 'responsavel_profile'):
-            student_ids = user.responsavel_profile.alunos.values_list('id', flat=True)
-            student_classes = Classes.objects.filter(alunos__id__in=list(student_ids))
-            subject_ids = set()
-            for class_obj in student_classes:
-                 subject_ids.update(class_obj.materias.values_list('id', flat=True))
-            return Avaliacoes.objects.filter(Q(responsavel_por__classes__in=student_classes) | Q(materias__id__in=list(subject_ids))).distinct()
+        if hasattr(user, 'aluno_profile') or hasattr(user, 'responsavel_profile'):
+            return scopes.avaliacoes_dos_alunos(scopes.ids_alunos_do_usuario(user))
         return Avaliacoes.objects.none()
 
     def get_permissions(self):
@@ -255,31 +436,110 @@ class NotasViewSet(viewsets.ModelViewSet):
     queryset = Notas.objects.all()
     serializer_class = NotasSerializer
     permission_classes = [IsAuthenticated, CanViewData]
+    filter_backends = [FiltroPorParametros, OrderingFilter]
+    # ?parametro=valor -> lookup aplicado sobre o escopo de get_queryset
+    filtros_parametros = {
+        'aluno': ('aluno_id', inteiro),
+        'avaliacao': ('avaliacao_id', inteiro),
+        'atribuida_por': ('atribuida_por_id', inteiro),
+        'classe': ('avaliacao__classe_id', inteiro),
+        'materia': ('avaliacao__materia_id', inteiro),
+        'data_registro_de': ('data_registro__gte', data_iso),
+        'data_registro_ate': ('data_registro__lte', data_iso),
+        'nota_min': ('nota__gte', decimal),
+        'nota_max': ('nota__lte', decimal),
+        'ano_letivo': ('ano_letivo', inteiro),
+    }
+    # Somente colunas indexadas (ver Notas.Meta.indexes e as FKs)
+    ordering_fields = ['id', 'data_registro', 'aluno', 'avaliacao', 'nota']
 
     def get_queryset(self):
+        # Carrega as relações exibidas pelo serializer junto com o escopo (evita N+1)
+        queryset = self.get_scoped_queryset().select_related('aluno', 'avaliacao', 'atribuida_por')
+        if self.action == 'list' and 'ano_letivo' not in self.request.query_params:
+            # Listagem padrão só do ano letivo atual (índice ano_letivo/aluno)
+            queryset = queryset.filter(ano_letivo=arquivo.ano_letivo_atual())
+        return queryset
+
+    def get_scoped_queryset(self, model=Notas):
         user = self.request.user
         if user.is_staff:
-            return Notas.objects.all()
+            return model.objects.all()
         if hasattr(user, 'professor_profile'):
-             assigned_notes = Notas.objects.filter(atribuida_por=user.professor_profile)
-             teacher_classes = user.professor_profile.classes.all()
-             student_ids = set()
-             for class_obj in teacher_classes:
-                 student_ids.update(class_obj.alunos.values_list('id', flat=True))
-             notes_for_my_students = Notas.objects.filter(aluno__id__in=list(student_ids))
-             return (assigned_notes | notes_for_my_students).distinct()
+             return scopes.notas_do_professor(user.professor_profile, model)
         if hasattr(user, 'aluno_profile'):
-             return Notas.objects.filter(aluno=user.aluno_profile)
+             return model.objects.filter(aluno=user.aluno_profile)
         if hasattr(user, 'responsavel_profile'):
-             student_ids = user.responsavel_profile.alunos.values_list('id', flat=True)
-             return Notas.objects.filter(aluno__id__in=list(student_ids))
-        return Notas.objects.none()
+             return scopes.notas_dos_alunos(scopes.ids_alunos_do_usuario(user), model)
+        return model.objects.none()
 
     def get_permissions(self):
         if self.request.method in ['GET', 'HEAD', 'OPTIONS']:
              return [IsAuthenticated(), CanViewData()]
         return [IsStaffOrTeacher()]
 
+    # Alterações feitas pela API entram na auditoria com o usuário do request
+    def perform_create(self, serializer):
+        with auditoria.autor(self.request.user):
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with auditoria.autor(self.request.user):
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with auditoria.autor(self.request.user):
+            super().perform_destroy(instance)
+
+    @action(detail=False, methods=['get'], serializer_class=NotasArquivadasSerializer)
+    def historico(self, request):
+        """
+        Archived grades of closed school years (see `manage.py arquivar_notas`),
+        read-only and with the same visibility and filters as the list.
+        """
+        queryset = self.get_scoped_queryset(NotasArquivadas).select_related('aluno', 'avaliacao', 'atribuida_por')
+        serializer = self.get_serializer(self.filter_queryset(queryset), many=True)
+        return Response(serializer.data)
+
+class AuditoriaNotasView(ListAPIView):
+    """
+    Audit trail of grade changes for one student (?aluno=) or evaluation
+    (?avaliacao=), newest first, cursor-paginated. Staff see everything, teachers
+    the same grades as in NotasViewSet (their classes' students and the grades
+    they assigned).
+    """
+    serializer_class = AuditoriaNotasSerializer
+    permission_classes = [IsStaffOrTeacher]
+    filter_backends = [FiltroPorParametros]
+    filtros_parametros = {
+        'aluno': ('aluno_id', inteiro),
+        'avaliacao': ('avaliacao_id', inteiro),
+        'nota': ('nota_id', inteiro),
+    }
+    pagination_class = auditoria.AuditoriaPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff:
+            return AuditoriaNotas.objects.all()
+        professor = user.professor_profile
+        # Mesmo escopo de NotasViewSet (alunos das turmas ou notas atribuídas pelo professor);
+        # pelo aluno também ficam as notas já removidas
+        return AuditoriaNotas.objects.filter(
+            Q(aluno_id__in=scopes.ids_alunos_do_professor(professor))
+            | Q(nota_id__in=scopes.notas_do_professor(professor).values('id'))
+        )
+
+    def list(self, request, *args, **kwargs):
+        # Sempre por um dos índices (aluno_id, id) / (avaliacao_id, id)
+        if not ({'aluno', 'avaliacao'} & set(request.query_params)):
+            return Response(
+                {'detail': "Informe ?aluno= ou ?avaliacao=."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().list(request, *args, **kwargs)
+
+
 # Registro de Usuários
 class RegistroUsuarioView(CreateAPIView):
     """
@@ -288,3 +548,297 @@ class RegistroUsuarioView(CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegistroUsuarioSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'registro'
+
+
+# Cadastro em lote de pessoas
+class OnboardingView(APIView):
+    """
+    Staff-only bulk onboarding: receives a CSV (multipart field 'arquivo' or raw
+    text/csv body) and creates the Users with their linked profiles and guardian
+    links in one transaction. See api/onboarding.py for the expected columns.
+    With ?assincrono=1 the import is queued as a Tarefa and 202 is returned;
+    files over MAX_LINHAS_SINCRONO rows must use it (400 otherwise).
+    'administracao' rows only get is_staff with ?administracao_staff=1.
+    """
+    permission_classes = [IsStaffUser]
+    parser_classes = [MultiPartParser, FileUploadParser]
+
+    def post(self, request):
+        arquivo = request.data.get('arquivo') or request.data.get('file')
+        if arquivo is None:
+            return Response({'arquivo': ["Envie o CSV no campo 'arquivo'."]}, status=status.HTTP_400_BAD_REQUEST)
+        # Usuários 'administracao' só viram staff com pedido explícito
+        administracao_staff = request.query_params.get('administracao_staff') in ('1', 'true')
+        try:
+            conteudo = decodificar(arquivo.read())
+            if request.query_params.get('assincrono') in ('1', 'true'):
+                tarefa = enfileirar(
+                    'importar_pessoas', criada_por=request.user,
+                    conteudo=conteudo, administracao_staff=administracao_staff,
+                )
+                return Response(TarefaSerializer(tarefa).data, status=status.HTTP_202_ACCEPTED)
+            linhas = ler_csv(conteudo)
+            if len(linhas) > MAX_LINHAS_SINCRONO:
+                return Response({'arquivo': [
+                    f"Arquivo com {len(linhas)} linhas: acima de {MAX_LINHAS_SINCRONO}, "
+                    "envie com ?assincrono=1 e acompanhe a tarefa em /api/tarefas/<id>/."
+                ]}, status=status.HTTP_400_BAD_REQUEST)
+            resumo = importar(linhas, administracao_staff=administracao_staff)
+        except ErroImportacao as exc:
+            return Response({'erros': exc.erros}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resumo, status=status.HTTP_201_CREATED)
+
+
+# Boletins de fim de período
+class BoletinsView(APIView):
+    """
+    Staff-only report cards for an ano_letivo: GET returns how many were already
+    generated, POST queues a 'gerar_boletins' Tarefa (?refazer=1 regenerates all)
+    and returns 202 with it; follow the progress at /api/tarefas/<id>/.
+    """
+    permission_classes = [IsStaffUser]
+
+    def get(self, request, ano_letivo):
+        return Response(status_boletins(ano_letivo))
+
+    def post(self, request, ano_letivo):
+        refazer = request.query_params.get('refazer') in ('1', 'true')
+        tarefa = enfileirar('gerar_boletins', criada_por=request.user, ano_letivo=ano_letivo, refazer=refazer)
+        return Response(TarefaSerializer(tarefa).data, status=status.HTTP_202_ACCEPTED)
+
+
+class TarefasViewSet(viewsets.ModelViewSet):
+    """ViewSet for the Tarefa job queue - Staff can enqueue jobs and follow status/progress."""
+    queryset = Tarefa.objects.select_related('criada_por').order_by('-id')
+    serializer_class = TarefaSerializer
+    permission_classes = [IsStaffUser]
+    http_method_names = ['get', 'post', 'head', 'options']
+    filter_backends = [FiltroPorParametros]
+    filtros_parametros = {
+        'tipo': ('tipo', str),
+        'status': ('status', str),
+    }
+
+    def perform_create(self, serializer):
+        serializer.save(criada_por=self.request.user)
+
+
+class SyncView(APIView):
+    """
+    Delta sync for offline clients: GET /api/sync/?since=<cursor>[&modelos=notas,alunos]
+    returns the records created/updated and the IDs deleted since the cursor, per
+    resource, within the caller's visibility (same querysets and permissions as the
+    resource ViewSets). Without `since` it is a full sync. Keep calling with the
+    returned cursor while `tem_mais` is true.
+    """
+    permission_classes = [IsAuthenticated]
+    viewsets = {
+        'administracao': AdministracaoViewSet,
+        'professores': ProfessoresViewSet,
+        'responsaveis': ResponsaveisViewSet,
+        'alunos': AlunosViewSet,
+        'materias': MateriasViewSet,
+        'classes': ClassesViewSet,
+        'avaliacoes': AvaliacoesViewSet,
+        'notas': NotasViewSet,
+    }
+
+    def get(self, request):
+        agora = timezone.now()
+        try:
+            posicoes = sync.ler_cursor(request.query_params.get('since'))
+        except ValueError:
+            return Response({'since': ["Cursor inválido."]}, status=status.HTTP_400_BAD_REQUEST)
+        recursos = list(self.viewsets)
+        if request.query_params.get('modelos'):
+            recursos = [recurso.strip() for recurso in request.query_params['modelos'].split(',')]
+            desconhecidos = [recurso for recurso in recursos if recurso not in self.viewsets]
+            if desconhecidos:
+                return Response({'modelos': [f"Modelos desconhecidos: {desconhecidos}"]},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        # Posições dos fluxos não pedidos agora são preservadas no novo cursor
+        proximas = {fluxo: posicao for fluxo, posicao in posicoes.items() if fluxo != '*'}
+        alteracoes, removidos, tem_mais = {}, {}, False
+        entradas = sync.EntradasNoEscopo(request.user)
+        for recurso in recursos:
+            # action='sync', não 'list': o escopo do papel sem os padrões da listagem
+            # (ex: /api/notas/ só do ano letivo atual), senão outros anos nunca sincronizam
+            view = self.viewsets[recurso](
+                request=request, args=(), kwargs={}, format_kwarg=None, action='sync',
+            )
+            try:
+                view.check_permissions(request)
+            except (NotAuthenticated, PermissionDenied):
+                continue
+            queryset = view.get_queryset()
+            registros, proximas[recurso], mais = sync.pagina(
+                queryset, sync.posicao_do_fluxo(posicoes, recurso), agora,
+            )
+            # Registros que ficaram visíveis por vínculos novos sem terem sido alterados
+            fluxo = f'entradas:{recurso}'
+            novos, proximas[fluxo] = entradas.buscar(
+                queryset, recurso, sync.posicao_do_fluxo(posicoes, fluxo), agora,
+            )
+            vistos = {registro.pk for registro in registros}
+            registros += [registro for registro in novos if registro.pk not in vistos]
+            alteracoes[recurso] = view.get_serializer(registros, many=True).data
+            fluxo = f'removidos:{recurso}'
+            removidos[recurso], proximas[fluxo], mais_removidos = sync.remocoes(
+                recurso, request.user, sync.posicao_do_fluxo(posicoes, fluxo), agora,
+            )
+            tem_mais = tem_mais or mais or mais_removidos
+
+        return Response({
+            'cursor': sync.gerar_cursor(proximas),
+            'tem_mais': tem_mais,
+            'alteracoes': alteracoes,
+            'removidos': removidos,
+        })
+
+
+class LimitesView(APIView):
+    """Staff-only rate limiting / admission control counters of this worker process."""
+    permission_classes = [IsStaffUser]
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'contadores': limites.contadores.copia(),
+            'taxas': api_settings.DEFAULT_THROTTLE_RATES,
+        })
+
+
+class ProfilesView(APIView):
+    """
+    Staff-only list of stored request profiles, newest first. Profile a request
+    by sending it with the `X-Profile: cprofile|amostragem` header (or
+    `?_profile=`) as staff; the response carries its id in `X-Profile-Id`.
+    """
+    permission_classes = [IsStaffUser]
+
+    def get(self, request):
+        return Response(profiling.listar_profiles())
+
+
+class ProfileView(APIView):
+    """Staff-only profile details: timings, SQL log and the most expensive functions."""
+    permission_classes = [IsStaffUser]
+
+    def get(self, request, profile_id):
+        dados = profiling.ler_profile(str(profile_id))
+        if dados is None:
+            raise Http404
+        return Response(dados)
+
+
+class ProfileDownloadView(APIView):
+    """Staff-only raw profile: pstats dump (cProfile) or collapsed stacks (sampling)."""
+    permission_classes = [IsStaffUser]
+
+    def get(self, request, profile_id):
+        arquivo = profiling.arquivo_do_profile(str(profile_id))
+        if arquivo is None or not os.path.exists(arquivo[0]):
+            raise Http404
+        caminho, content_type = arquivo
+        return FileResponse(
+            open(caminho, 'rb'), as_attachment=True,
+            filename=os.path.basename(caminho), content_type=content_type,
+        )
+
+
+# --- Server-Sent Events: novas notas em tempo real ---
+
+# Intervalo entre comentários de keep-alive no stream SSE
+SSE_HEARTBEAT_SEGUNDOS = 15
+
+
+def _autenticar_stream(request):
+    """
+    (user, expira_em) pelo header Authorization (Bearer/Access) ou por
+    ?ticket= de NotasEventosTicketView (EventSource não envia headers).
+    `expira_em` é o `exp` do access token: o stream termina nesse instante.
+    """
+    autenticacao = JWTAuthentication()
+    header = autenticacao.get_header(request)
+    if header:
+        bruto = autenticacao.get_raw_token(header)
+        if not bruto:
+            return None
+        try:
+            token = autenticacao.get_validated_token(bruto)
+            return autenticacao.get_user(token), token['exp']
+        except (InvalidToken, TokenError):
+            return None
+    ticket = usar_ticket(request.GET.get('ticket', ''))
+    if ticket is None:
+        return None
+    user_id, expira_em = ticket
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    return (user, expira_em) if user else None
+
+
+class NotasEventosTicketView(APIView):
+    """
+    Exchanges the caller's credentials for a short-lived, single-use ticket to
+    open the SSE stream (?ticket=), so the access token never goes in a URL.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        exp = request.auth.get('exp') if request.auth is not None else None
+        if exp is None:  # Sessão (admin/browsable API): mesma duração de um access token
+            exp = (timezone.now() + jwt_settings.ACCESS_TOKEN_LIFETIME).timestamp()
+        return Response({'ticket': emitir_ticket(request.user, exp), 'validade': TICKET_VALIDADE})
+
+
+async def notas_eventos(request):
+    """
+    SSE stream of Notas create/update events visible to the caller (same role
+    rules as NotasViewSet). Needs the ASGI app (escola_dashboard/asgi.py):
+    under WSGI a never-ending response would pin a worker, so it answers 501.
+    The stream ends with an `expirado` event when the access token expires and
+    closes if the user is deactivated; clients reconnect with a new ticket.
+    """
+    if 'wsgi.input' in request.META:
+        return JsonResponse({'detail': "Eventos disponíveis apenas no servidor ASGI."}, status=501)
+    autenticado = await sync_to_async(_autenticar_stream)(request)
+    if autenticado is None:
+        return JsonResponse({'detail': "Credenciais de autenticação não foram fornecidas."}, status=401)
+    user, expira_em = autenticado
+    escopo = await sync_to_async(EscopoEventos.para_usuario)(user)
+    if escopo is None:
+        return JsonResponse({'detail': "Você não tem permissão para executar essa ação."}, status=403)
+
+    get_backend().iniciar()
+    assinatura = hub.assinar(asyncio.get_running_loop())
+
+    async def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                restante = expira_em - time.time()
+                if restante <= 0:
+                    yield 'event: expirado\ndata: {}\n\n'
+                    return
+                if escopo.expirado:
+                    await sync_to_async(escopo.recarregar)()
+                    if not escopo.ativo:
+                        return
+                try:
+                    evento = await asyncio.wait_for(
+                        assinatura.fila.get(), timeout=min(SSE_HEARTBEAT_SEGUNDOS, restante)
+                    )
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                if escopo.permite(evento):
+                    yield f"id: {evento['id']}\nevent: nota\ndata: {json.dumps(evento)}\n\n"
+        finally:
+            hub.cancelar(assinatura)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Desativa buffer em proxies nginx
+    return response
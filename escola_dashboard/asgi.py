@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'escola_dashboard.settings')
 
 application = get_asgi_application()
+
+if settings.PERFIL == 'api':
+    # Como no wsgi.py: URLconf, views e serializers carregados antes do primeiro request
+    from api.inicializacao import aquecer
+    aquecer()
@@ -34,6 +34,10 @@ DEBUG = True
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '127.0.0.1,localhost').split(',')
 ALLOWED_HOSTS = [host for host in ALLOWED_HOSTS if host]
 
+# 'completo' (padrão) ou 'api': workers que servem só a API, com admin e middlewares
+# de sessão carregados sob demanda (ver api/inicializacao.py e gunicorn.conf.py)
+PERFIL = os.environ.get('DJANGO_PERFIL', 'completo')
+
 
 # Application definition
 
@@ -54,8 +58,17 @@ INSTALLED_APPS = [
 
 ]
 
+# Middlewares que só o admin usa; no perfil 'api' rodam apenas em /admin/
+ADMIN_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.limites.ControleAdmissao', # Recusa com 503 antes de sessão/autenticação/banco
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,8 +76,24 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilingMiddleware', # Só age com X-Profile / ?_profile= de staff
 ]
 
+if PERFIL == 'api':
+    # Sem autodiscover no setup: api/admin.py é importado no primeiro acesso a /admin/
+    INSTALLED_APPS[INSTALLED_APPS.index('django.contrib.admin')] = 'django.contrib.admin.apps.SimpleAdminConfig'
+    MIDDLEWARE = [
+        'django.middleware.security.SecurityMiddleware',
+        'api.limites.ControleAdmissao',
+        'corsheaders.middleware.CorsMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'api.inicializacao.MiddlewaresDoAdmin', # ADMIN_MIDDLEWARE, só em /admin/
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+        'api.profiling.ProfilingMiddleware',
+    ]
+    # Os checks do admin procuram os middlewares de sessão/mensagens diretamente em MIDDLEWARE
+    SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
 ROOT_URLCONF = 'escola_dashboard.urls'
 
 TEMPLATES = [
@@ -155,10 +184,33 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
         # You might keep SessionAuthentication for the browsable API
         'rest_framework.authentication.SessionAuthentication',
+    ) if PERFIL != 'api' else (
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated', # Default to requiring authentication
     ),
+    # Token bucket por IP / usuário+papel / escopo da view (ver api/limites.py)
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.limites.LimitePorIP',
+        'api.limites.LimitePorPapel',
+        'api.limites.LimitePorEscopo',
+    ),
+    # 'N/periodo': rajada de N requisições, reposição de N por período
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '60/min',
+        'user': '300/min',
+        'aluno': '300/min',
+        'responsavel': '300/min',
+        'professor': '600/min',
+        'staff': '1200/min',
+        'token': '10/min',
+        'registro': '5/hour',
+    },
+    # Proxies na frente da aplicação (X-Forwarded-For) para identificar o IP do cliente.
+    # 0 = só REMOTE_ADDR: sem proxy, o X-Forwarded-For vem do cliente e pode ser forjado.
+    # No Heroku (um roteador na frente) o Procfile define NUM_PROXIES=1
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
 }
 
 SIMPLE_JWT = {
@@ -195,4 +247,26 @@ SIMPLE_JWT = {
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
-]
\ No newline at end of file
+]
+
+# Eventos de notas (SSE em /api/notas/eventos/, ver api/eventos.py)
+# Com mais de um processo servindo ASGI use 'api.eventos.BackendPostgres' (LISTEN/NOTIFY);
+# o Procfile (gunicorn com workers uvicorn) já o define para web e worker
+NOTAS_EVENTOS_BACKEND = os.environ.get('NOTAS_EVENTOS_BACKEND', 'api.eventos.BackendLocal')
+# Cache que marca os tickets do stream já usados; com vários processos, um cache compartilhado
+NOTAS_EVENTOS_TICKET_CACHE = 'default'
+
+# Ano letivo exibido por padrão em /api/notas/ (vazio = ano corrente); anos anteriores
+# podem ser movidos para o arquivo com `manage.py arquivar_notas <ano>` (ver api/arquivo.py)
+ANO_LETIVO_ATUAL = int(os.environ['ANO_LETIVO_ATUAL']) if os.environ.get('ANO_LETIVO_ATUAL') else None
+
+# Limites de taxa e controle de admissão (ver api/limites.py)
+# 'api.limites.BaldesCache' compartilha os baldes entre workers pelo cache LIMITES_CACHE
+LIMITES_BACKEND = os.environ.get('LIMITES_BACKEND', 'api.limites.BaldesMemoria')
+LIMITES_CACHE = 'default'
+ADMISSAO_MAX_CONCORRENCIA = int(os.environ.get('ADMISSAO_MAX_CONCORRENCIA', '32')) # Requests simultâneos por processo
+ADMISSAO_MAX_ESPERA_FILA_MS = int(os.environ.get('ADMISSAO_MAX_ESPERA_FILA_MS', '10000')) # Espera no roteador (X-Request-Start)
+
+# Profiling sob demanda de requests de staff (ver api/profiling.py)
+PROFILING_DIR = os.environ.get('PROFILING_DIR') or os.path.join(MEDIA_ROOT, 'profiles')
+PROFILING_MAX_ARQUIVOS = int(os.environ.get('PROFILING_MAX_ARQUIVOS', '200'))
@@ -14,10 +14,11 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
 
+from api.inicializacao import AdminSobDemanda
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('admin/', AdminSobDemanda().urls), # admin.site.urls, montado no primeiro acesso
     path('api/', include('api.urls')),
 ]
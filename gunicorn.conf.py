@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+# Configuração do gunicorn para os workers da API (Procfile: web)
+
+import os
+
+# Perfil enxuto: admin e middlewares de sessão sob demanda (ver api/inicializacao.py)
+os.environ.setdefault('DJANGO_PERFIL', 'api')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+# Workers ASGI (uvicorn): o feed SSE /api/notas/eventos/ só funciona em ASGI (sob WSGI responde 501)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn_worker.UvicornWorker')
+
+# Importa e aquece a aplicação uma vez no mestre; os workers nascem prontos e
+# compartilham a memória (copy-on-write). Desligue com GUNICORN_PRELOAD=0.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from api.inicializacao import antes_do_fork
+        antes_do_fork()